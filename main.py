@@ -13,19 +13,25 @@ from __future__ import annotations
 import header
 from header import __root__
 
-from src.assistant import CodeAssistant
-from src.utils.jjson import j_loads_ns
+import signal
 
-role = 'doc_writer'
-lang = 'en'
+from src.assistant import JobScheduler
+from src.assistant.code_assistant import signal_handler
+from src.assistant.pipeline import run_async
+from src.utils.jjson import j_loads_ns
 
 
 config = j_loads_ns(__root__ / 'src' / 'assistant' / 'code_assistant.json')
 
-for lang in config.languages:
-	for role in config.roles:
-		a = CodeAssistant(role = role, lang = lang)
-		a.run()
+# Ctrl+C останавливает обработку мягко, незавершенные задания продолжатся при следующем запуске
+signal.signal(signal.SIGINT, signal_handler)
+
+# Все роли и языки обрабатываются за один обход дерева
+scheduler = JobScheduler(roles = config.roles, langs = config.languages)
+try:
+    run_async(scheduler.process_files())
+finally:
+    scheduler.close()
 
 # for role in config.roles:
 # 	a = CodeAssistant(role = role, lang = 'he')
@@ -7,4 +7,14 @@
     :platform: Windows, Unix
     :synopsis: Простой gemini чат
 """
-from .gs import gs
\ No newline at end of file
+import importlib
+
+
+def __getattr__(name: str):
+    # `gs` загружается при первом обращении: его импорт тянет `jjson` и логгер,
+    # а `python -m src.assistant.code_assistant --help` в них не нуждается
+    if name == 'gs':
+        value = importlib.import_module('.gs', __name__).gs
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,3 +1,9 @@
 from __future__ import annotations
 
-from.gemini import GoogleGenerativeAI
\ No newline at end of file
+
+def __getattr__(name: str):
+    # Клиент модели загружается при первом обращении (см. `src.ai.gemini`)
+    if name == 'GoogleGenerativeAI':
+        from .gemini import GoogleGenerativeAI
+        return GoogleGenerativeAI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
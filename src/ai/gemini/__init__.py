@@ -8,8 +8,23 @@
 	:platform: Windows, Unix
 	:synopsis: Модуль модели `gemini`
 
+Клиенты загружаются при первом обращении: импорт `google.generativeai` и `grpc`
+занимает больше секунды и не нужен, например, для `--help`.
 """
 
+import importlib
 
+_LAZY = {
+    'GoogleGenerativeAI': '.generative_ai',
+    'MockGenerativeAI': '.mock',
+}
 
-from .generative_ai import GoogleGenerativeAI
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
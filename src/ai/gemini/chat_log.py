@@ -0,0 +1,222 @@
+## \file /src/ai/gemini/chat_log.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.chat_log
+	:platform: Windows, Unix
+	:synopsis: История чата в виде журнала JSON Lines, который только дописывается
+
+Каждая реплика - одна строка `history.jsonl`. Файл читается один раз при начале
+сессии, дальше каждая реплика стоит одной дозаписи, а в памяти держится хвост
+истории. Перезапись файла происходит только при явном уплотнении (compact) или
+архивировании:
+
+.. code-block:: bash
+
+    python -m src.ai.gemini.chat_log compact <chat_data_folder> --keep 200
+    python -m src.ai.gemini.chat_log archive <chat_data_folder>
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+import header
+from src.logger.logger import logger
+
+
+HISTORY_FILE_NAME = 'history.jsonl'
+LEGACY_HISTORY_FILE_NAME = 'history.json'
+
+
+class ChatLog:
+    """
+    .. :class:`ChatLog`
+        :synopsis: Журнал реплик чата в формате JSON Lines с хвостом в памяти
+    """
+
+    path: Path
+    tail_size: int
+    entries: list[dict]
+
+    def __init__(self, folder: str | Path, tail_size: int = 0):
+        """
+        Args:
+            folder (str | Path): Папка истории чата.
+            tail_size (int): Сколько последних реплик держать в памяти. `0` - все.
+        """
+        self.path = Path(folder, HISTORY_FILE_NAME)
+        self.tail_size = tail_size
+        self.entries = []
+        self.loaded = False
+
+    def _trim(self) -> None:
+        """Оставляет в памяти только хвост истории."""
+        if self.tail_size and len(self.entries) > self.tail_size:
+            del self.entries[: len(self.entries) - self.tail_size]
+
+    def _read_all(self) -> list[dict]:
+        """Читает все реплики журнала. Поврежденные строки пропускаются."""
+        entries = []
+        if not self.path.exists():
+            return entries
+        with self.path.open('r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Пропущена поврежденная строка истории в {self.path}")
+        return entries
+
+    def _migrate_legacy(self) -> None:
+        """Переносит историю из старого формата `history.json` в журнал."""
+        legacy_path = self.path.with_name(LEGACY_HISTORY_FILE_NAME)
+        if self.path.exists() or not legacy_path.exists():
+            return
+        try:
+            entries = json.loads(legacy_path.read_text(encoding='utf-8'))
+            self._write(self.path, entries if isinstance(entries, list) else [])
+            legacy_path.rename(legacy_path.with_suffix('.json.migrated'))
+            logger.info(f"История чата перенесена из {legacy_path} в {self.path}")
+        except Exception as ex:
+            logger.error(f"Не удалось перенести историю из {legacy_path}", ex, False)
+
+    @staticmethod
+    def _write(path: Path, entries: list[dict]) -> None:
+        """Атомарно записывает реплики в файл JSON Lines."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with tmp_path.open('w', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, path)
+
+    def load(self) -> list[dict]:
+        """
+        Загружает хвост истории с диска. Повторные вызовы файл не читают.
+
+        Returns:
+            list[dict]: Реплики в памяти.
+        """
+        if self.loaded:
+            return self.entries
+        try:
+            self._migrate_legacy()
+            if self.tail_size:
+                self.entries = list(deque(self._read_all(), maxlen=self.tail_size))
+            else:
+                self.entries = self._read_all()
+        except Exception as ex:
+            logger.error(f"Ошибка загрузки истории чата из файла {self.path}", ex, False)
+            self.entries = []
+        self.loaded = True
+        return self.entries
+
+    def append(self, *entries: dict) -> bool:
+        """
+        Дописывает реплики в конец журнала.
+
+        Returns:
+            bool: True, если запись прошла успешно.
+        """
+        if not entries:
+            return True
+        self.entries.extend(entries)
+        self._trim()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a', encoding='utf-8') as file:
+                file.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+            return True
+        except Exception as ex:
+            logger.error(f"Ошибка записи истории чата в файл {self.path}", ex, False)
+            return False
+
+    def clear(self) -> None:
+        """Очищает историю в памяти и удаляет журнал."""
+        self.entries = []
+        self.loaded = True
+        try:
+            self.path.unlink(missing_ok=True)
+        except Exception as ex:
+            logger.error(f"Ошибка удаления файла истории {self.path}", ex, False)
+
+    def archive(self) -> Optional[Path]:
+        """
+        Переносит текущий журнал в `archive/history_<timestamp>.jsonl` и начинает новый.
+
+        Returns:
+            Optional[Path]: Путь к архиву или None, если архивировать нечего.
+        """
+        self.entries = []
+        self.loaded = True
+        if not self.path.exists():
+            return None
+        archive_path = self.path.parent / 'archive' / f"history_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+        try:
+            archive_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.path, archive_path)
+            return archive_path
+        except Exception as ex:
+            logger.error(f"Ошибка архивирования истории {self.path}", ex, False)
+            return None
+
+    def compact(self, keep: int = 0) -> Optional[Path]:
+        """
+        Уплотняет журнал: последние `keep` реплик остаются, остальные сжимаются в архив.
+
+        Args:
+            keep (int): Сколько последних реплик оставить в журнале.
+
+        Returns:
+            Optional[Path]: Путь к архиву (gzip) или None, если уплотнять нечего.
+        """
+        entries = self._read_all()
+        if len(entries) <= keep:
+            return None
+        split = len(entries) - keep
+        older, newer = entries[:split], entries[split:]
+        archive_path = self.path.parent / 'archive' / f"history_{time.strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+        try:
+            archive_path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(archive_path, 'wt', encoding='utf-8') as file:
+                for entry in older:
+                    file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._write(self.path, newer)
+        except Exception as ex:
+            logger.error(f"Ошибка уплотнения истории {self.path}", ex, False)
+            return None
+        self.entries = newer
+        self._trim()
+        self.loaded = True
+        return archive_path
+
+
+def main():
+    """Команды обслуживания журнала истории чата."""
+    parser = argparse.ArgumentParser(description="Обслуживание истории чата (history.jsonl)")
+    parser.add_argument("command", choices=["compact", "archive"], help="compact - уплотнить, archive - архивировать целиком")
+    parser.add_argument("folder", type=str, help="Папка истории чата")
+    parser.add_argument("--keep", type=int, default=0, help="Сколько последних реплик оставить при уплотнении")
+    args = parser.parse_args()
+
+    chat_log = ChatLog(args.folder)
+    archive_path = chat_log.compact(args.keep) if args.command == "compact" else chat_log.archive()
+    if archive_path:
+        logger.info(f"История сохранена в архив: {archive_path}")
+    else:
+        logger.info(f"Нечего архивировать в {chat_log.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+## \file /src/ai/gemini/chat_memory.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.chat_memory
+	:platform: Windows, Unix
+	:synopsis: Ограничение истории чата бюджетом токенов со сводкой старых реплик
+
+Сессия чата отправляет модели всю историю с каждым сообщением. :class:`ChatMemory`
+перед каждым сообщением оставляет в истории:
+
+* последние `keep_turns` обменов (запрос пользователя и ответ модели) без изменений;
+* сводку более старых обменов - одну пару реплик в начале истории. Сводка накапливается:
+  вытесненные обмены дописываются к ней, а ее размер ограничен `summary_tokens`.
+
+Если история вместе с новым сообщением все равно превышает `budget_tokens`, в сводку
+уходят и самые старые из последних обменов (минимум один обмен остается дословно).
+Системная инструкция передается модели отдельно (`system_instruction`) и не сокращается.
+
+Сводка по умолчанию извлекающая (начало каждого запроса и ответа); ее можно поручить
+модели, передав асинхронную функцию `summarize`.
+"""
+
+from typing import Any, Awaitable, Callable, Optional
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_ACK = "OK"
+
+# Символов на токен - та же грубая оценка, что и при ограничении частоты запросов
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+def entry_role(entry: Any) -> str:
+    """Роль реплики: словарь истории или `Content` из `genai`."""
+    return entry.get('role', '') if isinstance(entry, dict) else getattr(entry, 'role', '')
+
+
+def entry_text(entry: Any) -> str:
+    """Текст реплики: словарь истории или `Content` из `genai`."""
+    parts = entry.get('parts', []) if isinstance(entry, dict) else getattr(entry, 'parts', [])
+    if isinstance(parts, str):
+        return parts
+    texts = []
+    for part in parts:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict):
+            texts.append(part.get('text', ''))
+        else:
+            texts.append(getattr(part, 'text', ''))
+    return ''.join(texts)
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+async def extractive_summary(summary: str, turns: list[list[Any]], max_chars: int) -> str:
+    """
+    Дописывает к сводке начало каждого вытесненного запроса и ответа.
+    Если сводка длиннее `max_chars`, отбрасываются самые старые строки.
+    """
+    lines = [line for line in summary.splitlines() if line]
+    # Каждая реплика сокращается так, чтобы в сводку помещалось хотя бы несколько последних
+    limit = max(20, min(200, max_chars // 8))
+    for turn in turns:
+        for entry in turn:
+            lines.append(f"- {entry_role(entry) or 'user'}: {_shorten(entry_text(entry), limit)}")
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+class ChatMemory:
+    """
+    .. :class:`ChatMemory`
+        :synopsis: История чата в пределах бюджета токенов: последние обмены дословно и сводка старых
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 32000,
+        keep_turns: int = 4,
+        summary_tokens: int = 1000,
+        summarize: Optional[Callable[[str, list[list[Any]], int], Awaitable[str]]] = None,
+    ):
+        """
+        Args:
+            budget_tokens (int): Предел размера истории вместе с новым сообщением. `0` - без предела.
+            keep_turns (int): Сколько последних обменов передавать дословно.
+            summary_tokens (int): Предел размера сводки.
+            summarize (Optional[Callable]): `async (сводка, вытесненные обмены, предел в символах) -> сводка`.
+                По умолчанию - :func:`extractive_summary`.
+        """
+        self.budget_tokens = budget_tokens or 0
+        self.keep_turns = max(1, keep_turns)
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize or extractive_summary
+        self.summary = ''
+        self.prompt_tokens = 0
+        self.history_tokens = 0
+
+    @classmethod
+    def from_config(
+        cls, config: Any, summarize: Optional[Callable[[str, list[list[Any]], int], Awaitable[str]]] = None
+    ) -> 'ChatMemory':
+        """Создает память по секции `chat_memory` конфигурации."""
+        config = config if isinstance(config, dict) else vars(config)
+        return cls(
+            budget_tokens=config.get('budget_tokens', 32000),
+            keep_turns=config.get('keep_turns', 4),
+            summary_tokens=config.get('summary_tokens', 1000),
+            summarize=summarize,
+        )
+
+    def reset(self) -> None:
+        """Начало новой сессии: сводка прошлой сессии не переносится."""
+        self.summary = ''
+        self.prompt_tokens = 0
+        self.history_tokens = 0
+
+    @staticmethod
+    def _split_turns(history: list[Any]) -> tuple[list[list[Any]], bool]:
+        """Делит историю на обмены `[user, model]`. Возвращает и признак сводки в начале истории."""
+        has_summary = (
+            len(history) >= 2
+            and entry_role(history[0]) == 'user'
+            and entry_text(history[0]).startswith(SUMMARY_PREFIX)
+        )
+        turns: list[list[Any]] = []
+        for entry in history[2 if has_summary else 0:]:
+            if entry_role(entry) == 'user' or not turns:
+                turns.append([entry])
+            else:
+                turns[-1].append(entry)
+        return turns, has_summary
+
+    def _summary_turn(self) -> list[dict]:
+        if not self.summary:
+            return []
+        return [
+            {"role": "user", "parts": [SUMMARY_PREFIX + self.summary]},
+            {"role": "model", "parts": [SUMMARY_ACK]},
+        ]
+
+    async def fit(self, history: list[Any], message: str = '') -> list[Any]:
+        """
+        История для следующего сообщения в пределах бюджета.
+
+        Args:
+            history (list[Any]): Текущая история сессии чата.
+            message (str): Сообщение, которое будет отправлено.
+
+        Returns:
+            list[Any]: Сводка (если есть) и последние обмены. Если сокращать нечего, возвращается `history`.
+        """
+        turns, has_summary = self._split_turns(history)
+        if not has_summary and self.summary:
+            # История начата заново (очистка, новая сессия)
+            self.summary = ''
+        sizes = [sum(estimate_tokens(entry_text(entry)) for entry in turn) for turn in turns]
+        message_tokens = estimate_tokens(message)
+        summary_tokens = estimate_tokens(self.summary)
+
+        keep = min(len(turns), self.keep_turns)
+        if self.budget_tokens:
+            while keep > 1 and summary_tokens + sum(sizes[len(turns) - keep:]) + message_tokens > self.budget_tokens:
+                keep -= 1
+        folded = turns[:len(turns) - keep]
+        if folded:
+            self.summary = await self.summarize(self.summary, folded, self.summary_tokens * CHARS_PER_TOKEN)
+            history = self._summary_turn() + [entry for turn in turns[len(turns) - keep:] for entry in turn]
+
+        self.history_tokens = estimate_tokens(self.summary) + sum(sizes[len(turns) - keep:])
+        self.prompt_tokens = self.history_tokens + message_tokens
+        return history
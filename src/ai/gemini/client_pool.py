@@ -0,0 +1,58 @@
+## \file /src/ai/gemini/client_pool.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.client_pool
+	:platform: Windows, Unix
+	:synopsis: Общий для процесса пул клиентов модели по (модель, системная инструкция)
+
+Создание :class:`GoogleGenerativeAI` вызывает `genai.configure`, собирает `GenerativeModel`,
+сессию чата, кеш ответов и движок повторов. Клиент зависит только от модели и системной
+инструкции, поэтому ассистенты разных ролей и языков с одинаковой парой - и ассистенты,
+созданные заново в следующем цикле, - получают один и тот же клиент из :data:`model_clients`.
+"""
+
+import threading
+from typing import Any, Callable, Hashable
+
+
+class ClientPool:
+    """
+    .. :class:`ClientPool`
+        :synopsis: Долгоживущие клиенты модели, создаваемые один раз на ключ
+    """
+
+    def __init__(self):
+        self.created = 0
+        self._clients: dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        """
+        Клиент для `key`. Создается вызовом `create` при первом обращении.
+
+        Args:
+            key (Hashable): Класс клиента, имя модели и системная инструкция.
+            create (Callable[[], Any]): Фабрика клиента.
+        """
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = create()
+                    self.created += 1
+        return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def clear(self) -> None:
+        """Забывает созданные клиенты."""
+        with self._lock:
+            self._clients.clear()
+
+
+model_clients = ClientPool()
@@ -11,24 +11,21 @@
 import codecs
 import re
 import asyncio
-import time
+import hashlib
 import json
+import threading
+import time
+from datetime import timedelta
 from io import IOBase
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, AsyncIterator
 from dataclasses import dataclass, field
 import base64
 
 import google.generativeai as genai
-import requests
 
 from grpc import RpcError
-from google.api_core.exceptions import (
-    GatewayTimeout,
-    ServiceUnavailable,
-    ResourceExhausted,
-    InvalidArgument,
-)
+from google.api_core.exceptions import InvalidArgument
 from google.auth.exceptions import DefaultCredentialsError, RefreshError
 
 import header
@@ -39,8 +36,13 @@ from src import gs
 from src.utils.file import read_text_file, save_text_file
 from src.utils.date_time import TimeoutCheck
 from src.utils.jjson import j_loads, j_dumps
-from src.utils.image import get_image_bytes
 from src.utils.printer import pprint as print
+from .response_cache import ResponseCache
+from .chat_log import ChatLog
+from .retry import RetryEngine, EmptyResponseError, CircuitOpenError
+from .model_router import ModelRouter, routed_model
+from .metrics import model_metrics
+from .chat_memory import ChatMemory, entry_role, entry_text, extractive_summary
 
 timeout_check = TimeoutCheck()
 
@@ -65,6 +67,160 @@ def remove_html_blocks(text: str) -> str:
     """
     return re.sub(r'```html.*?```', '', text, flags=re.DOTALL)
 
+def _partial_suffix(text: str, marker: str) -> int:
+    """Длина самого длинного окончания `text`, с которого может начинаться `marker`."""
+    for size in range(min(len(text), len(marker) - 1), 0, -1):
+        if marker.startswith(text[-size:]):
+            return size
+    return 0
+
+
+class ResponseNormalizer:
+    """
+    .. :class:`ResponseNormalizer`
+        :synopsis: Потоковый аналог `remove_html_blocks(normalize_text(text))`
+    """
+
+    HTML_OPEN = '```html'
+    HTML_CLOSE = '```'
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('unicode_escape')()
+        self._escaped = ''
+        self._text = ''
+        self._block: Optional[list[str]] = None
+
+    def _normalize(self, text: str, final: bool) -> str:
+        # `normalize_text` декодирует UTF-8 представление строки как `unicode_escape`
+        text = self._escaped + self._decoder.decode(text.encode('utf-8'), final)
+        # Обратная косая черта в конце фрагмента может начинать `\n` в следующем
+        cut = len(text) if final else len(text.rstrip('\\'))
+        self._escaped = text[cut:]
+        return text[:cut].replace('\\n', '\n')
+
+    def _remove_html(self, final: bool) -> str:
+        output = []
+        text = self._text
+        while True:
+            if self._block is None:
+                index = text.find(self.HTML_OPEN)
+                if index < 0:
+                    keep = 0 if final else _partial_suffix(text, self.HTML_OPEN)
+                    output.append(text[:len(text) - keep])
+                    text = text[len(text) - keep:]
+                    break
+                output.append(text[:index])
+                text = text[index + len(self.HTML_OPEN):]
+                self._block = []
+            else:
+                index = text.find(self.HTML_CLOSE)
+                if index < 0:
+                    keep = 0 if final else _partial_suffix(text, self.HTML_CLOSE)
+                    self._block.append(text[:len(text) - keep])
+                    text = text[len(text) - keep:]
+                    if final:
+                        # Незакрытый блок, как и у `remove_html_blocks`, остается в тексте
+                        output.append(self.HTML_OPEN + ''.join(self._block))
+                        self._block = None
+                    break
+                text = text[index + len(self.HTML_CLOSE):]
+                self._block = None
+        self._text = text
+        return ''.join(output)
+
+    def feed(self, text: str) -> str:
+        """Принимает очередной фрагмент и возвращает часть, которую уже можно записать."""
+        self._text += self._normalize(text, False)
+        return self._remove_html(False)
+
+    def close(self) -> str:
+        """
+        Завершает поток и возвращает остаток.
+
+        Raises:
+            UnicodeDecodeError: Незавершенная escape-последовательность в конце ответа (как у `normalize_text`).
+        """
+        self._text += self._normalize('', True)
+        return self._remove_html(True)
+
+
+class KeyedGenerativeModel:
+    """`genai.GenerativeModel` со своим API-ключом.
+
+    `genai.configure` задает ключ глобально, а модель берет клиент из текущих настроек
+    при первом запросе (синхронном и асинхронном отдельно) и дальше работает с ним.
+    Поэтому перед первым запросом каждого вида ключ участника задается через `genai.configure`,
+    после запроса восстанавливается ключ по умолчанию. Асинхронный клиент создается в начале
+    `generate_content_async` до первого переключения задач, так что соседние задачи цикла
+    событий не вклиниваются между настройкой ключа и созданием клиента.
+    """
+
+    _configure_lock = threading.Lock()
+
+    def __init__(self, api_key: str, default_api_key: Optional[str] = None, **kwargs):
+        """
+        Args:
+            api_key (str): Ключ участника пула.
+            default_api_key (Optional[str]): Ключ, возвращаемый в `genai.configure` после привязки клиента.
+            **kwargs: Аргументы `genai.GenerativeModel`.
+        """
+        self.api_key = api_key
+        self.default_api_key = default_api_key
+        self.model = genai.GenerativeModel(**kwargs)
+        self._configured: set[str] = set()
+
+    @property
+    def model_name(self) -> str:
+        return self.model.model_name
+
+    def _configure(self, kind: str) -> bool:
+        """Задает ключ участника перед первым запросом вида `kind`. Возвращает True, если ключ был задан."""
+        if kind in self._configured:
+            return False
+        genai.configure(api_key=self.api_key)
+        self._configured.add(kind)
+        return True
+
+    def _restore(self, configured: bool) -> None:
+        if configured and self.default_api_key:
+            genai.configure(api_key=self.default_api_key)
+
+    def _call(self, kind: str, method: Any, *args, **kwargs) -> Any:
+        with self._configure_lock:
+            configured = self._configure(kind)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._restore(configured)
+
+    async def _call_async(self, method: Any, *args, **kwargs) -> Any:
+        with self._configure_lock:
+            configured = self._configure('async')
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            self._restore(configured)
+
+    async def generate_content_async(self, *args, **kwargs):
+        return await self._call_async(self.model.generate_content_async, *args, **kwargs)
+
+    async def count_tokens_async(self, *args, **kwargs):
+        return await self._call_async(self.model.count_tokens_async, *args, **kwargs)
+
+    def generate_content(self, *args, **kwargs):
+        return self._call('sync', self.model.generate_content, *args, **kwargs)
+
+    def count_tokens(self, *args, **kwargs):
+        return self._call('sync', self.model.count_tokens, *args, **kwargs)
+
+    def start_chat(self, *args, **kwargs):
+        return self.model.start_chat(*args, **kwargs)
+
+    def _get_tools_lib(self, tools: Any) -> Any:
+        # Нужен `genai.ChatSession` при отправке сообщения
+        return self.model._get_tools_lib(tools)
+
+
 @dataclass
 class GoogleGenerativeAI:
     """
@@ -75,12 +231,28 @@ class GoogleGenerativeAI:
     model_name: str = field(default="gemini-2.0-flash-exp")
     generation_config: Dict = field(default_factory=lambda: {"response_mime_type": "text/plain"})
     system_instruction: Optional[str] = None
+    response_cache: Optional[ResponseCache] = None
+    history_tail: int = 0
+    retry_engine: Optional[RetryEngine] = None
+    model_pool: Optional[Any] = None
+    context_cache_ttl: int = 0
+    chat_memory: Optional[Any] = None
+    usage: Dict[str, int] = field(default_factory=lambda: {
+        "requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "response_tokens": 0,
+    }, init=False)
+    _cached_content: Any = field(default=None, init=False)
+    _cache_expires: float = field(default=0.0, init=False)
+    _memory: Optional[ChatMemory] = field(default=None, init=False)
+    _turn_lock: Optional[asyncio.Lock] = field(default=None, init=False)
+    _turn_lock_loop: Any = field(default=None, init=False)
     dialogue_log_path: Path = field(init=False)
     dialogue_txt_path: Path = field(init=False)
     history_dir: Path = field(init=False)
     history_txt_file: Path = field(init=False)
     history_json_file: Path = field(init=False)
     chat_history: List[Dict] = field(default_factory=list, init=False)
+    _chat_logs: Dict[str, ChatLog] = field(default_factory=dict, init=False)
+    _active_log: Optional[ChatLog] = field(default=None, init=False)
     model: Any = field(init=False)
     _chat: Any = field(init=False)
 
@@ -99,59 +271,300 @@ class GoogleGenerativeAI:
         self.history_txt_file = self.history_dir / f"gemini_{gs.now}.txt"
         self.history_json_file = self.history_dir / f"gemini_{gs.now}.json"
 
+        if self.retry_engine is None:
+            self.retry_engine = RetryEngine()
+        if self.chat_memory:
+            summarizer = (
+                self.chat_memory.get('summarizer') if isinstance(self.chat_memory, dict)
+                else getattr(self.chat_memory, 'summarizer', None)
+            )
+            self._memory = ChatMemory.from_config(
+                self.chat_memory, summarize=self._summarize_turns if summarizer == 'model' else None
+            )
+
         # Инициализация модели
+        self.model = self._create_model()
+        self._chat = self._start_chat()
+
+    def _create_model(self) -> Any:
+        """Создает клиент модели `genai`. При заданном `model_pool` - пул по нескольким ключам и моделям."""
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(
+        if self.model_pool:
+            return ModelRouter.from_config(self.model_pool, self._create_pool_model)
+        if self.context_cache_ttl and self.system_instruction:
+            model = self._create_cached_model()
+            if model:
+                return model
+        return genai.GenerativeModel(
             model_name=self.model_name, 
             generation_config=self.generation_config,
             system_instruction=self.system_instruction
         )
-        self._chat = self._start_chat()
+
+    def _create_pool_model(self, api_key: str, model_name: str) -> Any:
+        """Клиент модели для участника пула со своим ключом."""
+        return KeyedGenerativeModel(
+            api_key,
+            default_api_key=self.api_key,
+            model_name=model_name,
+            generation_config=self.generation_config,
+            system_instruction=self.system_instruction
+        )
+
+    def _cache_key(self, q: str, context: str = '', model_name: Optional[str] = None) -> str:
+        """
+        Ключ кеша ответов для запроса `q`.
+
+        Args:
+            q (str): Запрос.
+            context (str): Отпечаток истории чата (:meth:`_history_digest`).
+            model_name (Optional[str]): Модель, ответившая на запрос. По умолчанию - :meth:`_served_model`.
+        """
+        return ResponseCache.make_key(
+            model_name or self._served_model(), self.generation_config, self.system_instruction, q, context
+        )
+
+    def _served_model(self) -> str:
+        """Модель, которой ушел последний запрос текущей задачи: с пулом моделей - выбранная пулом."""
+        return (routed_model.get() if self.model_pool else None) or self.model_name
+
+    def _model_names(self) -> List[str]:
+        """Модели, ответ любой из которых подходит для кеша ответов."""
+        return getattr(self.model, 'model_names', None) or [self.model_name]
+
+    def _history_digest(self) -> str:
+        """Отпечаток текущей истории сессии чата: ответ в чате зависит не только от последнего сообщения."""
+        digest = hashlib.sha256()
+        for entry in self._chat.history:
+            digest.update(f"{entry_role(entry)}\x00{entry_text(entry)}\x00".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _create_cached_model(self) -> Any:
+        """
+        Помещает системную инструкцию в контекстный кеш API, чтобы она не передавалась с каждым запросом.
+
+        Returns:
+            Any: Модель, работающая с кешем, или None, если кеш недоступен
+                (например, инструкция меньше минимального размера кеша или модель его не поддерживает).
+        """
+        try:
+            self._cached_content = genai.caching.CachedContent.create(
+                model=f"models/{self.model_name}",
+                display_name="code_assistant_prefix",
+                system_instruction=self.system_instruction,
+                ttl=timedelta(seconds=self.context_cache_ttl),
+            )
+            self._cache_expires = time.monotonic() + self.context_cache_ttl
+            logger.info(f"Системная инструкция помещена в контекстный кеш {self._cached_content.name}")
+            return genai.GenerativeModel.from_cached_content(
+                self._cached_content, generation_config=self.generation_config
+            )
+        except Exception as ex:
+            logger.warning(f"Контекстный кеш недоступен, системная инструкция передается с каждым запросом: {ex}")
+            self._cached_content = None
+            return None
+
+    def _refresh_context_cache(self):
+        """Продлевает контекстный кеш, пока идет работа."""
+        if not self._cached_content or time.monotonic() < self._cache_expires - 60:
+            return
+        try:
+            self._cached_content.update(ttl=timedelta(seconds=self.context_cache_ttl))
+            self._cache_expires = time.monotonic() + self.context_cache_ttl
+        except Exception as ex:
+            logger.error("Ошибка продления контекстного кеша", ex, False)
+
+    def _record_usage(self, response: Any):
+        """Учитывает количество токенов запроса (в том числе взятых из контекстного кеша) и ответа."""
+        metadata = getattr(response, 'usage_metadata', None)
+        if not metadata:
+            return
+        prompt = getattr(metadata, 'prompt_token_count', 0) or 0
+        cached = getattr(metadata, 'cached_content_token_count', 0) or 0
+        answer = getattr(metadata, 'candidates_token_count', 0) or 0
+        self.usage["requests"] += 1
+        self.usage["prompt_tokens"] += prompt
+        self.usage["cached_tokens"] += cached
+        self.usage["response_tokens"] += answer
+        model_metrics.record_tokens(self._served_model(), prompt, cached, answer)
+        logger.debug(f"Токены запроса: {prompt} (из кеша {cached}), ответа: {answer}", None, False)
+
+    def _observed(self, call: Any) -> Any:
+        """Фабрика попытки запроса, записывающая задержку успешного ответа в метрики."""
+        async def request():
+            routed_model.set(None)
+            started = time.perf_counter()
+            result = await call()
+            model_metrics.record_call(self._served_model(), time.perf_counter() - started)
+            return result
+        return request
+
+    def _record_retry(self, ex: BaseException):
+        model_metrics.record_retry(self._served_model(), ex)
+
+    async def _cached_response(self, q: str, context: str = '') -> Optional[str]:
+        """
+        Ответ на запрос `q` из кеша ответов с учетом попадания в метриках.
+        С пулом моделей подходит ответ любой модели пула: попадание и промахи учитываются
+        по модели, чей ответ искали, - так же, как модель входит в ключ кеша.
+        """
+        for model_name in self._model_names():
+            cached = await self.response_cache.get_async(self._cache_key(q, context, model_name))
+            model_metrics.record_cache(model_name, hit=bool(cached))
+            if cached:
+                return cached
+        return None
+
+    @property
+    def prompt_tokens(self) -> Optional[int]:
+        """Оценка размера последнего сообщения чата вместе с отправленной историей (при заданном `chat_memory`)."""
+        return self._memory.prompt_tokens if self._memory else None
+
+    async def _summarize_turns(self, summary: str, turns: List[List[Any]], max_chars: int) -> str:
+        """Сводка вытесненных обменов чата, составленная моделью. При ошибке - извлекающая сводка."""
+        dialogue = '\n'.join(f"{entry_role(entry)}: {entry_text(entry)}" for turn in turns for entry in turn)
+        prompt = (
+            f"Update the summary of an earlier conversation. Keep it under {max_chars} characters, "
+            f"keep facts, decisions and file names. Reply with the summary only.\n\n"
+            f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{dialogue}"
+        )
+        try:
+            response = await self.retry_engine.run(
+                lambda: self.model.generate_content_async(prompt), attempts=3, on_retry=self._record_retry
+            )
+            self._record_usage(response)
+            text = (response.text or '').strip()
+            if text:
+                return text[:max_chars]
+        except Exception as ex:
+            logger.error("Ошибка составления сводки истории чата моделью", ex, False)
+        return await extractive_summary(summary, turns, max_chars)
+
+    async def _fit_history(self, q: str):
+        """Сокращает историю сессии чата до бюджета `chat_memory` перед отправкой `q`."""
+        if not self._memory:
+            return
+        history = self._chat.history
+        fitted = await self._memory.fit(history, q)
+        if fitted is not history:
+            self._chat.history = fitted
+        logger.debug(
+            f"Размер запроса чата: ~{self._memory.prompt_tokens} токенов (история {len(fitted)} реплик)", None, False
+        )
+
+    def _chat_turn(self) -> asyncio.Lock:
+        """
+        Блокировка обмена в сессии чата.
+
+        Сессия (`_chat`), ее история и текущий журнал общие для всех ассистентов клиента,
+        поэтому обмены выполняются по одному: одновременные `send_message_async` в одной
+        сессии перемешали бы историю, а переключение журнала другой роли подменило бы ее.
+        Клиент может пережить цикл событий (несколько `asyncio.run` в одном процессе),
+        поэтому блокировка - своя для каждого цикла. Асинхронный клиент `genai` привязан к циклу
+        первого запроса: проходы :class:`CodeAssistant` выполняются в одном цикле (`run_async`).
+        """
+        loop = asyncio.get_running_loop()
+        if self._turn_lock is None or self._turn_lock_loop is not loop:
+            self._turn_lock = asyncio.Lock()
+            self._turn_lock_loop = loop
+        return self._turn_lock
 
     def _start_chat(self):
-        """Запуск чата с начальной настройкой."""
-        if self.system_instruction:
-            return self.model.start_chat(history=[{"role": "user", "parts": [self.system_instruction]}])
-        else:
-            return self.model.start_chat(history=[])
+        """Запуск чата с начальной настройкой.
+
+        Системная инструкция уже передана модели (`system_instruction`) и в историю не добавляется.
+        """
+        return self.model.start_chat(history=[])
 
     def clear_history(self):
         """
         Очищает историю чата в памяти и удаляет файл истории, если он существует.
         """
         try:
+            if self._active_log:
+                self._active_log.clear()
+                logger.info(f"Файл истории {self._active_log.path} удалён.")
             self.chat_history = []  # Очистка истории в памяти
-            if self.history_json_file.exists():
-                self.history_json_file.unlink()  # Удаление файла истории
-                logger.info(f"Файл истории {self.history_json_file} удалён.")
+            self._chat = self._start_chat()
         except Exception as ex:
             logger.error("Ошибка при очистке истории чата.", ex, False)
 
-    async def _save_chat_history(self, chat_data_folder: Optional[str | Path]):
-        """Сохраняет всю историю чата в JSON файл"""
-        if chat_data_folder:
-            self.history_json_file = Path(chat_data_folder, 'history.json')
-        if self.chat_history:
-            j_dumps(data=self.chat_history, file_path=self.history_json_file, mode="w")
+    def _save_dialogue(self, dialogue: list):
+        """Дописывает реплики диалога в текстовый лог `dialogue_txt_path`."""
+        try:
+            lines = [json.dumps(message, ensure_ascii=False) for messages in dialogue for message in messages]
+            save_text_file(lines, self.dialogue_txt_path, mode="a", exc_info=False)
+        except Exception as ex:
+            logger.error("Ошибка записи диалога в лог.", ex, False)
+
+    def _get_chat_log(self, chat_data_folder: Optional[str | Path]) -> ChatLog:
+        """Журнал истории для папки `chat_data_folder`. Один экземпляр на папку за все время жизни клиента."""
+        folder = Path(chat_data_folder) if chat_data_folder else self.history_dir
+        key = str(folder)
+        if key not in self._chat_logs:
+            self._chat_logs[key] = ChatLog(folder, tail_size=self.history_tail)
+        return self._chat_logs[key]
+
+    def _activate_chat_log(self, chat_log: ChatLog):
+        """Делает журнал текущим и восстанавливает из его хвоста историю сессии чата."""
+        self.chat_history = chat_log.entries
+        self.history_json_file = chat_log.path
+        self._chat = self._start_chat()
+        self._chat.history.extend(self.chat_history)
+        self._active_log = chat_log
+        if self._memory:
+            self._memory.reset()
+
+    async def _save_chat_history(self, chat_data_folder: Optional[str | Path], *entries: Dict):
+        """Дописывает новые реплики в журнал истории чата (одна дозапись на реплику, без перезаписи файла)"""
+        self._get_chat_log(chat_data_folder).append(*entries)
 
     async def _load_chat_history(self, chat_data_folder: Optional[str | Path]):
-        """Загружает историю чата из JSON файла"""
+        """Загружает историю чата с диска только при начале сессии; дальше используется хвост в памяти"""
         try:
-            if chat_data_folder:
-                self.history_json_file = Path(chat_data_folder, 'history.json')
-
-            if self.history_json_file.exists():
-                self.chat_history = j_loads(self.history_json_file)
-                self._chat = self._start_chat()
-                for entry in self.chat_history:
-                    self._chat.history.append(entry)
-                logger.info(f"История чата загружена из файла. \n{self.history_json_file=}", None, False)
+            chat_log = self._get_chat_log(chat_data_folder)
+            if chat_log is self._active_log:
+                return
+            was_loaded = chat_log.loaded
+            chat_log.load()
+            self._activate_chat_log(chat_log)
+            if not was_loaded:
+                logger.info(f"История чата загружена из файла. \n{chat_log.path=}", None, False)
         except Exception as ex:
             logger.error(f"Ошибка загрузки истории чата из файла {self.history_json_file=}", ex, False)
 
+    async def _reset_chat_history(self, chat_data_folder: Optional[str | Path], archive: bool = False):
+        """Начинает новую историю. При `archive=True` прошлая история переносится в архив, иначе удаляется"""
+        chat_log = self._get_chat_log(chat_data_folder)
+        if archive:
+            archive_path = chat_log.archive()
+            if archive_path:
+                print(f"Сохранил прошлую историю в {archive_path}", text_color='gray')
+        else:
+            chat_log.clear()
+        self._activate_chat_log(chat_log)
+
+    async def _prepare_chat(self, chat_data_folder: Optional[str | Path], flag: str) -> None:
+        """Подготавливает историю чата в соответствии с режимом `flag` (см. :meth:`chat`)."""
+        if flag == "save_chat":
+            await self._load_chat_history(chat_data_folder)
+
+        elif flag == "read_and_clear":
+            print(f"Прочитал историю чата и начал новый", text_color='gray')
+            await self._reset_chat_history(chat_data_folder, archive=False)
+
+        elif flag in ("read_and_start_new", "start_new"):
+            print(f"Прочитал историю чата, сохранил и начал новый", text_color='gray')
+            await self._reset_chat_history(chat_data_folder, archive=True)
+
+        elif flag == "clear":
+            print(f"Вытер прошлую историю")
+            await self._reset_chat_history(chat_data_folder, archive=False)
+
     async def chat(self, q: str, chat_data_folder: Optional[str | Path], flag: str = "save_chat") -> Optional[str]:
         """
         Обрабатывает чат-запрос с различными режимами управления историей чата.
+        Обмены в сессии выполняются по одному (:meth:`_chat_turn`).
 
         Args:
             q (str): Вопрос пользователя.
@@ -162,139 +575,206 @@ class GoogleGenerativeAI:
         Returns:
             Optional[str]: Ответ модели.
         """
-        response = None
-        try:
-            if flag == "save_chat":
-                await self._load_chat_history(chat_data_folder)
-
-            if flag == "read_and_clear":
-                print(f"Прочитал историю чата и начал новый", text_color='gray')
-                await self._load_chat_history(chat_data_folder)
-                self.chat_history = []  # Очистить историю
-
-            if flag == "read_and_start_new":
-                print(f"Прочитал историю чата, сохранил и начал новый", text_color='gray')
-                await self._load_chat_history(chat_data_folder)
-                self.chat_history = []  # Очистить историю
-                flag = "start_new"
-                
-
-            elif flag == "clear":
-                print(f"Вытер прошлую историю")
-                self.chat_history = []  # Очистить историю
-                
-
-            elif flag == "start_new":
-                
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                print(f"Сохранил прошлую историю в {timestamp}", text_color='gray')
-                archive_file = self.history_dir / f"history_{timestamp}.json"
-                if self.chat_history:
-                    j_dumps(data=self.chat_history, file_path=archive_file, mode="w")
-                self.chat_history = []  # Начать новую историю
-                
-
-
-            # Отправить запрос модели
-            response = await self._chat.send_message_async(q)
-            if response and response.text:
-                response_text = normalize_text(response.text)
-                response_text = remove_html_blocks(response_text)
-
-                self.chat_history.append({"role": "user", "parts": [q]})
-                self.chat_history.append({"role": "model", "parts": [response_text]})
-                await self._save_chat_history(chat_data_folder)
-                return response_text
-            else:
+        async with self._chat_turn():
+            response = None
+            try:
+                await self._prepare_chat(chat_data_folder, flag)
+
+                # Ответ на такой же запрос с той же историей уже мог быть получен ранее
+                history = self._history_digest() if self.response_cache else None
+                if history:
+                    cached = await self._cached_response(q, history)
+                    if cached:
+                        turn = ({"role": "user", "parts": [q]}, {"role": "model", "parts": [cached]})
+                        self._chat.history.extend(turn)
+                        await self._save_chat_history(chat_data_folder, *turn)
+                        return cached
+
+                # Отправить запрос модели
+                await self._fit_history(q)
+                self._refresh_context_cache()
+                response = await self.retry_engine.run(
+                    self._observed(lambda: self._chat.send_message_async(q)), on_retry=self._record_retry
+                )
+                self._record_usage(response)
+                if response and response.text:
+                    response_text = normalize_text(response.text)
+                    response_text = remove_html_blocks(response_text)
+
+                    await self._save_chat_history(
+                        chat_data_folder,
+                        {"role": "user", "parts": [q]},
+                        {"role": "model", "parts": [response_text]},
+                    )
+                    if history:
+                        await self.response_cache.set_async(self._cache_key(q, history), response_text)
+                    return response_text
+                else:
+                    logger.error("Empty response in chat", None, False)
+                    return
+
+            except Exception as ex:
+                model_metrics.record_error(self._served_model(), ex)
+                logger.error(f"Ошибка чата:\n {response=}", ex, False)
+                return
+
+
+
+    async def chat_stream(
+        self, q: str, chat_data_folder: Optional[str | Path], flag: str = "save_chat"
+    ) -> AsyncIterator[str]:
+        """
+        Потоковый вариант :meth:`chat`: отдает фрагменты ответа по мере генерации.
+
+        Повтор при ошибке возможен только до получения первого фрагмента. Фрагменты
+        нормализуются на лету; полный ответ сохраняется в историю и кеш после окончания потока. Блокировка обмена (:meth:`_chat_turn`) удерживается до конца потока.
+
+        Args:
+            q (str): Вопрос пользователя.
+            chat_data_folder (Optional[str | Path]): Папка для хранения истории чата.
+            flag (str): Режим управления историей (см. :meth:`chat`).
+
+        Yields:
+            str: Фрагменты ответа модели.
+        """
+        async with self._chat_turn():
+            await self._prepare_chat(chat_data_folder, flag)
+
+            history = self._history_digest() if self.response_cache else None
+            if history:
+                cached = await self._cached_response(q, history)
+                if cached:
+                    turn = ({"role": "user", "parts": [q]}, {"role": "model", "parts": [cached]})
+                    self._chat.history.extend(turn)
+                    await self._save_chat_history(chat_data_folder, *turn)
+                    yield cached
+                    return
+
+            await self._fit_history(q)
+            parts = []
+            async for text in self._stream_response(lambda: self._chat.send_message_async(q, stream=True), parts):
+                yield text
+
+            response_text = ''.join(parts)
+            if not response_text:
                 logger.error("Empty response in chat", None, False)
                 return
+            await self._save_chat_history(
+                chat_data_folder,
+                {"role": "user", "parts": [q]},
+                {"role": "model", "parts": [response_text]},
+            )
+            if history:
+                await self.response_cache.set_async(self._cache_key(q, history), response_text)
 
+    async def _stream_response(self, send: Any, parts: List[str]) -> AsyncIterator[str]:
+        """
+        Отправляет потоковый запрос с повторами и отдает фрагменты ответа, собирая их в `parts`.
+        Фрагменты нормализуются на лету (:class:`ResponseNormalizer`), как и ответ :meth:`ask`.
+
+        Args:
+            send (Any): Фабрика корутины запроса с `stream=True`.
+            parts (List[str]): Список, в который добавляются отданные фрагменты.
+        """
+        self._refresh_context_cache()
+        started = time.perf_counter()
+        chunk = None
+        normalizer = ResponseNormalizer()
+        try:
+            response = await self.retry_engine.run(send, on_retry=self._record_retry)
+            async for chunk in response:
+                text = normalizer.feed(chunk.text or '')
+                if text:
+                    parts.append(text)
+                    yield text
+            text = normalizer.close()
+            if text:
+                parts.append(text)
+                yield text
         except Exception as ex:
-            logger.error(f"Ошибка чата:\n {response=}", ex, False)
-            return
+            model_metrics.record_error(self._served_model(), ex)
+            raise
+        # Задержка потока - до последнего фрагмента; итоговые счетчики токенов приходят с ним же
+        model_metrics.record_call(self._served_model(), time.perf_counter() - started)
+        self._record_usage(chunk)
 
-        finally:
-            if flag == "save_chat":
-                await self._save_chat_history(chat_data_folder)
+    async def ask_stream(self, q: str) -> AsyncIterator[str]:
+        """
+        Потоковый вариант :meth:`ask`: один запрос без истории чата, фрагменты отдаются по мере генерации.
 
+        Yields:
+            str: Фрагменты ответа модели.
+        """
+        if self.response_cache:
+            cached = await self._cached_response(q)
+            if cached:
+                yield cached
+                return
 
+        parts = []
+        async for text in self._stream_response(lambda: self.model.generate_content_async(q, stream=True), parts):
+            yield text
+
+        response_text = ''.join(parts)
+        if not response_text:
+            logger.error("Empty response from the model", None, False)
+            return
+        self._save_dialogue([[
+            {"role": "user", "content": q},
+            {"role": "model", "content": response_text},
+        ]])
+        if self.response_cache:
+            await self.response_cache.set_async(self._cache_key(q), response_text)
 
     async def ask(self, q: str, attempts: int = 15) -> Optional[str]:
         """
         Метод отправляет текстовый запрос модели и возвращает ответ.
+
+        Повторы при ошибках выполняются :class:`RetryEngine` без блокировки цикла событий.
         """
-        for attempt in range(attempts):
-            try:
-                response = await self.model.generate_content_async(q)
-               
-                if not response.text:
-                    logger.debug(
-                        f"No response from the model. Attempt: {attempt}\nSleeping for {2 ** attempt}",
-                        None,
-                        False
-                    )
-                    time.sleep(2**attempt)
-                    continue  # Повторить попытку
-                response_text = normalize_text(response.text)
-                response_text = remove_html_blocks(response.text)
-                messages = [
-                    {"role": "user", "content": q},
-                    {"role": "model", "content": response_text},
-                ]
+        if self.response_cache:
+            cached = await self._cached_response(q)
+            if cached:
+                return cached
+
+        async def request():
+            response = await self.model.generate_content_async(q)
+            if not response.text:
+                raise EmptyResponseError("No response from the model")
+            return response
 
-                self._save_dialogue([messages])
-                return response_text
+        try:
+            self._refresh_context_cache()
+            response = await self.retry_engine.run(self._observed(request), attempts, on_retry=self._record_retry)
+            self._record_usage(response)
+        except CircuitOpenError as ex:
+            model_metrics.record_error(self._served_model(), ex)
+            logger.error("Запрос не отправлен:", ex, False)
+            return
+        except (DefaultCredentialsError, RefreshError) as ex:
+            model_metrics.record_error(self._served_model(), ex)
+            logger.error("Authentication error:", ex, False)
+            return
+        except (InvalidArgument, RpcError) as ex:
+            model_metrics.record_error(self._served_model(), ex)
+            logger.error("API error:", ex, False)
+            return
+        except Exception as ex:
+            model_metrics.record_error(self._served_model(), ex)
+            logger.error("Ошибка запроса к модели, попытки исчерпаны:", ex, False)
+            return
 
-            except requests.exceptions.RequestException as ex:
-                max_attempts = 5
-                if attempt > max_attempts:
-                    break
-                logger.debug(
-                    f"Network error. Attempt: {attempt}\nSleeping for {timeout/60} min on {gs.now}",
-                    ex,
-                    False,
-                )
-                time.sleep(1200)
-                continue  # Повторить попытку
-            except (GatewayTimeout, ServiceUnavailable) as ex:
-                logger.error("Service unavailable:", ex, False)
-                # Экспоненциальный бэк-офф для повторных попыток
-                max_attempts = 3
-                if attempt > max_attempts:
-                    break
-                time.sleep(2**attempt + 10)
-                continue
-            except ResourceExhausted as ex:
-                logger.debug(
-                    f"Quota exceeded. Attempt: {attempt}\nSleeping for {timeout/60} min on {gs.now}",
-                    ex,
-                    False,
-                )
-                time.sleep(10800)
-                continue
-            except (DefaultCredentialsError, RefreshError) as ex:
-                logger.error("Authentication error:", ex, False)
-                return  # Прекратить попытки, если ошибка аутентификации
-            except (ValueError, TypeError) as ex:
-                max_attempts = 3
-                if attempt > max_attempts:
-                    break
-                timeout = 5
-                logger.error(
-                    f"Invalid input: Attempt: {attempt}\nSleeping for {timeout/60} min on {gs.now}",
-                    ex,
-                    None,
-                )
-                time.sleep(timeout)
-                continue
-            except (InvalidArgument, RpcError) as ex:
-                logger.error("API error:", ex, False)
-                return
-            except Exception as ex:
-                logger.error("Unexpected error:", ex, False)
-                return
+        response_text = normalize_text(response.text)
+        response_text = remove_html_blocks(response_text)
+        messages = [
+            {"role": "user", "content": q},
+            {"role": "model", "content": response_text},
+        ]
 
-        return
+        self._save_dialogue([messages])
+        if self.response_cache:
+            await self.response_cache.set_async(self._cache_key(q), response_text)
+        return response_text
 
 
     async def describe_image(
@@ -313,6 +793,9 @@ class GoogleGenerativeAI:
         try:
             # Подготовка контента для запроса
             if isinstance(image, Path):
+                # PIL и aiohttp нужны только для изображений
+                from src.utils.image import get_image_bytes
+
                 image = get_image_bytes(image)
 
             content = \
@@ -0,0 +1,246 @@
+## \file /src/ai/gemini/metrics.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.metrics
+	:platform: Windows, Unix
+	:synopsis: Метрики обращений к модели: токены, задержки, повторы, попадания в кеш, стоимость
+
+:class:`GoogleGenerativeAI` записывает каждое обращение в общий для процесса
+:data:`model_metrics`. Метрики группируются по роли, языку и модели. Роль и язык
+берутся из контекста задачи (:func:`set_labels`), поэтому клиент модели может быть
+общим для нескольких ассистентов.
+
+По окончании прохода снимок сохраняется в JSON и в текстовый файл формата Prometheus
+(для `textfile`-коллектора `node_exporter`).
+"""
+
+import json
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Роль и язык текущей задачи
+_labels: ContextVar[Dict[str, str]] = ContextVar('model_metrics_labels', default={})
+
+QUANTILES = (0.5, 0.9, 0.99)
+# Количество последних задержек, по которым считаются процентили
+LATENCY_WINDOW = 10000
+
+
+def set_labels(**labels: str) -> None:
+    """Задает метки (`role`, `lang`) для обращений к модели из текущей задачи."""
+    _labels.set(labels)
+
+
+def percentile(values: list[float], quantile: float) -> float:
+    """Процентиль по ближайшему рангу."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(quantile * len(ordered)) - 1))]
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки Prometheus."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Series:
+    """Счетчики одной комбинации роль/язык/модель."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.response_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.latency_sum = 0.0
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+
+class ModelMetrics:
+    """
+    .. :class:`ModelMetrics`
+        :synopsis: Сбор и выгрузка метрик обращений к модели
+    """
+
+    def __init__(self):
+        self.series: Dict[tuple[str, str, str], _Series] = {}
+        self.prices: Dict[str, Dict[str, float]] = {}
+        self.started = time.time()
+
+    def configure(self, config: Any) -> None:
+        """
+        Применяет секцию `metrics` конфигурации.
+
+        Args:
+            config (dict | SimpleNamespace): `prices` - цены за миллион токенов по моделям:
+                `{"gemini-1.5-flash": {"input": 0.075, "cached": 0.01875, "output": 0.3}}`.
+        """
+        prices = getattr(config, 'prices', None) if not isinstance(config, dict) else config.get('prices')
+        prices = vars(prices) if prices is not None and not isinstance(prices, dict) else prices or {}
+        self.prices = {
+            model: dict(vars(values) if not isinstance(values, dict) else values)
+            for model, values in prices.items()
+        }
+
+    def _series(self, model: str) -> _Series:
+        labels = _labels.get()
+        key = (labels.get('role', ''), labels.get('lang', ''), model)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _Series()
+        return series
+
+    def record_call(self, model: str, seconds: float) -> None:
+        """Успешный ответ модели за `seconds` секунд."""
+        series = self._series(model)
+        series.requests += 1
+        series.latency_sum += seconds
+        series.latencies.append(seconds)
+
+    def record_tokens(self, model: str, prompt: int, cached: int, response: int) -> None:
+        """Токены запроса (в том числе из контекстного кеша) и ответа по `usage_metadata`."""
+        series = self._series(model)
+        series.prompt_tokens += prompt
+        series.cached_tokens += cached
+        series.response_tokens += response
+
+    def record_retry(self, model: str, ex: BaseException) -> None:
+        """Повтор запроса после ошибки."""
+        series = self._series(model)
+        name = type(ex).__name__
+        series.retries[name] = series.retries.get(name, 0) + 1
+
+    def record_error(self, model: str, ex: BaseException) -> None:
+        """Запрос завершился ошибкой после всех повторов."""
+        series = self._series(model)
+        name = type(ex).__name__
+        series.errors[name] = series.errors.get(name, 0) + 1
+
+    def record_cache(self, model: str, hit: bool) -> None:
+        """Обращение к кешу ответов."""
+        series = self._series(model)
+        if hit:
+            series.cache_hits += 1
+        else:
+            series.cache_misses += 1
+
+    def reset(self) -> None:
+        """Сбрасывает накопленные значения."""
+        self.series = {}
+        self.started = time.time()
+
+    def _cost(self, model: str, series: _Series) -> Optional[float]:
+        """Оценка стоимости в единицах цены `prices` или None, если цена модели не задана."""
+        price = self.prices.get(model)
+        if not price:
+            return None
+        uncached = series.prompt_tokens - series.cached_tokens
+        return (
+            uncached * price.get('input', 0)
+            + series.cached_tokens * price.get('cached', price.get('input', 0))
+            + series.response_tokens * price.get('output', 0)
+        ) / 1_000_000
+
+    def snapshot(self) -> dict:
+        """Текущие значения, сгруппированные по роли, языку и модели."""
+        items = []
+        for (role, lang, model), series in sorted(self.series.items()):
+            latencies = list(series.latencies)
+            lookups = series.cache_hits + series.cache_misses
+            cost = self._cost(model, series)
+            items.append({
+                'role': role,
+                'lang': lang,
+                'model': model,
+                'requests': series.requests,
+                'errors': dict(series.errors),
+                'retries': dict(series.retries),
+                'prompt_tokens': series.prompt_tokens,
+                'cached_tokens': series.cached_tokens,
+                'response_tokens': series.response_tokens,
+                'cache_hits': series.cache_hits,
+                'cache_misses': series.cache_misses,
+                'cache_hit_ratio': round(series.cache_hits / lookups, 3) if lookups else None,
+                'latency_seconds': {
+                    'sum': round(series.latency_sum, 3),
+                    'mean': round(series.latency_sum / series.requests, 3) if series.requests else None,
+                    **{f"p{int(quantile * 100)}": round(percentile(latencies, quantile), 3) for quantile in QUANTILES},
+                },
+                'cost': round(cost, 6) if cost is not None else None,
+            })
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'series': items,
+        }
+
+    def prometheus(self, prefix: str = 'code_assistant_model') -> str:
+        """Значения в текстовом формате Prometheus."""
+        metrics: Dict[str, tuple[str, str, list[str]]] = {}
+
+        def add(name: str, kind: str, help: str, labels: Dict[str, str], value: float, suffix: str = '') -> None:
+            name = f"{prefix}_{name}"
+            label_text = ','.join(f'{key}="{_escape(item)}"' for key, item in labels.items())
+            metrics.setdefault(name, (kind, help, []))[2].append(f"{name}{suffix}{{{label_text}}} {value}")
+
+        for (role, lang, model), series in sorted(self.series.items()):
+            labels = {'role': role, 'lang': lang, 'model': model}
+            add('requests_total', 'counter', 'Успешные ответы модели', labels, series.requests)
+            for name, count in sorted(series.errors.items()):
+                add('errors_total', 'counter', 'Запросы, завершившиеся ошибкой', {**labels, 'error': name}, count)
+            for name, count in sorted(series.retries.items()):
+                add('retries_total', 'counter', 'Повторы запросов по классу ошибки', {**labels, 'error': name}, count)
+            add('prompt_tokens_total', 'counter', 'Токены запросов', labels, series.prompt_tokens)
+            add('cached_tokens_total', 'counter', 'Токены запросов из контекстного кеша', labels, series.cached_tokens)
+            add('response_tokens_total', 'counter', 'Токены ответов', labels, series.response_tokens)
+            add('cache_hits_total', 'counter', 'Попадания в кеш ответов', labels, series.cache_hits)
+            add('cache_misses_total', 'counter', 'Промахи кеша ответов', labels, series.cache_misses)
+            latencies = list(series.latencies)
+            for quantile in QUANTILES:
+                add(
+                    'latency_seconds', 'summary', 'Задержка ответа модели',
+                    {**labels, 'quantile': str(quantile)}, round(percentile(latencies, quantile), 6),
+                )
+            add('latency_seconds', 'summary', '', labels, round(series.latency_sum, 6), '_sum')
+            add('latency_seconds', 'summary', '', labels, series.requests, '_count')
+            cost = self._cost(model, series)
+            if cost is not None:
+                add('cost_total', 'counter', 'Оценка стоимости запросов', labels, round(cost, 6))
+
+        lines = []
+        for name, (kind, help, samples) in metrics.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def export(self, json_path: Optional[str | Path] = None, prometheus_path: Optional[str | Path] = None) -> None:
+        """
+        Сохраняет снимок в JSON и в текстовый файл Prometheus.
+        Файлы заменяются целиком, чтобы коллектор не прочитал частично записанный файл.
+        """
+        for path, text in (
+            (json_path, lambda: json.dumps(self.snapshot(), ensure_ascii=False, indent=2)),
+            (prometheus_path, self.prometheus),
+        ):
+            if not path:
+                continue
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + '.tmp')
+            tmp_path.write_text(text(), encoding='utf-8')
+            os.replace(tmp_path, path)
+
+
+model_metrics = ModelMetrics()
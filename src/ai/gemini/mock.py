@@ -0,0 +1,295 @@
+## \file /src/ai/gemini/mock.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.mock
+	:platform: Windows, Unix
+	:synopsis: Локальная имитация `gemini` для нагрузочного тестирования без сети и без расхода квоты
+
+:class:`MockGenerativeAI` - подкласс :class:`GoogleGenerativeAI`, в котором клиент `genai`
+заменен на :class:`MockGenerativeModel`. Методы `chat`, `ask`, `describe_image` и `upload_file`
+проходят через тот же код (история, кеш ответов, повторы), что и с настоящей моделью.
+
+Профиль имитации задается секцией `mock_backend` конфигурации:
+
+- `latency`: распределение задержки ответа - `fixed`, `uniform`, `normal` или `lognormal`
+  (`median_ms`, `min_ms`, `max_ms`, `stddev_ms`, `sigma`);
+- `response`: размер ответа относительно запроса (`ratio`, `min_chars`, `max_chars`);
+- `errors`: доли запросов, завершающихся `ResourceExhausted`, `ServiceUnavailable` или пустым ответом;
+- `seed`: зерно генератора для воспроизводимых прогонов.
+"""
+
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from io import IOBase
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+
+from src.logger.logger import logger
+from .generative_ai import GoogleGenerativeAI
+from .model_router import ModelRouter
+
+# Разделители пакетного запроса (`src.assistant.packer`) повторяются в ответе,
+# чтобы пакеты разбирались так же, как с настоящей моделью
+_FILE_MARKER = re.compile(r'<<<FILE (\d+)(?::[^>\n]*)?>>>')
+
+
+def _section(config: Any, name: str) -> Dict:
+    """Подсекция профиля как словарь (профиль может быть `dict` или `SimpleNamespace`)."""
+    value = config.get(name) if isinstance(config, dict) else getattr(config, name, None)
+    if isinstance(value, SimpleNamespace):
+        value = vars(value)
+    return value or {}
+
+
+class MockProfile:
+    """
+    .. :class:`MockProfile`
+        :synopsis: Случайные задержки, размеры ответов и ошибки по профилю из конфигурации
+    """
+
+    def __init__(self, config: Any = None):
+        """
+        Args:
+            config (dict | SimpleNamespace): Секция `mock_backend` конфигурации.
+        """
+        config = config or {}
+        self.latency = {'distribution': 'lognormal', 'median_ms': 800, 'sigma': 0.5, 'min_ms': 0, 'max_ms': 60000}
+        self.latency.update(_section(config, 'latency'))
+        self.response = {'ratio': 1.0, 'min_chars': 200, 'max_chars': 20000}
+        self.response.update(_section(config, 'response'))
+        self.errors = {'resource_exhausted': 0.0, 'service_unavailable': 0.0, 'empty': 0.0}
+        self.errors.update(_section(config, 'errors'))
+        seed = config.get('seed') if isinstance(config, dict) else getattr(config, 'seed', None)
+        self._random = random.Random(seed)
+
+    def delay(self) -> float:
+        """Задержка ответа в секундах."""
+        latency = self.latency
+        median = latency['median_ms']
+        distribution = latency['distribution']
+        if distribution == 'fixed':
+            value = median
+        elif distribution == 'uniform':
+            value = self._random.uniform(latency['min_ms'], latency['max_ms'])
+        elif distribution == 'normal':
+            value = self._random.gauss(median, latency.get('stddev_ms', median / 4))
+        elif distribution == 'lognormal':
+            value = median * self._random.lognormvariate(0, latency['sigma'])
+        else:
+            raise ValueError(f"Неизвестное распределение задержки: {distribution}")
+        return min(max(value, latency['min_ms']), latency['max_ms']) / 1000
+
+    def response_size(self, prompt_size: int) -> int:
+        """Длина ответа в символах для запроса длиной `prompt_size`."""
+        size = int(prompt_size * self.response['ratio'])
+        return min(max(size, self.response['min_chars']), self.response['max_chars'])
+
+    def outcome(self) -> Optional[str]:
+        """Исход запроса: `None` - успешный ответ, иначе имя ошибки из `errors`."""
+        roll = self._random.random()
+        for name, rate in self.errors.items():
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+
+@dataclass
+class MockUsage:
+    """Аналог `usage_metadata` ответа `genai` (оценка ~4 символа на токен)."""
+    prompt_token_count: int
+    candidates_token_count: int
+    cached_content_token_count: int = 0
+
+    @property
+    def total_token_count(self) -> int:
+        return self.prompt_token_count + self.candidates_token_count
+
+
+@dataclass
+class MockResponse:
+    """Аналог ответа `genai` с полями `text` и `usage_metadata`."""
+    text: str
+    usage_metadata: MockUsage
+
+
+class MockStreamResponse:
+    """Аналог потокового ответа `genai`: фрагменты `chunk_chars` символов с задержкой между ними."""
+
+    def __init__(self, response: MockResponse, delay: float, chunk_chars: int = 200):
+        self.response = response
+        self.delay = delay
+        self.chunk_chars = chunk_chars
+        self.on_complete = None
+
+    async def __aiter__(self):
+        text = self.response.text
+        pieces = [text[index:index + self.chunk_chars] for index in range(0, len(text), self.chunk_chars)]
+        for piece in pieces:
+            await asyncio.sleep(self.delay / max(1, len(pieces)))
+            yield SimpleNamespace(text=piece, usage_metadata=self.response.usage_metadata)
+        if self.on_complete:
+            self.on_complete(text)
+
+
+def _content_chars(contents: Any) -> int:
+    """Количество символов в сообщениях запроса без построения `repr` всей истории."""
+    if isinstance(contents, list):
+        return sum(_content_chars(item) for item in contents)
+    if isinstance(contents, dict):
+        return _content_chars(contents.get('parts', ''))
+    return len(contents) if isinstance(contents, str) else len(str(contents))
+
+
+class MockChatSession:
+    """Аналог `genai.ChatSession`: история и `send_message_async`."""
+
+    def __init__(self, model: 'MockGenerativeModel', history: Optional[List] = None):
+        self.model = model
+        self.history = list(history or [])
+        # Размер истории ведется нарастающим итогом, чтобы не пересчитывать ее на каждое сообщение
+        self._history_chars = _content_chars(self.history)
+        self._history_length = len(self.history)
+
+    def _append(self, content: str, text: str) -> None:
+        self.history.extend([
+            {"role": "user", "parts": [content]},
+            {"role": "model", "parts": [text]},
+        ])
+
+    def _chars(self) -> int:
+        # История может быть изменена снаружи (как у `genai.ChatSession`)
+        if len(self.history) < self._history_length:
+            self._history_chars, self._history_length = 0, 0
+        self._history_chars += _content_chars(self.history[self._history_length:])
+        self._history_length = len(self.history)
+        return self._history_chars
+
+    async def send_message_async(self, content: str, stream: bool = False) -> Any:
+        # Как и `genai`, модель получает всю историю вместе с новым сообщением
+        contents = self.history + [{"role": "user", "parts": [content]}]
+        response = await self.model.generate_content_async(
+            contents, stream=stream, prompt_chars=self._chars() + len(content)
+        )
+        if stream:
+            response.on_complete = lambda text: self._append(content, text)
+            return response
+        self._append(content, response.text)
+        return response
+
+
+class MockGenerativeModel:
+    """Аналог `genai.GenerativeModel`, отвечающий по профилю :class:`MockProfile`."""
+
+    def __init__(
+        self,
+        model_name: str,
+        generation_config: Optional[Dict] = None,
+        system_instruction: Optional[str] = None,
+        profile: Optional[MockProfile] = None,
+    ):
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.system_instruction = system_instruction
+        self.profile = profile or MockProfile()
+
+    def start_chat(self, history: Optional[List] = None) -> MockChatSession:
+        return MockChatSession(self, history)
+
+    def _respond(self, contents: Any, prompt_chars: Optional[int] = None) -> MockResponse:
+        """Формирует ответ или поднимает ошибку по профилю.
+
+        Размер ответа считается по последнему сообщению, а токены запроса - по всей истории
+        и системной инструкции, как их считает API.
+        """
+        message = contents[-1] if isinstance(contents, list) and contents else contents
+        prompt = str(message.get('parts', message) if isinstance(message, dict) else message)
+        outcome = self.profile.outcome()
+        if outcome == 'resource_exhausted':
+            raise ResourceExhausted("mock: quota exceeded")
+        if outcome == 'service_unavailable':
+            raise ServiceUnavailable("mock: service unavailable")
+        text = '' if outcome == 'empty' else self._make_text(prompt)
+        if prompt_chars is None:
+            prompt_chars = _content_chars(contents)
+        prompt_tokens = (prompt_chars + len(self.system_instruction or '')) // 4 + 1
+        return MockResponse(text=text, usage_metadata=MockUsage(prompt_tokens, len(text) // 4))
+
+    def _make_text(self, prompt: str) -> str:
+        """Текст ответа нужной длины; для пакетного запроса - блок на каждый файл."""
+        size = self.profile.response_size(len(prompt))
+        indexes = [int(index) for index in _FILE_MARKER.findall(prompt)]
+        if not indexes:
+            return self._filler(size)
+        part = max(1, size // len(indexes))
+        return '\n'.join(
+            f"<<<FILE {index}: mock>>>\n{self._filler(part)}\n<<<END FILE {index}>>>" for index in indexes
+        )
+
+    @staticmethod
+    def _filler(size: int) -> str:
+        line = "mock response line\n"
+        return (line * (size // len(line) + 1))[:size]
+
+    async def generate_content_async(
+        self, contents: Any, stream: bool = False, prompt_chars: Optional[int] = None, **kwargs
+    ) -> MockResponse | MockStreamResponse:
+        if stream:
+            # Первый фрагмент приходит после небольшой части задержки, остальное - по мере генерации
+            delay = self.profile.delay()
+            await asyncio.sleep(delay * 0.1)
+            return MockStreamResponse(self._respond(contents, prompt_chars), delay * 0.9)
+        await asyncio.sleep(self.profile.delay())
+        return self._respond(contents, prompt_chars)
+
+    def generate_content(self, contents: Any, **kwargs) -> MockResponse:
+        time.sleep(self.profile.delay())
+        return self._respond(contents)
+
+    async def count_tokens_async(self, content: Any) -> SimpleNamespace:
+        return SimpleNamespace(total_tokens=len(str(content)) // 4 + 1)
+
+
+@dataclass
+class MockGenerativeAI(GoogleGenerativeAI):
+    """
+    .. :class:`MockGenerativeAI`
+        :synopsis: `GoogleGenerativeAI` без сети: ответы, задержки и ошибки генерируются локально
+    """
+    api_key: str = ''
+    mock_config: Any = None
+    profile: MockProfile = field(init=False)
+
+    def _create_model(self) -> MockGenerativeModel | ModelRouter:
+        """Создает локальную имитацию модели вместо клиента `genai`."""
+        self.profile = MockProfile(self.mock_config)
+        logger.info(f"Используется имитация модели {self.model_name} (mock_backend)")
+        if self.model_pool:
+            # Ключи имитации не нужны - в пул попадают все перечисленные переменные окружения
+            return ModelRouter.from_config(self.model_pool, self._create_pool_model, resolve_key=lambda name: name)
+        return self._create_pool_model(self.api_key, self.model_name)
+
+    def _create_pool_model(self, api_key: str, model_name: str) -> MockGenerativeModel:
+        return MockGenerativeModel(
+            model_name=model_name,
+            generation_config=self.generation_config,
+            system_instruction=self.system_instruction,
+            profile=self.profile,
+        )
+
+    async def upload_file(self, file: str | Path | IOBase, file_name: Optional[str] = None) -> SimpleNamespace:
+        """Имитирует загрузку файла: задержка по профилю и описание файла как у `genai.upload_file`."""
+        await asyncio.sleep(self.profile.delay())
+        size = len(file.read()) if isinstance(file, IOBase) else Path(file).stat().st_size
+        name = file_name or Path(getattr(file, 'name', str(file))).name
+        logger.debug(f"Файл {name} записан (mock)", None, False)
+        return SimpleNamespace(name=f"files/{name}", display_name=name, size_bytes=size, state='ACTIVE')
@@ -0,0 +1,241 @@
+## \file /src/ai/gemini/model_router.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.model_router
+	:platform: Windows, Unix
+	:synopsis: Распределение запросов по нескольким API-ключам и моделям с учетом квот
+
+:class:`ModelRouter` подставляется в :class:`GoogleGenerativeAI` вместо одного
+`genai.GenerativeModel` и повторяет его интерфейс (`generate_content_async`,
+`generate_content`, `start_chat`, `count_tokens_async`). Каждый участник пула -
+пара (ключ, модель) со своими лимитами запросов и токенов в минуту, которые
+учитываются по скользящему окну. Запрос уходит наименее загруженному участнику.
+Участник, ответивший `ResourceExhausted`, выводится из ротации до конца окна квоты
+(подсказка сервера о времени повтора или `cooldown_seconds`), а запрос сразу
+повторяется на другом участнике.
+
+Имя модели участника, которому ушел последний запрос текущей задачи, доступно
+через :data:`routed_model`: по нему метрики и кеш ответов учитывают модель, которая
+действительно ответила.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from itertools import product
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+
+from google.api_core.exceptions import ResourceExhausted
+
+from src.logger.logger import logger
+from .retry import retry_after
+
+WINDOW_SECONDS = 60
+
+# Модель участника, выбранного для последнего запроса текущей задачи
+routed_model: ContextVar[Optional[str]] = ContextVar('routed_model', default=None)
+
+
+def _estimate_tokens(contents: Any) -> int:
+    return len(str(contents)) // 4 + 1
+
+
+class PoolMember:
+    """
+    .. :class:`PoolMember`
+        :synopsis: Пара (ключ, модель) с учетом использованной квоты
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        key_name: str,
+        model_name: str,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+    ):
+        """
+        Args:
+            model (Any): Клиент модели (`genai.GenerativeModel` или совместимый).
+            key_name (str): Имя ключа для журналов (имя переменной окружения, не сам ключ).
+            model_name (str): Имя модели.
+            requests_per_minute (int): Лимит запросов в минуту. `0` - без ограничения.
+            tokens_per_minute (int): Лимит токенов в минуту. `0` - без ограничения.
+        """
+        self.model = model
+        self.key_name = key_name
+        self.model_name = model_name
+        self.requests_per_minute = requests_per_minute or 0
+        self.tokens_per_minute = tokens_per_minute or 0
+        self.cooldown_until = 0.0
+        self._window: deque[tuple[float, int]] = deque()
+
+    def __repr__(self) -> str:
+        return f"{self.key_name}/{self.model_name}"
+
+    def _trim(self, now: float) -> None:
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._window.popleft()
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Через сколько секунд участник сможет принять запрос на `tokens` токенов (`0` - сейчас)."""
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        self._trim(now)
+        wait = 0.0
+        if self.requests_per_minute and len(self._window) >= self.requests_per_minute:
+            wait = self._window[len(self._window) - self.requests_per_minute][0] + WINDOW_SECONDS - now
+        if self.tokens_per_minute:
+            used = sum(item_tokens for _, item_tokens in self._window)
+            # Самые старые записи освобождают квоту первыми
+            for stamp, item_tokens in self._window:
+                if used + min(tokens, self.tokens_per_minute) <= self.tokens_per_minute:
+                    break
+                used -= item_tokens
+                wait = max(wait, stamp + WINDOW_SECONDS - now)
+        return max(0.0, wait)
+
+    def load(self, now: float) -> float:
+        """Доля использованной квоты запросов в текущем окне."""
+        self._trim(now)
+        if not self.requests_per_minute:
+            return len(self._window) / 1000
+        return len(self._window) / self.requests_per_minute
+
+    def record(self, tokens: int, now: float) -> None:
+        self._window.append((now, tokens))
+
+    def exhaust(self, seconds: float) -> None:
+        """Выводит участника из ротации на `seconds` секунд."""
+        self.cooldown_until = time.monotonic() + seconds
+
+
+class ModelRouter:
+    """
+    .. :class:`ModelRouter`
+        :synopsis: Пул клиентов модели с переключением при исчерпании квоты
+    """
+
+    def __init__(self, members: list[PoolMember], cooldown_seconds: float = WINDOW_SECONDS):
+        """
+        Args:
+            members (list[PoolMember]): Участники пула.
+            cooldown_seconds (float): Время вывода участника из ротации после `ResourceExhausted`,
+                если сервер не подсказал время повтора.
+
+        Raises:
+            ValueError: Если пул пуст.
+        """
+        if not members:
+            raise ValueError("Пул моделей пуст: не найдено ни одного API-ключа")
+        self.members = members
+        self.cooldown_seconds = cooldown_seconds
+        self.model_name = members[0].model_name
+        self.model_names = list(dict.fromkeys(member.model_name for member in members))
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Any,
+        create_model: Callable[[str, str], Any],
+        resolve_key: Callable[[str], Optional[str]] = os.getenv,
+    ) -> 'ModelRouter':
+        """
+        Создает пул по секции `model_pool` конфигурации.
+
+        Args:
+            config (dict | SimpleNamespace): `api_key_env` - имена переменных окружения с ключами,
+                `models` - имена моделей, `requests_per_minute`, `tokens_per_minute` - лимиты по умолчанию,
+                `limits` - лимиты для отдельных моделей, `cooldown_seconds`.
+            create_model (Callable[[str, str], Any]): Фабрика клиента по (ключ, имя модели).
+            resolve_key (Callable[[str], Optional[str]]): Получение ключа по имени переменной окружения.
+        """
+        config = config if isinstance(config, SimpleNamespace) else SimpleNamespace(**config)
+        limits = getattr(config, 'limits', None) or SimpleNamespace()
+        limits = vars(limits) if isinstance(limits, SimpleNamespace) else limits
+        members = []
+        for key_name, model_name in product(config.api_key_env, config.models):
+            api_key = resolve_key(key_name)
+            if not api_key:
+                logger.warning(f"Ключ {key_name} не задан, пропущен в пуле моделей")
+                continue
+            model_limits = limits.get(model_name) or {}
+            model_limits = vars(model_limits) if isinstance(model_limits, SimpleNamespace) else model_limits
+            members.append(PoolMember(
+                create_model(api_key, model_name),
+                key_name,
+                model_name,
+                requests_per_minute=model_limits.get('requests_per_minute', getattr(config, 'requests_per_minute', 0)),
+                tokens_per_minute=model_limits.get('tokens_per_minute', getattr(config, 'tokens_per_minute', 0)),
+            ))
+        logger.info(f"Пул моделей: {members}")
+        return cls(members, getattr(config, 'cooldown_seconds', WINDOW_SECONDS))
+
+    async def _acquire(self, tokens: int) -> PoolMember:
+        """Выбирает наименее загруженного свободного участника, при необходимости дожидаясь квоты."""
+        # Клиент живет дольше одного `asyncio.run` (общий пул клиентов), блокировка - своя для каждого цикла событий
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                waits = [(member.wait_time(tokens, now), member.load(now), index) for index, member in enumerate(self.members)]
+                wait, _, index = min(waits)
+                if wait <= 0:
+                    member = self.members[index]
+                    member.record(tokens, now)
+                    return member
+                logger.debug(f"Квота всех ключей исчерпана, ожидание {wait:.1f} с", None, False)
+                await asyncio.sleep(wait)
+
+    def _on_exhausted(self, member: PoolMember, ex: ResourceExhausted) -> None:
+        seconds = retry_after(ex) or self.cooldown_seconds
+        member.exhaust(seconds)
+        logger.warning(f"Квота {member} исчерпана, участник выведен из ротации на {seconds:.0f} с")
+
+    async def generate_content_async(self, contents: Any, **kwargs) -> Any:
+        tokens = _estimate_tokens(contents)
+        for _ in range(len(self.members)):
+            member = await self._acquire(tokens)
+            routed_model.set(member.model_name)
+            try:
+                return await member.model.generate_content_async(contents, **kwargs)
+            except ResourceExhausted as ex:
+                self._on_exhausted(member, ex)
+        raise ResourceExhausted("Квота исчерпана на всех участниках пула моделей")
+
+    def generate_content(self, contents: Any, **kwargs) -> Any:
+        now = time.monotonic()
+        tokens = _estimate_tokens(contents)
+        candidates = sorted(self.members, key=lambda member: (member.wait_time(tokens, now), member.load(now)))
+        for member in candidates:
+            member.record(tokens, time.monotonic())
+            routed_model.set(member.model_name)
+            try:
+                return member.model.generate_content(contents, **kwargs)
+            except ResourceExhausted as ex:
+                self._on_exhausted(member, ex)
+        raise ResourceExhausted("Квота исчерпана на всех участниках пула моделей")
+
+    async def count_tokens_async(self, contents: Any, **kwargs) -> Any:
+        return await self.members[0].model.count_tokens_async(contents, **kwargs)
+
+    def _get_tools_lib(self, tools: Any) -> Any:
+        # Нужен `genai.ChatSession` при отправке сообщения
+        return self.members[0].model._get_tools_lib(tools)
+
+    def start_chat(self, history: Optional[list] = None) -> Any:
+        """Сессия чата, сообщения которой распределяются по пулу."""
+        session = self.members[0].model.start_chat(history=history)
+        session.model = self
+        return session
@@ -0,0 +1,224 @@
+## \file /src/ai/gemini/response_cache.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.response_cache
+	:platform: Windows, Unix
+	:synopsis: Дисковый кеш ответов модели с адресацией по содержимому запроса
+
+Ключ - sha256 от (model_name, generation_config, system_instruction, prompt, context),
+где `context` - все, от чего еще зависит ответ (например, отпечаток истории чата).
+Размер кеша ограничен, при переполнении удаляются записи, к которым дольше всего
+не обращались (LRU). Записи могут храниться сжатыми (zlib).
+
+Клиенты модели с одной директорией кеша получают общий экземпляр (:meth:`ResponseCache.shared`):
+у директории один индекс и один предел размера, и клиенты не вытесняют записи друг друга
+вслепую. Сжатие и дисковые операции выполняются в пуле потоков (:meth:`ResponseCache.get_async`,
+:meth:`ResponseCache.set_async`), индекс защищен блокировкой.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from src.logger.logger import logger
+
+
+class ResponseCache:
+    """
+    .. :class:`ResponseCache`
+        :synopsis: Персистентный LRU кеш ответов модели
+    """
+
+    cache_dir: Path
+    max_size_bytes: int
+    compress: bool
+    bypass: bool
+    hits: int
+    misses: int
+
+    # Общие экземпляры по директориям кеша
+    _instances: dict[Path, 'ResponseCache'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_size_bytes: int = 512 * 1024 * 1024,
+        compress: bool = True,
+        bypass: bool = False,
+    ):
+        """
+        Args:
+            cache_dir (str | Path): Директория кеша.
+            max_size_bytes (int): Максимальный суммарный размер записей.
+            compress (bool): Сжимать записи zlib.
+            bypass (bool): Не читать и не записывать кеш.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.compress = compress
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[Path, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._scan()
+
+    @classmethod
+    def shared(cls, cache_dir: str | Path, max_size_bytes: int = 512 * 1024 * 1024, compress: bool = True) -> 'ResponseCache':
+        """
+        Общий для процесса экземпляр кеша директории `cache_dir`.
+        Размер и сжатие задает первый запрос к директории.
+        """
+        path = Path(cache_dir).resolve()
+        with cls._instances_lock:
+            cache = cls._instances.get(path)
+            if cache is None:
+                cache = cls._instances[path] = cls(path, max_size_bytes, compress)
+            elif (cache.max_size_bytes, cache.compress) != (max_size_bytes, compress):
+                logger.warning(f"Кеш ответов {path} уже открыт с другими параметрами, используются прежние")
+            return cache
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        generation_config: Any,
+        system_instruction: Optional[str],
+        prompt: str,
+        context: str = '',
+    ) -> str:
+        """Ключ кеша для запроса. `context` - отпечаток всего, от чего еще зависит ответ (история чата)."""
+        payload = json.dumps(
+            [model_name, generation_config, system_instruction or '', prompt, context],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _scan(self) -> None:
+        """Строит индекс существующих записей в порядке последнего обращения."""
+        if not self.cache_dir.exists():
+            return
+        try:
+            files = [path for path in self.cache_dir.glob('*/*') if path.suffix in ('.z', '.txt')]
+            files.sort(key=lambda path: path.stat().st_mtime)
+            for path in files:
+                size = path.stat().st_size
+                self._entries[path.stem] = (path, size)
+                self._size += size
+        except Exception as ex:
+            logger.error(f"Ошибка чтения кеша ответов {self.cache_dir}", ex, False)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Возвращает сохраненный ответ.
+
+        Args:
+            key (str): Ключ из :meth:`make_key`.
+
+        Returns:
+            Optional[str]: Ответ или None, если записи нет (или кеш отключен).
+        """
+        if self.bypass:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                self.misses += 1
+                return None
+        path, _ = entry
+        try:
+            data = path.read_bytes()
+            text = zlib.decompress(data).decode('utf-8') if path.suffix == '.z' else data.decode('utf-8')
+            os.utime(path)
+        except Exception as ex:
+            logger.error(f"Поврежденная запись кеша {path}", ex, False)
+            with self._lock:
+                if self._entries.get(key) == entry:
+                    self._remove(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return text
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """:meth:`get` в пуле потоков, не блокируя цикл событий."""
+        if self.bypass:
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, text: str) -> None:
+        """
+        Сохраняет ответ и при необходимости вытесняет старые записи.
+
+        Args:
+            key (str): Ключ из :meth:`make_key`.
+            text (str): Ответ модели.
+        """
+        if self.bypass or not text:
+            return
+        data = text.encode('utf-8')
+        if self.compress:
+            data = zlib.compress(data)
+        path = self.cache_dir / key[:2] / f"{key}{'.z' if self.compress else '.txt'}"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Запись одного ключа могут одновременно выполнять несколько потоков
+            tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except Exception as ex:
+            logger.error(f"Не удалось записать кеш {path}", ex, False)
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, unlink=self._entries[key][0] != path)
+            self._entries[key] = (path, len(data))
+            self._size += len(data)
+            self._evict()
+
+    async def set_async(self, key: str, text: str) -> None:
+        """:meth:`set` в пуле потоков, не блокируя цикл событий."""
+        if self.bypass or not text:
+            return
+        await asyncio.to_thread(self.set, key, text)
+
+    def _remove(self, key: str, unlink: bool = True) -> None:
+        """Удаляет запись из индекса и с диска. Вызывается под блокировкой индекса."""
+        path, size = self._entries.pop(key)
+        self._size -= size
+        if unlink:
+            try:
+                path.unlink(missing_ok=True)
+            except Exception as ex:
+                logger.error(f"Не удалось удалить запись кеша {path}", ex, False)
+
+    def _evict(self) -> None:
+        """Вытесняет самые давние записи, пока размер кеша больше лимита."""
+        while self._size > self.max_size_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    @property
+    def stats(self) -> dict:
+        """Счетчики попаданий и размер кеша."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'size_bytes': self._size,
+        }
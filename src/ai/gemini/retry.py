@@ -0,0 +1,258 @@
+## \file /src/ai/gemini/retry.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.ai.gemini.retry
+	:platform: Windows, Unix
+	:synopsis: Асинхронные повторы запросов к модели с политиками по типам ошибок и автоматом отключения
+
+Ожидание между попытками выполняется через `asyncio.sleep`, поэтому остальные
+запросы продолжают работать, пока один ждет. Для каждого типа ошибки задается
+политика (количество попыток, экспоненциальная задержка со случайным разбросом).
+Подсказка сервера о времени повтора (`Retry-After`, `RetryInfo.retry_delay`,
+`retry in Ns` в тексте ошибки) имеет приоритет над расчетной задержкой.
+
+Автомат отключения (circuit breaker) после `failure_threshold` подряд временных
+сбоев (ошибок с политикой повторов) на `reset_timeout` секунд отвечает ошибкой
+:class:`CircuitOpenError` без обращения к модели, затем пропускает одну пробную попытку.
+"""
+
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.logger.logger import logger
+
+
+class EmptyResponseError(Exception):
+    """Модель вернула пустой ответ."""
+
+
+class CircuitOpenError(Exception):
+    """Автомат отключения разомкнут: запросы временно не отправляются."""
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Политика повторов для одного типа ошибки.
+    `max_attempts` - общее количество вызовов, включая первый; `0` или `1` - ошибка не повторяется.
+    """
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    respect_retry_after: bool = True
+
+    def delay(self, attempt: int, rng: random.Random = random) -> float:
+        """Задержка перед повтором номер `attempt` (с 0): экспонента с разбросом +-`jitter`, не больше `max_delay`."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return max(0.0, delay * (1 + self.jitter * (2 * rng.random() - 1)))
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> 'RetryPolicy':
+        names = {item.name for item in fields(cls)}
+        return cls(**{key: value for key, value in values.items() if key in names})
+
+
+# Ключ - имя класса исключения; учитываются и базовые классы
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    'ResourceExhausted': RetryPolicy(max_attempts=6, base_delay=30, max_delay=900, jitter=0.3),
+    'TooManyRequests': RetryPolicy(max_attempts=6, base_delay=30, max_delay=900, jitter=0.3),
+    'ServiceUnavailable': RetryPolicy(max_attempts=4, base_delay=10, max_delay=120),
+    'GatewayTimeout': RetryPolicy(max_attempts=4, base_delay=10, max_delay=120),
+    'InternalServerError': RetryPolicy(max_attempts=3, base_delay=5, max_delay=60),
+    'RequestException': RetryPolicy(max_attempts=5, base_delay=5, max_delay=300),
+    'TimeoutError': RetryPolicy(max_attempts=3, base_delay=5, max_delay=60),
+    'EmptyResponseError': RetryPolicy(max_attempts=3, base_delay=1, max_delay=30),
+    'DefaultCredentialsError': RetryPolicy(max_attempts=0),
+    'RefreshError': RetryPolicy(max_attempts=0),
+    'InvalidArgument': RetryPolicy(max_attempts=0),
+    'RpcError': RetryPolicy(max_attempts=0),
+}
+
+_RETRY_IN_TEXT = re.compile(r'retry(?:\s+in|Delay"?\s*:\s*"?)\s*([\d.]+)\s*s', re.IGNORECASE)
+
+
+def retry_after(ex: BaseException) -> Optional[float]:
+    """
+    Время повтора, подсказанное сервером.
+
+    Проверяются `RetryInfo.retry_delay` в деталях ошибки `google.api_core`,
+    заголовок `Retry-After` HTTP-ответа и фраза `retry in Ns` / `"retryDelay": "Ns"` в тексте ошибки.
+
+    Returns:
+        Optional[float]: Секунды или None, если подсказки нет.
+    """
+    for detail in getattr(ex, 'details', None) or []:
+        retry_delay = getattr(detail, 'retry_delay', None)
+        if retry_delay is not None and hasattr(retry_delay, 'seconds'):
+            return retry_delay.seconds + getattr(retry_delay, 'nanos', 0) / 1e9
+    response = getattr(ex, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') if hasattr(headers, 'get') else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    match = _RETRY_IN_TEXT.search(str(ex))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class CircuitBreaker:
+    """
+    .. :class:`CircuitBreaker`
+        :synopsis: Временное прекращение запросов после серии неудач
+    """
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 300):
+        """
+        Args:
+            failure_threshold (int): Количество неудачных запросов подряд до размыкания. `0` - автомат выключен.
+            reset_timeout (float): Через сколько секунд после размыкания пропустить пробный запрос.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        """Разомкнут ли автомат прямо сейчас (время пробного запроса еще не наступило)."""
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def check(self) -> None:
+        """
+        Raises:
+            CircuitOpenError: Если автомат разомкнут.
+        """
+        if self.is_open:
+            raise CircuitOpenError(
+                f"Запросы к модели приостановлены после {self.failures} ошибок подряд "
+                f"(еще {self.reset_timeout - (time.monotonic() - self.opened_at):.0f} с)"
+            )
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failure_threshold and self.failures >= self.failure_threshold:
+            if not self.is_open:
+                logger.error(f"Автомат отключения разомкнут на {self.reset_timeout} с после {self.failures} ошибок подряд", None, False)
+            self.opened_at = time.monotonic()
+
+
+class RetryEngine:
+    """
+    .. :class:`RetryEngine`
+        :synopsis: Выполнение запроса с повторами по политикам и автоматом отключения
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        """
+        Args:
+            policies (Optional[Dict[str, RetryPolicy]]): Политики по именам классов исключений
+                (дополняют и переопределяют :data:`DEFAULT_POLICIES`).
+            breaker (Optional[CircuitBreaker]): Автомат отключения. По умолчанию - с настройками по умолчанию.
+            sleep (Callable[[float], Awaitable[Any]]): Функция ожидания.
+        """
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self._random = random.Random()
+
+    @classmethod
+    def from_config(cls, config: Any) -> 'RetryEngine':
+        """
+        Создает движок по секции `retry` конфигурации:
+        `{"policies": {"ResourceExhausted": {"max_attempts": 6, ...}}, "circuit_breaker": {...}}`.
+        """
+        def as_dict(value: Any) -> Dict:
+            return value if isinstance(value, dict) else vars(value) if value is not None else {}
+
+        config = as_dict(config)
+        policies = {
+            name: RetryPolicy.from_dict(as_dict(values))
+            for name, values in as_dict(config.get('policies')).items()
+        }
+        breaker = as_dict(config.get('circuit_breaker'))
+        return cls(
+            policies,
+            CircuitBreaker(
+                failure_threshold=breaker.get('failure_threshold', 10),
+                reset_timeout=breaker.get('reset_timeout', 300),
+            ),
+        )
+
+    def policy_for(self, ex: BaseException) -> Optional[RetryPolicy]:
+        """Политика для исключения по имени его класса или ближайшего базового класса."""
+        for klass in type(ex).__mro__:
+            if klass.__name__ in self.policies:
+                return self.policies[klass.__name__]
+        return None
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        attempts: int = 15,
+        on_retry: Optional[Callable[[BaseException], None]] = None,
+    ) -> Any:
+        """
+        Выполняет `call` с повторами.
+
+        Args:
+            call (Callable[[], Awaitable[Any]]): Фабрика корутины запроса (вызывается на каждую попытку).
+            attempts (int): Общий предел количества попыток.
+            on_retry (Optional[Callable[[BaseException], None]]): Вызывается перед каждым повтором с ошибкой попытки.
+
+        Returns:
+            Any: Результат `call`.
+
+        Raises:
+            CircuitOpenError: Если автомат отключения разомкнут.
+            Exception: Последняя ошибка, если повторы исчерпаны или ошибка не повторяется.
+        """
+        retries: Dict[str, int] = {}
+        for attempt in range(attempts):
+            self.breaker.check()
+            try:
+                result = await call()
+            except Exception as ex:
+                policy = self.policy_for(ex)
+                # Автомат учитывает только временные сбои, а не ошибки самого запроса
+                if policy and policy.max_attempts > 1:
+                    self.breaker.record_failure()
+                name = type(ex).__name__
+                retry = retries.get(name, 0)
+                if not policy or retry + 1 >= policy.max_attempts or attempt + 1 >= attempts:
+                    raise
+                retries[name] = retry + 1
+                hint = retry_after(ex) if policy.respect_retry_after else None
+                delay = hint if hint is not None else policy.delay(retry, self._random)
+                logger.debug(
+                    f"{name}: попытка {retry + 1}/{policy.max_attempts} не удалась, следующая через {delay:.1f} с",
+                    None,
+                    False,
+                )
+                if on_retry:
+                    on_retry(ex)
+                await self.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
@@ -10,4 +10,21 @@
 
 """
 
-from .code_assistant import CodeAssistant
\ No newline at end of file
+import importlib
+
+# Модули загружаются при первом обращении: `python -m src.assistant.code_assistant`
+# и служебные модули пакета (`benchmark`, `pipeline`) не импортируют ассистента заранее
+_LAZY = {
+    'CodeAssistant': '.code_assistant',
+    'JobScheduler': '.scheduler',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
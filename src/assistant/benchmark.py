@@ -0,0 +1,359 @@
+## \file /src/assistant/benchmark.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.benchmark
+	:platform: Windows, Unix
+	:synopsis: Сквозной замер производительности конвейера `CodeAssistant` на синтетических деревьях
+
+Для каждого масштаба (количество файлов) генерируется дерево исходников со смешанными
+размерами файлов, глубокими исключенными директориями (`node_modules`, `.git`, `venv`)
+и исключаемыми файлами. Затем полный конвейер :class:`CodeAssistant` прогоняется
+против локальной имитации модели (:class:`src.ai.gemini.MockGenerativeAI`).
+Каждый масштаб выполняется в отдельном процессе, чтобы пиковый RSS не накапливался.
+
+Результат - JSON с версией кода, параметрами прогона и по каждому масштабу:
+файлов/с, байт/с, пиковый RSS и время этапов (обход, чтение, подготовка запроса,
+ожидание модели, обработка ответа, сохранение).
+С `--prompt-formats` вместо прогона конвейера сравнивается размер запросов
+в формате `repr` и в шаблонном формате (:mod:`src.assistant.prompt_builder`).
+Перед замером конвейера замеряется время запуска команд (:mod:`src.assistant.startup_budget`);
+результат сохраняется в `startup` для сравнения с прошлыми прогонами и на код возврата
+не влияет: бюджет проверяет тест `tests/test_startup_budget.py`.
+
+Пример:
+
+.. code-block:: bash
+
+    python -m src.assistant.benchmark --scales 1000 10000 --latency-ms 0
+    python -m src.assistant.benchmark --scales 1000 --baseline benchmarks/code_assistant_1.json
+    python -m src.assistant.benchmark --scales 1000 --prompt-formats
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Optional
+
+import header
+from header import __root__
+
+from src.utils.printer import pprint as print
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Доли маленьких, средних и больших файлов и их размеры в байтах
+SIZE_CLASSES = [
+    (0.70, 200, 2_000),
+    (0.25, 2_000, 20_000),
+    (0.05, 20_000, 100_000),
+]
+SOURCE_EXTENSIONS = ['.py', '.py', '.py', '.js', '.md', '.txt']
+EXCLUDED_DIRS = ['node_modules', '.git', 'venv', '__pycache__']
+EXCLUDED_FILES = ['config.json', 'logo.png', 'header.py', 'module(1).py']
+
+
+def _source_text(rng: random.Random, size: int) -> str:
+    """Псевдокод заданного размера."""
+    lines = []
+    length = 0
+    index = 0
+    while length < size:
+        line = (
+            f"def function_{index}(value_{index}):\n"
+            f"    \"\"\"Returns value {index} multiplied by {rng.randint(1, 99)}.\"\"\"\n"
+            f"    return value_{index} * {rng.randint(1, 99)}\n\n"
+        )
+        lines.append(line)
+        length += len(line)
+        index += 1
+    return ''.join(lines)[:size]
+
+
+def _file_size(rng: random.Random) -> int:
+    """Случайный размер файла по долям `SIZE_CLASSES`."""
+    roll = rng.random()
+    for share, low, high in SIZE_CLASSES:
+        if roll < share:
+            break
+        roll -= share
+    return rng.randint(low, high)
+
+
+def generate_tree(root: Path, files: int, seed: int = 42, excluded_depth: int = 8) -> dict:
+    """
+    Создает синтетическое дерево исходников.
+
+    Args:
+        root (Path): Корень дерева.
+        files (int): Количество файлов, подлежащих обработке.
+        seed (int): Зерно генератора.
+        excluded_depth (int): Глубина вложенности исключенных директорий.
+
+    Returns:
+        dict: Количество и суммарный размер обрабатываемых и исключенных файлов.
+    """
+    rng = random.Random(seed)
+    stats = {'files': 0, 'bytes': 0, 'excluded_files': 0}
+    packages = max(1, files // 50)
+    for index in range(files):
+        package = root / f"package_{index % packages}" / f"module_{index % 7}"
+        package.mkdir(parents=True, exist_ok=True)
+        size = _file_size(rng)
+        (package / f"file_{index}{rng.choice(SOURCE_EXTENSIONS)}").write_text(_source_text(rng, size), encoding='utf-8')
+        stats['files'] += 1
+        stats['bytes'] += size
+
+    # Глубокие исключенные директории и исключенные файлы - нагрузка на обход
+    for index in range(packages):
+        package = root / f"package_{index}"
+        for excluded in EXCLUDED_DIRS:
+            deep = package.joinpath(excluded, *[f"level_{level}" for level in range(excluded_depth)])
+            deep.mkdir(parents=True, exist_ok=True)
+            for level in range(10):
+                (deep / f"ignored_{level}.js").write_text('module.exports = {};\n', encoding='utf-8')
+                stats['excluded_files'] += 1
+        for name in EXCLUDED_FILES:
+            (package / name).write_text('{}\n', encoding='utf-8')
+            stats['excluded_files'] += 1
+    return stats
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS текущего процесса в МБ."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS - байты
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_scale(files: int, options: dict) -> dict:
+    """
+    Генерирует дерево на `files` файлов и прогоняет через него :class:`CodeAssistant`.
+    Выполняется в отдельном процессе.
+
+    Returns:
+        dict: Результаты для одного масштаба.
+    """
+    from src.assistant.code_assistant import CodeAssistant
+    from src.assistant.stages import stage_timer
+
+    with tempfile.TemporaryDirectory(prefix='code_assistant_bench_') as work_dir:
+        work_dir = Path(work_dir)
+        source_dir = work_dir / 'src'
+        started = time.perf_counter()
+        tree = generate_tree(source_dir, files, seed=options['seed'], excluded_depth=options['excluded_depth'])
+        generation_seconds = time.perf_counter() - started
+
+        config = CodeAssistant.config
+        config.start_dir = str(source_dir)
+        config.docs_dir = str(work_dir / 'docs' / '<lang>')
+        config.response_cache.enabled = False
+        config.job_queue.db_path = str(work_dir / 'jobs.sqlite')
+        # Метрики прогона не должны перезаписывать метрики рабочих запусков
+        config.metrics.json_path = str(work_dir / 'metrics' / 'metrics.json')
+        config.metrics.prometheus_path = str(work_dir / 'metrics' / 'metrics.prom')
+        config.concurrency.workers = options['workers']
+        config.concurrency.requests_per_minute = 0
+        config.concurrency.tokens_per_minute = 0
+        config.packing.enabled = options['packing']
+        config.chunking.enabled = options['chunking']
+        config.mock_backend.seed = options['seed']
+        config.mock_backend.latency.distribution = 'fixed'
+        config.mock_backend.latency.median_ms = options['latency_ms']
+        config.mock_backend.latency.min_ms = 0
+        for name in vars(config.mock_backend.errors):
+            setattr(config.mock_backend.errors, name, 0.0)
+
+        assistant = CodeAssistant(role=options['role'], lang=options['lang'], mock=True, force=True)
+        stage_timer.reset()
+        started = time.perf_counter()
+        asyncio.run(assistant.process_files(start_dir=str(source_dir)))
+        seconds = time.perf_counter() - started
+        processed = assistant._processed_count
+        assistant.close()
+
+    return {
+        'scale': files,
+        'files': tree['files'],
+        'excluded_files': tree['excluded_files'],
+        'bytes': tree['bytes'],
+        'processed': processed,
+        'generation_seconds': round(generation_seconds, 3),
+        'seconds': round(seconds, 3),
+        'files_per_sec': round(processed / seconds, 1) if seconds else None,
+        'bytes_per_sec': round(tree['bytes'] / seconds) if seconds else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'stages': {
+            stage: {'seconds': round(total['seconds'], 3), 'count': total['count']}
+            for stage, total in stage_timer.snapshot().items()
+        },
+    }
+
+
+def compare_prompt_formats(files: int, options: dict) -> dict:
+    """
+    Сравнивает размер запросов в формате `repr` (`str(dict)`) и в шаблонном формате
+    на `files` синтетических файлах. Модель не вызывается, состояние на диске не меняется.
+
+    Returns:
+        dict: По каждому формату - суммарная оценка токенов, символы и время построения запросов.
+    """
+    from src.assistant.code_assistant import CodeAssistant
+
+    rng = random.Random(options['seed'])
+    sources = [
+        (f"hypotez/src/package_{index % 50}/file_{index}.py", _source_text(rng, _file_size(rng)))
+        for index in range(files)
+    ]
+    # Как при `--plan`: без клиента модели и кеша ответов, очередь заданий только для чтения -
+    # замер не создает и не изменяет базу заданий, кеш и манифест рабочей конфигурации
+    assistant = CodeAssistant(role=options['role'], lang=options['lang'], plan_only=True)
+    results = {}
+    for format in ('repr', 'template'):
+        builder = assistant.create_prompt_builder(format)
+        started = time.perf_counter()
+        prompts = [builder.file(path, content) for path, content in sources]
+        seconds = time.perf_counter() - started
+        results[format] = {
+            'tokens': sum(prompt.tokens for prompt in prompts),
+            'chars': sum(len(prompt.text) for prompt in prompts),
+            'build_seconds': round(seconds, 3),
+        }
+    assistant.close()
+    results['token_ratio'] = round(results['template']['tokens'] / results['repr']['tokens'], 3)
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    """Текущая ревизия кода (для сравнения результатов разных версий)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=__root__, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Печатает изменение files/sec и времени запуска команд относительно прошлого прогона."""
+    previous_startup = baseline.get('startup', {}).get('commands', {})
+    for command, item in results.get('startup', {}).get('commands', {}).items():
+        base = previous_startup.get(command)
+        if base:
+            print(
+                f"{command}: {base['wall_ms']} -> {item['wall_ms']} мс",
+                text_color='red' if item['wall_ms'] > base['wall_ms'] * 1.1 else 'green',
+            )
+    previous = {item['scale']: item for item in baseline.get('results', [])}
+    for item in results['results']:
+        base = previous.get(item['scale'])
+        if not base or not base.get('files_per_sec') or not item.get('files_per_sec'):
+            continue
+        ratio = item['files_per_sec'] / base['files_per_sec']
+        print(
+            f"{item['scale']} файлов: {base['files_per_sec']} -> {item['files_per_sec']} файлов/с ({ratio:.2f}x, "
+            f"ревизия {baseline.get('revision')} -> {results.get('revision')})",
+            text_color='red' if ratio < 0.95 else 'green',
+        )
+
+
+def parse_args() -> dict:
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(description="Замер производительности конвейера CodeAssistant")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000], help="Количество файлов в дереве")
+    parser.add_argument("--role", type=str, default="doc_writer", help="Роль ассистента")
+    parser.add_argument("--lang", type=str, default="en", help="Язык")
+    parser.add_argument("--workers", type=int, default=4, help="Количество обработчиков")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Задержка ответа имитации модели")
+    parser.add_argument("--excluded-depth", type=int, default=8, help="Глубина исключенных директорий")
+    parser.add_argument("--packing", action="store_true", help="Включить упаковку маленьких файлов")
+    parser.add_argument("--chunking", action="store_true", help="Включить разбиение больших файлов")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+    parser.add_argument(
+        "--output", type=Path, default=None,
+        help="Файл результатов. По умолчанию benchmarks/code_assistant_<время>.json",
+    )
+    parser.add_argument("--baseline", type=Path, default=None, help="Прошлые результаты для сравнения")
+    parser.add_argument(
+        "--prompt-formats", action="store_true",
+        help="Сравнить размер запросов в формате repr и в шаблонном формате вместо прогона конвейера",
+    )
+    return vars(parser.parse_args())
+
+
+def main() -> None:
+    args = parse_args()
+    options = {
+        'role': args['role'],
+        'lang': args['lang'],
+        'workers': args['workers'],
+        'latency_ms': args['latency_ms'],
+        'excluded_depth': args['excluded_depth'],
+        'packing': args['packing'],
+        'chunking': args['chunking'],
+        'seed': args['seed'],
+    }
+    results = {
+        'revision': _git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': options,
+        'results': [],
+    }
+    if not args['prompt_formats']:
+        from src.assistant.startup_budget import check as check_startup
+
+        results['startup'] = check_startup()
+    for files in [] if args['prompt_formats'] else args['scales']:
+        print(f"Масштаб {files} файлов...", text_color='yellow')
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            result = executor.submit(run_scale, files, options).result()
+        results['results'].append(result)
+        print(
+            f"{files} файлов: {result['seconds']} с, {result['files_per_sec']} файлов/с, "
+            f"{result['bytes_per_sec']} байт/с, пиковый RSS {result['peak_rss_mb']} МБ",
+            text_color='green',
+        )
+        for stage, total in result['stages'].items():
+            print(f"    {stage:<18} {total['seconds']:>10.3f} с  {total['count']:>8}")
+
+    if args['prompt_formats']:
+        results['prompt_formats'] = {}
+        for files in args['scales']:
+            result = compare_prompt_formats(files, options)
+            results['prompt_formats'][files] = result
+            print(
+                f"{files} файлов: repr {result['repr']['tokens']} токенов, "
+                f"шаблон {result['template']['tokens']} токенов ({result['token_ratio']:.2f}x)",
+                text_color='green',
+            )
+
+    output = args['output'] or Path(__root__, 'benchmarks', f"code_assistant_{time.strftime('%Y%m%d%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"Результаты сохранены в {output}", text_color='green')
+
+    if args['baseline']:
+        compare(results, json.loads(args['baseline'].read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+## \file /src/assistant/chunker.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.chunker
+	:platform: Windows, Unix
+	:synopsis: Разбиение больших исходников Python на части по границам верхнеуровневых классов и функций
+
+Каждая верхнеуровневая конструкция модуля (класс, функция, блок импортов и т.п.)
+становится сегментом вместе с предшествующими ей комментариями и пустыми строками.
+Сегменты жадно собираются в части, не превышающие бюджет токенов. Сегмент,
+который сам больше бюджета, делится по строкам.
+"""
+
+import ast
+from typing import Callable
+
+from src.assistant.pipeline import estimate_tokens
+
+
+def _split_lines(lines: list[str], max_tokens: int, count_tokens: Callable[[str], int]) -> list[str]:
+    """Делит последовательность строк на части не больше `max_tokens` (последний рубеж для огромных конструкций)."""
+    parts, current, size = [], [], 0
+    for line in lines:
+        line_tokens = count_tokens(line)
+        if current and size + line_tokens > max_tokens:
+            parts.append(''.join(current))
+            current, size = [], 0
+        current.append(line)
+        size += line_tokens
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def split_python_source(
+    source: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> list[str]:
+    """
+    Делит исходный код Python на части по границам верхнеуровневых конструкций.
+
+    Args:
+        source (str): Исходный код модуля.
+        max_tokens (int): Бюджет токенов на одну часть.
+        count_tokens (Callable[[str], int]): Функция оценки количества токенов.
+
+    Returns:
+        list[str]: Части в порядке следования в исходнике. Их конкатенация равна `source`.
+            Если файл укладывается в бюджет или не разбирается, возвращается `[source]`.
+    """
+    if max_tokens <= 0 or count_tokens(source) <= max_tokens:
+        return [source]
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return [source]
+    if not tree.body:
+        return [source]
+
+    lines = source.splitlines(keepends=True)
+    segments = []
+    start = 0
+    for node in tree.body:
+        end = node.end_lineno
+        segments.append(lines[start:end])
+        start = end
+    if start < len(lines):
+        segments[-1] = segments[-1] + lines[start:]
+
+    chunks, current = [], ''
+    for segment_lines in segments:
+        segment = ''.join(segment_lines)
+        if current and count_tokens(current + segment) > max_tokens:
+            chunks.append(current)
+            current = ''
+        if count_tokens(segment) > max_tokens:
+            pieces = _split_lines(segment_lines, max_tokens, count_tokens)
+            chunks.extend(pieces[:-1])
+            current = pieces[-1]
+        else:
+            current += segment
+    if current:
+        chunks.append(current)
+    return chunks
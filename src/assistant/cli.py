@@ -0,0 +1,96 @@
+## \file /src/assistant/cli.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.cli
+	:platform: Windows, Unix
+	:synopsis: Аргументы командной строки ассистента
+
+Модуль импортирует только `argparse`: :mod:`src.assistant.code_assistant` разбирает аргументы
+до загрузки конвейера, поэтому `--help` и ошибки в аргументах не ждут импорта `asyncio`,
+логгера и модулей ассистента (бюджет запуска - :mod:`src.assistant.startup_budget`).
+"""
+
+import argparse
+
+
+def parse_args():
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(description="Ассистент для программистов")
+    parser.add_argument(
+        "--role",
+        type=str,
+        default=None,
+        help="Роль для выполнения задачи. По умолчанию - все роли конфигурации (roles), проходы повторяются",
+    )
+    parser.add_argument(
+        "--lang",
+        type=str,
+        default=None,
+        help="Язык выполнения. По умолчанию - все языки конфигурации (languages), проходы повторяются",
+    )
+    parser.add_argument(
+        "--model",
+        nargs="+",
+        type=str,
+        default=["gemini"],
+        help="Список моделей для инициализации",
+    )
+    parser.add_argument(
+        "--start-dirs",
+        nargs="+",
+        type=str,
+        default=[],
+        help="Список директорий для обработки",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Обработать все файлы, даже если результат для них актуален",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Не использовать кеш ответов модели",
+    )
+    parser.add_argument(
+        "--retry-dead",
+        action="store_true",
+        help="Повторить только задания из списка dead",
+    )
+    parser.add_argument(
+        "--mock",
+        action="store_true",
+        help="Использовать локальную имитацию модели (секция mock_backend) вместо gemini",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Следить за изменениями в start_dirs и обрабатывать только измененные файлы "
+             "(вместо повторных полных проходов)",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=True,
+        default=None,
+        help="Записать временную шкалу этапов (Chrome trace / speedscope) и вывести сводку по этапам. "
+             "Необязательный аргумент - путь файла шкалы",
+    )
+    parser.add_argument(
+        "--plan",
+        nargs="?",
+        const=True,
+        default=None,
+        help="Пробный проход: составить список заданий с оценкой токенов и длительности и сохранить его в JSON, "
+             "не обращаясь к модели. Необязательный аргумент - путь файла плана",
+    )
+    parser.add_argument(
+        "--from-plan",
+        type=str,
+        default=None,
+        help="Обработать задания из плана, сохраненного --plan, без повторного обхода",
+    )
+    return vars(parser.parse_args())
@@ -1,25 +1,49 @@
+if __name__ == "__main__":
+    # Аргументы разбираются до импорта конвейера: `--help` завершается без загрузки
+    # `asyncio`, логгера и модулей ассистента (см. `src.assistant.startup_budget`)
+    from src.assistant.cli import parse_args
+    parse_args()
+
 import asyncio
-import argparse
 import sys, os
 from pathlib import Path
-from typing import Iterator, List, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, List, Optional
 from types import SimpleNamespace
 import signal
 import time
-import re
-import fnmatch
+import copy
 from dotenv import load_dotenv
 
 import header
 from header import __root__
 from src import gs
 
-from src.ai.gemini import GoogleGenerativeAI
+from src.ai.gemini.response_cache import ResponseCache
+from src.ai.gemini.retry import RetryEngine
+from src.ai.gemini.metrics import model_metrics, set_labels
+from src.ai.gemini.client_pool import model_clients
+from src.assistant.cli import parse_args
+from src.assistant.pipeline import RateLimiter, run_async, run_pipeline, estimate_tokens, request_shutdown, shutdown_requested
+from src.assistant.manifest import Manifest
+from src.assistant.file_walker import FileWalker
+from src.assistant.chunker import split_python_source
+from src.assistant.packer import pack_small_files, pack_small_files_async, split_packed_response
+from src.assistant.prompt_builder import PromptBuilder
+from src.assistant.prompt_registry import prompt_registry
+from src.assistant.job_queue import JobQueue, DEAD
+from src.assistant.streaming import PrefixStripper, write_stream
+from src.assistant.file_io import WriteBehind, read_ahead, read_text, write_text_atomic
+from src.assistant.stages import stage_timer, DISCOVERY, READING, REQUEST_BUILDING, MODEL, POST_PROCESSING, SAVING
 
 from src.utils.jjson import j_loads, j_loads_ns
 from src.utils.printer import pprint as print
 from src.logger.logger import logger
 
+if TYPE_CHECKING:
+    # Клиенты модели импортируются при создании (`_initialize_models`): `google.generativeai`
+    # загружается больше секунды, а `--help` и разбор аргументов в нем не нуждаются
+    from src.ai.gemini import GoogleGenerativeAI
+
 load_dotenv()
 
 def get_relative_path(full_path: str, relative_from: str) -> Optional[str]:
@@ -54,11 +78,17 @@ class CodeAssistant:
 
     role: str
     lang: str
-    gemini_model: GoogleGenerativeAI
+    gemini_model: Optional['GoogleGenerativeAI']
     config:SimpleNamespace = j_loads_ns(BASE_PATH / 'code_assistant.json')
     system_instruction:str
     code_instruction:str
     translations:SimpleNamespace
+    prompt_builder:PromptBuilder
+    rate_limiter:Optional[RateLimiter] = None
+    output_writer:Optional[WriteBehind] = None
+    manifest:Manifest
+    job_queue:Optional[JobQueue] = None
+    force:bool = False
 
     def __init__(self, 
                  role:Optional[str] = 'doc_writer_md', 
@@ -69,12 +99,30 @@ class CodeAssistant:
         try:
             self.role = role 
             self.lang = lang
-            self.models_list = kwargs.get("model", ["gemini"])
+            self.models_list = kwargs.pop("model", ["gemini"])
+            self.force = kwargs.pop("force", False)
+            self.start_dirs = kwargs.pop("start_dirs", None)
+            self.no_cache = kwargs.pop("no_cache", False)
+            self.retry_dead = kwargs.pop("retry_dead", False)
+            self.mock = kwargs.pop("mock", False)
+            # Пробный проход (`--plan`): клиенты модели, кеши и запись в очередь заданий не нужны
+            self.plan_only = kwargs.pop("plan_only", False)
+            shared_job_queue = kwargs.pop("job_queue", None)
+            # Общую очередь планировщика закрывает планировщик
+            self._owns_job_queue = shared_job_queue is None
+            # Копия конфигурации, чтобы подстановка `<lang>` не затрагивала другие экземпляры
+            self.config = copy.copy(type(self).config)
             self.config.docs_dir = self.config.docs_dir.replace('<lang>',self.lang)
-            self.translations = j_loads_ns(  BASE_PATH / 'translations'  / 'translations.json' )
-            self.system_instruction = Path( BASE_PATH / 'instructions' / f'CODE_RULES.{self.lang}.MD').read_text(encoding="UTF-8")
-            self.code_instruction = Path( BASE_PATH / 'instructions' / f'{self.role}.{self.lang}.md').read_text(encoding="UTF-8")
-            self._initialize_models(**kwargs)
+            # Инструкции и переводы читаются с диска один раз на процесс (и заново - только после изменения файла)
+            self.translations = prompt_registry.translations()
+            self.system_instruction = prompt_registry.system_instruction(self.lang)
+            self.code_instruction = prompt_registry.role_instruction(self.role, self.lang)
+            self.prompt_builder = self.create_prompt_builder()
+            self.manifest = Manifest(Path(self.config.docs_dir, self.role, getattr(self.config, 'manifest_file', '.code_assistant_manifest.json')))
+            self.job_queue = shared_job_queue or self.create_job_queue(self.config, read_only = self.plan_only)
+            self.gemini_model = None
+            if not self.plan_only:
+                self._initialize_models(**kwargs)
         except Exception as e:
             logger.error(f"Ошибка при инициализации CodeAssistant: {e}")
             sys.exit(1)
@@ -83,16 +131,113 @@ class CodeAssistant:
         """Инициализация моделей на основе заданных параметров."""
         try:
             if "gemini" in self.models_list:
-                self.gemini_model = GoogleGenerativeAI(
+                if self.mock or getattr(self.config.gemini, 'backend', 'genai') == 'mock':
+                    from src.ai.gemini import MockGenerativeAI
+
+                    kwargs.setdefault('mock_config', getattr(self.config, 'mock_backend', None))
+                    model_class = MockGenerativeAI
+                else:
+                    from src.ai.gemini import GoogleGenerativeAI
+
+                    model_class = GoogleGenerativeAI
+                # Ассистенты с одинаковыми моделью и системной инструкцией используют общий клиент процесса
+                key = (model_class.__name__, self.config.gemini.model_name, self.model_system_instruction, self.no_cache)
+                self.gemini_model = model_clients.get(key, lambda: model_class(
                     model_name = self.config.gemini.model_name,
                     api_key = os.getenv('GEMINI_API') ,
-                    system_instruction = self.system_instruction,
+                    system_instruction = self.model_system_instruction,
+                    context_cache_ttl = getattr(self._prompt_prefix_config(), 'context_cache_ttl_seconds', 0),
+                    response_cache = self._create_response_cache(),
+                    retry_engine = RetryEngine.from_config(getattr(self.config, 'retry', None)),
+                    model_pool = self._model_pool_config(self.config),
+                    chat_memory = self._chat_memory_config(),
+                    history_tail = getattr(self._chat_memory_config(), 'history_tail', 0),
                     **kwargs,
-                )
+                ))
         except Exception as e:
              logger.error(f"Ошибка при инициализации моделей: {e}")
              sys.exit(1)
 
+    def _prompt_prefix_config(self) -> SimpleNamespace:
+        """Секция `prompt_prefix` конфигурации."""
+        return getattr(self.config, 'prompt_prefix', None) or SimpleNamespace(mode='inline')
+
+    @property
+    def instruction_in_prefix(self) -> bool:
+        """Передается ли инструкция роли один раз в системной инструкции, а не в каждом запросе."""
+        return getattr(self._prompt_prefix_config(), 'mode', 'inline') == 'system_instruction'
+
+    @property
+    def model_system_instruction(self) -> str:
+        """Статический префикс запросов: `CODE_RULES` и, в режиме `system_instruction`, инструкция роли."""
+        if self.instruction_in_prefix and self.code_instruction:
+            return f"{self.system_instruction}\n\n{self.code_instruction}"
+        return self.system_instruction
+
+    @property
+    def stateless(self) -> bool:
+        """
+        Отправляется ли каждый файл независимым одноразовым запросом (`request_mode` = `stateless`, по умолчанию).
+
+        В режиме `chat` файлы прохода отправляются в одной сессии чата, и каждый запрос
+        несет историю всех предыдущих файлов. Обмены в сессии клиента выполняются по одному
+        при любом `concurrency.workers` - параллельно идут только чтение, подготовка и сохранение.
+        """
+        return getattr(self.config, 'request_mode', 'stateless') != 'chat'
+
+    def _chat_memory_config(self) -> Optional[SimpleNamespace]:
+        """Секция `chat_memory` конфигурации, если ограничение истории чата включено."""
+        chat_memory = getattr(self.config, 'chat_memory', None)
+        return chat_memory if chat_memory and getattr(chat_memory, 'enabled', False) else None
+
+    def _create_response_cache(self) -> Optional[ResponseCache]:
+        """Кеш ответов модели по секции `response_cache` конфигурации - общий для всех клиентов с той же директорией.
+        С `--no-cache` (или `bypass`) клиент работает без кеша."""
+        cache_config = getattr(self.config, 'response_cache', None)
+        if not cache_config or not getattr(cache_config, 'enabled', False):
+            return None
+        if self.no_cache or getattr(cache_config, 'bypass', False):
+            return None
+        return ResponseCache.shared(
+            cache_dir = Path(__root__, cache_config.cache_dir),
+            max_size_bytes = int(getattr(cache_config, 'max_size_mb', 512)) * 1024 * 1024,
+            compress = getattr(cache_config, 'compress', True),
+        )
+
+    @staticmethod
+    def create_rate_limiter(config: SimpleNamespace) -> RateLimiter:
+        """Общий ограничитель частоты запросов по секции `concurrency`.
+        С пулом моделей (`model_pool`) квоты учитываются для каждого ключа отдельно, и общий лимит не применяется."""
+        if CodeAssistant._model_pool_config(config):
+            return RateLimiter()
+        concurrency = getattr(config, 'concurrency', SimpleNamespace())
+        return RateLimiter(
+            requests_per_minute = getattr(concurrency, 'requests_per_minute', 0),
+            tokens_per_minute = getattr(concurrency, 'tokens_per_minute', 0),
+        )
+
+    @staticmethod
+    def _model_pool_config(config: SimpleNamespace) -> Optional[SimpleNamespace]:
+        """Секция `model_pool`, если пул включен."""
+        pool_config = getattr(config, 'model_pool', None)
+        return pool_config if pool_config and getattr(pool_config, 'enabled', False) else None
+
+    @staticmethod
+    def create_job_queue(config: SimpleNamespace, read_only: bool = False) -> Optional[JobQueue]:
+        """Открывает персистентную очередь заданий по секции `job_queue` конфигурации.
+        С `read_only` (пробный проход) открывается только существующая база и только для чтения."""
+        queue_config = getattr(config, 'job_queue', None)
+        if not queue_config or not getattr(queue_config, 'enabled', False):
+            return None
+        db_path = Path(__root__, queue_config.db_path)
+        if read_only and not db_path.exists():
+            return None
+        return JobQueue(
+            db_path,
+            max_attempts = getattr(queue_config, 'max_attempts', 3),
+            read_only = read_only,
+        )
+
     def remove_outer_quotes(self, response: str) -> str:
         """Удаляет внешние кавычки в начале и в конце строки, если они присутствуют."""
         try:
@@ -110,8 +255,11 @@ class CodeAssistant:
     async def process_files(self, 
                             start_dir:Optional[str | Path | list[str,str] | list[str,Path]] = None, 
                             docs_dir:Optional[str | Path] = None, ) -> bool:
-        """компиляция, отправка запроса и сохранение результата."""
-        flag = 'read_and_start_new'
+        """компиляция, отправка запроса и сохранение результата.
+
+        Файлы обрабатываются пулом из `concurrency.workers` обработчиков,
+        частота запросов ограничивается `concurrency.requests_per_minute` и `concurrency.tokens_per_minute`.
+        """
         try:
             if not start_dir:
                 start_dir = self.config.start_dir
@@ -125,35 +273,298 @@ class CodeAssistant:
                 return False
 
             start_dirs = start_dir if isinstance(start_dir,list) else [start_dir] 
-            for process_driectory in start_dirs:
-                logger.info(f"Start {process_driectory=}")
-                for i, (file_path, content) in enumerate(self._yield_files_content(process_driectory)):
-                    if not any((file_path, content)):
-                        continue
-                    if file_path and content:
-                        try:
-                            chat_data_folder = f'{self.config.docs_dir}/{self.role}/chat_history'
-                            content_request = self._create_request(file_path, content)
-                            
-                            response = await self.gemini_model.chat(content_request, chat_data_folder, flag = flag)
-                            flag = 'save_chat'
-                        except Exception as e:
-                             logger.error(f"Ошибка при запросе к модели: {e}")
-                             continue
-                        if response:
-                            response = self.remove_outer_quotes(response)
-                            if not await self._save_response(file_path, response, "gemini"):
-                                logger.error(f"Файл {file_path} \n НЕ сохранился")
-                                continue
-                            print(f"Processed file number: {i + 1}", text_color="yellow")
-                        else:
-                            logger.error("Ошибка ответа модели")
-                            continue
-                    await asyncio.sleep(20) # <- ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ DEBUG (change timeout)
+            concurrency = getattr(self.config, 'concurrency', SimpleNamespace())
+            self.begin_run(self.create_rate_limiter(self.config), self.create_output_writer(self.config))
+            if self.retry_dead:
+                items = self._iter_queued(self.job_queue.requeue_dead(self.role, self.lang) if self.job_queue else [])
+            else:
+                items = self._iter_files(start_dirs)
+            await run_pipeline(
+                self.pack_items(items),
+                self._process_item,
+                workers = getattr(concurrency, 'workers', 1),
+                queue_size = getattr(concurrency, 'queue_size', 0),
+            )
             return True
         except Exception as e:
             logger.error(f"Ошибка в process_files: {e}")
             return False
+        finally:
+            if self.output_writer:
+                await self.output_writer.close()
+            self.manifest.save()
+            if self.job_queue:
+                logger.info(f"Состояние очереди заданий: {self.job_queue.counts()}")
+            self.log_usage()
+            self.export_metrics(self.config)
+
+    def log_usage(self) -> None:
+        """Выводит количество токенов, отправленных в модель и полученных от нее."""
+        usage = getattr(getattr(self, 'gemini_model', None), 'usage', None)
+        if usage and usage.get('requests'):
+            logger.info(
+                f"{self.role}/{self.lang}: запросов {usage['requests']}, токенов запроса {usage['prompt_tokens']} "
+                f"(из контекстного кеша {usage['cached_tokens']}), токенов ответа {usage['response_tokens']}"
+            )
+
+    @staticmethod
+    def export_metrics(config: SimpleNamespace) -> None:
+        """Сохраняет метрики обращений к модели по секции `metrics` конфигурации (JSON и текстовый файл Prometheus)."""
+        metrics = getattr(config, 'metrics', None)
+        if not metrics or not getattr(metrics, 'enabled', False):
+            return
+        try:
+            model_metrics.configure(metrics)
+            json_path = getattr(metrics, 'json_path', None)
+            prometheus_path = getattr(metrics, 'prometheus_path', None)
+            model_metrics.export(
+                Path(__root__, json_path) if json_path else None,
+                Path(__root__, prometheus_path) if prometheus_path else None,
+            )
+            logger.info(f"Метрики модели сохранены: {json_path}, {prometheus_path}")
+        except Exception as ex:
+            logger.error("Ошибка сохранения метрик модели", ex, False)
+
+    @staticmethod
+    def create_output_writer(config: SimpleNamespace) -> Optional[WriteBehind]:
+        """Очередь отложенной записи ответов по секции `file_io.write_behind` конфигурации."""
+        write_behind = getattr(getattr(config, 'file_io', None), 'write_behind', None)
+        if not write_behind or not getattr(write_behind, 'enabled', False):
+            return None
+        return WriteBehind(
+            queue_size = getattr(write_behind, 'queue_size', 64),
+            writers = getattr(write_behind, 'writers', 4),
+        )
+
+    def begin_run(self, rate_limiter: Optional[RateLimiter] = None, output_writer: Optional[WriteBehind] = None) -> None:
+        """Сбрасывает состояние прохода. Вызывается перед обработкой файлов, в том числе из :class:`JobScheduler`."""
+        self.rate_limiter = rate_limiter
+        self.output_writer = output_writer
+        self._chat_flag = 'read_and_start_new'
+        self._processed_count = 0
+
+    async def _iter_files(self, start_dirs: list[str | Path]) -> AsyncIterator[tuple[Path, str]]:
+        """Сначала отдает задания, не завершенные в прошлых запусках, затем последовательно обходит стартовые директории."""
+        seen = set()
+        unfinished = self.job_queue.unfinished(self.role, self.lang) if self.job_queue else []
+        async for file_path, content in self._iter_queued(unfinished):
+            seen.add(str(file_path))
+            yield file_path, content
+        for process_driectory in start_dirs:
+            logger.info(f"Start {process_driectory=}")
+            async for file_path, content in self._yield_files_content(process_driectory):
+                if file_path and content and str(file_path) not in seen:
+                    self.enqueue(file_path)
+                    yield file_path, content
+
+    async def _iter_queued(self, jobs: list[tuple[str, str, str]]) -> AsyncIterator[tuple[Path, str]]:
+        """Читает файлы заданий из очереди `(file, role, lang)`.
+        Исчезнувшие и пустые файлы и файлы с уже актуальным результатом снимаются с очереди как выполненные."""
+        if jobs:
+            logger.info(f"Заданий из очереди: {len(jobs)}")
+        for file, _, _ in jobs:
+            file_path = Path(file)
+            try:
+                content = await asyncio.to_thread(read_text, file_path)
+            except Exception as ex:
+                logger.error(f"Ошибка при чтении файла из очереди: {file_path}\n{ex}")
+                if self.job_queue and not self.job_queue.read_only and not file_path.exists():
+                    self.job_queue.mark_done(file, self.role, self.lang)
+                continue
+            if not content or (not self.force and self._is_up_to_date(file_path, content)):
+                logger.debug(f"Задание из очереди не требует обработки (пустой файл или актуальный результат): {file_path}", None, False)
+                if self.job_queue and not self.job_queue.read_only:
+                    self.job_queue.mark_done(file, self.role, self.lang)
+                continue
+            yield file_path, content
+
+    def needs_processing(self, file_path: Path, content: str) -> bool:
+        """Нужно ли отправлять файл в модель: результат устарел (или `--force`) и задание не в списке `dead`."""
+        if self.job_queue and self.job_queue.state(file_path, self.role, self.lang) == DEAD:
+            return False
+        return self.force or not self._is_up_to_date(file_path, content)
+
+    def enqueue(self, file_path: Path) -> None:
+        """Регистрирует задание в персистентной очереди."""
+        if self.job_queue:
+            self.job_queue.enqueue(file_path, self.role, self.lang)
+
+    def _mark_failed(self, file_path: Path, error: str) -> None:
+        """Учитывает неудачную попытку в очереди заданий."""
+        if self.job_queue and self.job_queue.mark_failed(file_path, self.role, self.lang, error) == DEAD:
+            logger.error(f"Задание {file_path} ({self.role}, {self.lang}) перенесено в список dead")
+
+    def pack_items(self, items: Iterator | AsyncIterator, key_of = lambda item: None) -> Iterator | AsyncIterator:
+        """Собирает маленькие файлы в пакеты по секции `packing` конфигурации. По умолчанию поток не меняется.
+
+        Args:
+            items (Iterator | AsyncIterator): Поток заданий, в которых последний элемент - содержимое файла.
+            key_of: Ключ группировки заданий (для :class:`JobScheduler` - ассистент).
+        """
+        packing = getattr(self.config, 'packing', None)
+        if not packing or not getattr(packing, 'enabled', False):
+            return items
+        pack = pack_small_files_async if hasattr(items, '__aiter__') else pack_small_files
+        return pack(
+            items,
+            tokens_of = lambda item: estimate_tokens(item[-1]),
+            key_of = key_of,
+            small_file_tokens = getattr(packing, 'small_file_tokens', 500),
+            max_tokens = getattr(packing, 'max_tokens', 4000),
+            max_files = getattr(packing, 'max_files', 10),
+        )
+
+    async def _process_item(self, item: tuple[Path, str] | list[tuple[Path, str]]) -> bool:
+        """Обработка одного файла или пакета маленьких файлов."""
+        set_labels(role=self.role, lang=self.lang)
+        if self.job_queue:
+            for file_path, _ in (item if isinstance(item, list) else [item]):
+                self.job_queue.mark_in_flight(file_path, self.role, self.lang)
+        if isinstance(item, list):
+            return await self._process_pack(item)
+        return await self._process_file(item)
+
+    async def _process_pack(self, files: list[tuple[Path, str]]) -> bool:
+        """
+        Отправляет несколько маленьких файлов одним запросом и сохраняет ответ по каждому файлу отдельно.
+        Файлы, для которых в ответе нет своего блока, обрабатываются по одному.
+        """
+        try:
+            with stage_timer.measure(REQUEST_BUILDING):
+                request = self._create_pack_request(files)
+            if self.rate_limiter:
+                await self.rate_limiter.acquire(estimate_tokens(request))
+            with stage_timer.measure(MODEL):
+                response = await self.gemini_model.ask(request)
+        except Exception as e:
+            logger.error(f"Ошибка при запросе к модели: {e}")
+            response = None
+        with stage_timer.measure(POST_PROCESSING):
+            parts = split_packed_response(response, len(files)) if response else {}
+            parts = {index: self.remove_outer_quotes(part) for index, part in parts.items()}
+        saved = 0
+        for index, (file_path, content) in enumerate(files, start=1):
+            if index in parts:
+                saved += await self._finish_file(file_path, content, parts[index])
+            else:
+                logger.debug(f"Нет ответа для {file_path} в пакетном запросе, отправляю отдельно", None, False)
+                saved += await self._process_file((file_path, content))
+        return saved == len(files)
+
+    async def _process_file(self, item: tuple[Path, str]) -> bool:
+        """Подготовка запроса, обращение к модели и сохранение ответа для одного файла."""
+        file_path, content = item
+        try:
+            chunks = self._split_content(file_path, content)
+            if len(chunks) > 1:
+                response = await self._process_chunks(file_path, chunks)
+            else:
+                chat_data_folder = f'{self.config.docs_dir}/{self.role}/chat_history'
+                with stage_timer.measure(REQUEST_BUILDING, file_path.name):
+                    content_request = self._create_request(file_path, content)
+                # Новый чат начинает только первый запрос прохода
+                flag, self._chat_flag = self._chat_flag, 'save_chat'
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire(estimate_tokens(content_request))
+                if self._streaming_enabled():
+                    return await self._stream_file(file_path, content, content_request, chat_data_folder, flag)
+                with stage_timer.measure(MODEL, file_path.name):
+                    if self.stateless:
+                        response = await self.gemini_model.ask(content_request)
+                    else:
+                        response = await self.gemini_model.chat(content_request, chat_data_folder, flag = flag)
+                with stage_timer.measure(POST_PROCESSING, file_path.name):
+                    response = self.remove_outer_quotes(response) if response else response
+        except Exception as e:
+            logger.error(f"Ошибка при запросе к модели: {e}")
+            self._mark_failed(file_path, str(e))
+            return False
+        if not response:
+            logger.error("Ошибка ответа модели")
+            self._mark_failed(file_path, "Пустой ответ модели")
+            return False
+        return await self._finish_file(file_path, content, response)
+
+    async def _finish_file(self, file_path: Path, content: str, response: str) -> bool:
+        """Сохранение ответа для файла и отметка в манифесте.
+
+        С очередью отложенной записи (`output_writer`) ответ только ставится в очередь,
+        а манифест и очередь заданий обновляются после записи файла. Время записи в этом
+        случае учитывает писатель очереди (:class:`WriteBehind`).
+        """
+        if self.output_writer:
+            await self.output_writer.submit(
+                self._export_path(file_path), response, lambda saved: self._on_saved(file_path, content, saved)
+            )
+            return True
+        with stage_timer.measure(SAVING, file_path.name):
+            saved = await self._save_response(file_path, response, "gemini")
+        return self._on_saved(file_path, content, saved)
+
+    def _on_saved(self, file_path: Path, content: str, saved: bool) -> bool:
+        """Отметки после записи ответа: манифест и очередь заданий или ошибка сохранения."""
+        if not saved:
+            logger.error(f"Файл {file_path} \n НЕ сохранился")
+            self._mark_failed(file_path, "Ошибка сохранения ответа")
+            return False
+        self.manifest.update(Manifest.make_key(file_path, self.role, self.lang), self._fingerprint(content))
+        self._mark_done(file_path)
+        return True
+
+    def _mark_done(self, file_path: Path) -> None:
+        """Учитывает успешно обработанный файл."""
+        if self.job_queue:
+            self.job_queue.mark_done(file_path, self.role, self.lang)
+        self._processed_count += 1
+        print(f"Processed file number: {self._processed_count}", text_color="yellow")
+
+    def _streaming_enabled(self) -> bool:
+        """Включен ли потоковый режим (секция `streaming`) и поддерживает ли его модель."""
+        streaming = getattr(self.config, 'streaming', None)
+        method = 'ask_stream' if self.stateless else 'chat_stream'
+        return bool(streaming and getattr(streaming, 'enabled', False) and hasattr(self.gemini_model, method))
+
+    async def _stream_file(self, file_path: Path, content: str, request: str, chat_data_folder: str, flag: str) -> bool:
+        """
+        Потоковый режим: фрагменты ответа пишутся во временный файл по мере генерации,
+        клиент модели отдает их уже нормализованными, обрамление удаляется на лету,
+        по окончании файл переименовывается в итоговый.
+        """
+        export_path = self._export_path(file_path)
+        progress_every = getattr(self.config.streaming, 'progress_every_chars', 20000) or 0
+        reported = 0
+
+        def on_progress(written: int) -> None:
+            nonlocal reported
+            if progress_every and written - reported >= progress_every:
+                reported = written
+                print(f"{file_path.name}: получено {written} символов", text_color="gray")
+
+        try:
+            if self.stateless:
+                chunks = self.gemini_model.ask_stream(request)
+            else:
+                chunks = self.gemini_model.chat_stream(request, chat_data_folder, flag = flag)
+            with stage_timer.measure(MODEL, file_path.name):
+                written = await write_stream(
+                    chunks,
+                    export_path,
+                    (PrefixStripper(self.config.remove_prefixes),),
+                    on_progress,
+                )
+        except Exception as e:
+            logger.error(f"Ошибка при потоковом запросе к модели: {e}")
+            self._mark_failed(file_path, str(e))
+            return False
+        if not written:
+            logger.error("Ошибка ответа модели")
+            self._mark_failed(file_path, "Пустой ответ модели")
+            return False
+        print(f'Ответ модели сохранен в: {export_path}', text_color='green')
+        with stage_timer.measure(SAVING):
+            self.manifest.update(Manifest.make_key(file_path, self.role, self.lang), self._fingerprint(content))
+        self._mark_done(file_path)
+        return True
 
     async def send_file(self, file_path: Path) -> bool:
         """Отправка файла в модель."""
@@ -176,58 +587,167 @@ class CodeAssistant:
             logger.error(f'Ошибка при отправке файла: {ex}')
             return False
 
-    def _create_request(self, file_path: str, content: str) -> str:
-        """Создание запроса с учетом роли и языка."""
+    def _split_content(self, file_path: Path, content: str) -> list[str]:
+        """Делит большой файл на части по секции `chunking` конфигурации. По умолчанию (и для не-Python файлов) файл не делится."""
+        chunking = getattr(self.config, 'chunking', None)
+        if not chunking or not getattr(chunking, 'enabled', False):
+            return [content]
+        if Path(file_path).suffix not in getattr(chunking, 'extensions', ['.py']):
+            return [content]
+        return split_python_source(content, getattr(chunking, 'max_tokens', 6000))
+
+    async def _process_chunks(self, file_path: Path, chunks: list[str]) -> Optional[str]:
+        """
+        Отправляет части файла параллельными независимыми запросами и склеивает ответы в порядке частей.
+
+        Returns:
+            Optional[str]: Объединенный ответ или None, если хотя бы одна часть не обработана.
+        """
+        async def ask_chunk(index: int, chunk: str) -> Optional[str]:
+            with stage_timer.measure(REQUEST_BUILDING, f"{file_path.name} [{index + 1}]"):
+                request = self._create_request(file_path, chunk, part=(index + 1, len(chunks)))
+            if self.rate_limiter:
+                await self.rate_limiter.acquire(estimate_tokens(request))
+            with stage_timer.measure(MODEL):
+                response = await self.gemini_model.ask(request)
+            with stage_timer.measure(POST_PROCESSING):
+                return self.remove_outer_quotes(response) if response else None
+
+        logger.info(f"Файл {file_path} разбит на {len(chunks)} частей")
+        responses = await asyncio.gather(*(ask_chunk(index, chunk) for index, chunk in enumerate(chunks)))
+        if not all(responses):
+            logger.error(f"Не все части файла {file_path} обработаны моделью")
+            return None
+        return '\n\n'.join(responses)
+
+    def create_prompt_builder(self, format: Optional[str] = None) -> PromptBuilder:
+        """
+        Шаблоны запросов для роли и языка ассистента.
+
+        Args:
+            format (Optional[str]): `template` или `repr`. По умолчанию - `prompt_builder.format` конфигурации.
+        """
+        roles_translations = getattr(self.translations.roles, self.role, 'doc_writer_md')
+        return PromptBuilder(
+            role_description = getattr(roles_translations, self.lang, 'Your specialization is documentation creation in the `MD` format'),
+            lang = self.lang,
+            file_location_label = getattr(self.translations.file_location_translated, self.lang, 'File location'),
+            # Инструкция роли уже передана модели в системной инструкции
+            instruction = '' if self.instruction_in_prefix else self.code_instruction or '',
+            format = format or getattr(getattr(self.config, 'prompt_builder', None), 'format', 'template'),
+        )
+
+    @staticmethod
+    def _request_path(file_path: str | Path) -> Optional[str]:
+        """Путь файла, показываемый модели в запросе."""
+        return get_relative_path(file_path, "hypotez")
+
+    def _create_request(self, file_path: str, content: str, part: Optional[tuple[int, int]] = None) -> str:
+        """Создание запроса с учетом роли и языка.
+
+        Args:
+            part (Optional[tuple[int, int]]): Номер части и количество частей, если файл разбит на части.
+        """
         try:
-            roles_translations = getattr(self.translations.roles, self.role, 'doc_writer_md')
-            role_description_translated = getattr(roles_translations, self.lang, 'Your specialization is documentation creation in the `MD` format')
-            file_location_translated = getattr(self.translations.file_location_translated, self.lang, 'Path to file: ')
-            content_request = {
-                "role": f"{role_description_translated}",
-                "output_language": self.lang,
-                f"{file_location_translated}": get_relative_path(file_path, "hypotez"),
-                "instruction": self.code_instruction or '',
-                "input_code": f"```{content}```",
-            }
-            return str(content_request)
+            prompt = self.prompt_builder.file(self._request_path(file_path), content, part)
+            logger.debug(f"Запрос для {file_path}: ~{prompt.tokens} токенов", None, False)
+            return prompt.text
         except Exception as ex:
              logger.error(f"Ошибка в _create_request: {ex}")
              return ''
     
-    def _yield_files_content(self, process_driectory: str| Path) -> Iterator[tuple[Path, str]]:
-        """Генерирует пути файлов и их содержимое по указанным шаблонам."""
+    def _create_pack_request(self, files: list[tuple[Path, str]]) -> str:
+        """Создание одного запроса для пакета маленьких файлов с разделителями для каждого файла."""
         try:
-            exclude_file_patterns = [re.compile(pattern) for pattern in self.config.exclude_file_patterns]
+            prompt = self.prompt_builder.pack(
+                [(get_relative_path(file_path, "hypotez") or Path(file_path).name, content) for file_path, content in files]
+            )
+            logger.debug(f"Пакетный запрос ({len(files)} файлов): ~{prompt.tokens} токенов", None, False)
+            return prompt.text
+        except Exception as ex:
+             logger.error(f"Ошибка в _create_pack_request: {ex}")
+             return ''
+
+    async def _yield_files_content(self, process_driectory: str| Path) -> AsyncIterator[tuple[Path, str]]:
+        """Генерирует пути файлов и их содержимое по указанным шаблонам, пропуская файлы с актуальным результатом."""
+        async for file_path, content in self._read_files(process_driectory):
+            if not file_path or not content:
+                yield file_path, content
+                continue
+            with stage_timer.measure(DISCOVERY, file_path.name):
+                skip = not self.needs_processing(file_path, content)
+            if skip:
+                logger.debug(f"Файл не изменился или в списке dead, пропущен: {file_path}", None, False)
+                continue
+            yield file_path, content
+
+    async def _read_files(self, process_driectory: str| Path) -> AsyncIterator[tuple[Path, str]]:
+        """Генерирует пути файлов и их содержимое по указанным шаблонам.
+
+        Исключенные директории отсекаются до спуска в них (:class:`FileWalker`).
+        Файлы читаются наперед в пуле потоков (секция `file_io`, :func:`read_ahead`),
+        цикл событий только ожидает результат.
+        """
+        try:
+            walker = FileWalker.from_config(self.config)
         except Exception as e:
             logger.error(f"Не удалось скомпилировать регулярки из списка:{self.config.exclude_file_patterns} \n{e}")
             return
-        include_file_patterns = self.config.include_files
-        process_driectory = Path(process_driectory) if isinstance(process_driectory, str) else process_driectory
-        for file_path in process_driectory.rglob("*"):
-            if not any(fnmatch.fnmatch(file_path.name, pattern) for pattern in include_file_patterns):
-                continue
-            if any(exclude_dir in file_path.parts for exclude_dir in self.config.exclude_dirs):
-                continue
-            if any(exclude.match(str(file_path)) for exclude in exclude_file_patterns):
-                continue
-            if str(file_path) in self.config.exclude_files:
-                continue
-            try:
-                content = file_path.read_text(encoding="utf-8")
+        file_io = getattr(self.config, 'file_io', SimpleNamespace())
+        files = read_ahead(
+            walker.walk(process_driectory),
+            threads = getattr(file_io, 'read_threads', 4),
+            depth = getattr(file_io, 'read_ahead', 16),
+        )
+        try:
+            while True:
+                # Обход и чтение идут в фоновых потоках; здесь учитывается только ожидание их результата
+                with stage_timer.measure(DISCOVERY):
+                    try:
+                        file_path, pending = await anext(files)
+                    except StopAsyncIteration:
+                        break
+                try:
+                    with stage_timer.measure(READING, file_path.name):
+                        content = await asyncio.wrap_future(pending)
+                except Exception as ex:
+                    logger.error(f"Ошибка при чтении файла: {file_path}\n{ex}")
+                    yield None, None
+                    continue
                 yield file_path, content
-            except Exception as ex:
-                logger.error(f"Ошибка при чтении файла: {file_path}\n{ex}")
-                yield None, None
+        finally:
+            await files.aclose()
+        logger.info(
+            f"Обход {process_driectory}: просмотрено {walker.stats.visited}, "
+            f"отсечено директорий {walker.stats.pruned}, выбрано файлов {walker.stats.matched}"
+        )
+
+    def _fingerprint(self, content: str) -> str:
+        """Отпечаток задания для манифеста: содержимое файла, роль, язык, инструкции и модель."""
+        return Manifest.fingerprint(
+            content,
+            self.role,
+            self.lang,
+            self.system_instruction + self.code_instruction,
+            self.config.gemini.model_name,
+        )
+
+    def _is_up_to_date(self, file_path: Path, content: str) -> bool:
+        """Проверяет, что результат для файла уже сохранен и входные данные с тех пор не менялись."""
+        key = Manifest.make_key(file_path, self.role, self.lang)
+        return self.manifest.is_current(key, self._fingerprint(content)) and self._export_path(file_path).exists()
+
+    def _export_path(self, file_path: Path) -> Path:
+        """Путь файла с ответом модели для исходного файла."""
+        file_path = str(file_path).replace(str(self.config.start_dir), f'{self.config.docs_dir}/{self.role}')
+        suffix =  '.md'  # По умолчанию используется .md
+        return Path(f"{file_path}{suffix}") if self.config.save_as_md else Path(file_path)
    
     async def _save_response(self, file_path: Path, response: str, model_name: str) -> None:
         """Сохранение ответа модели в файл с добавлением суффикса."""
         try:
-            file_path = str(file_path).replace(str(self.config.start_dir), f'{self.config.docs_dir}/{self.role}')
-
-            suffix =  '.md'  # По умолчанию используется .md
-            export_path = Path(f"{file_path}{suffix}") if self.config.save_as_md else Path(file_path)
-            export_path.parent.mkdir(parents=True, exist_ok=True)
-            export_path.write_text(response, encoding='utf-8')
+            export_path = self._export_path(file_path)
+            await write_text_atomic(export_path, response)
             print(f'Ответ модели сохранен в: {export_path}', text_color='green')
             return True
         except Exception as ex:
@@ -235,79 +755,164 @@ class CodeAssistant:
             ...
             return False
         
+    def close(self) -> None:
+        """Закрывает очередь заданий, если она открыта этим ассистентом."""
+        if self.job_queue and self._owns_job_queue:
+            self.job_queue.close()
+
     def run(self):
         """Запуск процесса обработки файлов."""
         signal.signal(
             signal.SIGINT, signal_handler
         )  # Обработка прерывания (Ctrl+C)
-        asyncio.run(self.process_files())
+        try:
+            run_async(self.process_files(start_dir=self.start_dirs or None))
+        finally:
+            self.close()
 
 def signal_handler(signal, frame):
-    """Обработка прерывания выполнения."""
-    print("Процесс был прерван", text_color="red")
-    sys.exit(0)
-
-def parse_args():
-    """Разбор аргументов командной строки."""
-    parser = argparse.ArgumentParser(description="Ассистент для программистов")
-    parser.add_argument(
-        "--role",
-        type=str,
-        default="code_checker",
-        help="Роль для выполнения задачи",
-    )
-    parser.add_argument("--lang", type=str, default="ru", help="Язык выполнения")
-    parser.add_argument(
-        "--model",
-        nargs="+",
-        type=str,
-        default=["gemini"],
-        help="Список моделей для инициализации",
-    )
-    parser.add_argument(
-        "--start-dirs",
-        nargs="+",
-        type=str,
-        default=[],
-        help="Список директорий для обработки",
+    """Обработка прерывания выполнения.
+
+    Первое Ctrl+C - мягкая остановка: новые задания не берутся, запросы в работе завершаются,
+    оставшиеся задания остаются в очереди до следующего запуска. Повторное Ctrl+C - немедленный выход.
+    """
+    if shutdown_requested():
+        print("Процесс был прерван", text_color="red")
+        sys.exit(0)
+    request_shutdown()
+    print("Останавливаюсь после завершения запросов в работе. Повторное Ctrl+C - немедленный выход", text_color="red")
+
+def start_profile(profile: Optional[str | bool]) -> None:
+    """Включает запись временной шкалы этапов, если задан `--profile`."""
+    if profile:
+        stage_timer.start_trace()
+
+
+def write_profile(profile: Optional[str | bool]) -> None:
+    """Сохраняет временную шкалу этапов и печатает сводную таблицу (`--profile`)."""
+    if not profile:
+        return
+    path = profile if isinstance(profile, str) else Path(
+        __root__, 'logs', 'profile', f"code_assistant_{time.strftime('%Y%m%d%H%M%S')}.trace.json"
     )
-    return vars(parser.parse_args())
+    try:
+        path = stage_timer.write_trace(path)
+        print(stage_timer.summary().splitlines())
+        print(f"Временная шкала этапов сохранена в {path} (chrome://tracing, https://www.speedscope.app)", text_color='green')
+    except Exception as ex:
+        logger.error("Ошибка сохранения профиля", ex, False)
 
 
-def main():
-    """Основная функция для запуска."""
-    args = parse_args()
-    assistant = CodeAssistant(**args)
-    assistant.run()
+def make_plan(scheduler, plan_path: str | bool, start_dir=None) -> None:
+    """Составляет план прохода (`--plan`), сохраняет его и печатает сводку."""
+    from src.assistant.planner import format_summary, write_plan
 
+    plan = run_async(scheduler.plan(start_dir))
+    path = write_plan(plan, plan_path if isinstance(plan_path, str) else None)
+    print(format_summary(plan).splitlines())
+    print(f"План сохранен в {path}. Запуск по плану: --from-plan {path}", text_color='green')
 
-if __name__ == "__main__":
+
+def run_plan(plan_path: str, **kwargs) -> bool:
+    """Обрабатывает задания плана (`--from-plan`) ассистентами ролей и языков плана."""
+    from src.assistant.planner import load_plan
+    from src.assistant.scheduler import JobScheduler
+
+    plan = load_plan(plan_path)
+    kwargs['force'] = kwargs.get('force') or plan.get('force', False)
+    scheduler = JobScheduler(roles=plan['roles'], langs=plan['langs'], **kwargs)
+    logger.info(f"Заданий в плане {plan_path}: {len(plan['jobs'])}")
+    try:
+        return run_async(scheduler.process_plan(plan))
+    finally:
+        scheduler.close()
+
+
+def wait_idle(seconds: float) -> None:
+    """Пауза между проходами, прерываемая мягкой остановкой (Ctrl+C)."""
+    if seconds > 0:
+        logger.info(f"Заданий для обработки нет, следующий проход через {seconds} с")
+    deadline = time.monotonic() + seconds
+    while not shutdown_requested() and time.monotonic() < deadline:
+        time.sleep(min(1.0, deadline - time.monotonic()))
+
+
+def main():
     """
-    Код запускает бесконечный цикл, в котором выполняется обработка файлов с учетом ролей и языков, указанных в конфигурации.
-    Конфигурация обновляется в каждом цикле, что позволяет динамически изменять настройки во время работы программы.
-    Для каждой комбинации языка и роли создается экземпляр класса :class:`CodeAssistant`, который обрабатывает файлы, используя заданную модель ИИ.
+    Основная функция для запуска.
+
+    Все комбинации ролей и языков обрабатываются планировщиком :class:`JobScheduler` за один
+    обход дерева: каждый файл читается один раз и отправляется всем экземплярам :class:`CodeAssistant`.
+    Роли и языки берутся из `--role` и `--lang`, по умолчанию - `roles` и `languages` конфигурации.
+
+    Без `--role`, `--lang` и разовых режимов (`--plan`, `--from-plan`, `--retry-dead`, `--watch`)
+    проходы повторяются до Ctrl+C. Конфигурация перечитывается перед каждым проходом, что позволяет
+    менять роли, языки и стартовые директории во время работы; планировщик и очередь заданий
+    пересоздаются только при изменении ролей или языков. Если проход ничего не обработал, следующий
+    начинается через `loop.idle_interval_seconds` секунд. `--force` действует только на первый проход.
     """
-    config_path = BASE_PATH / "code_assistant.json"
-    while True:
-        try:
-            config = j_loads_ns(config_path)
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке конфигурации: {e}")
-            sys.exit(1)
-        for lang in config.languages:
-            for role in config.roles:
-                logger.debug(f"Start role: {role}, lang: {lang}")
-                try:
-                    assistant = CodeAssistant(
-                        role=role,
-                        lang=lang,
-                        model=["gemini"],
-                    )
-                    asyncio.run(assistant.process_files(start_dir=config.start_dirs))
-                except Exception as e:
-                    logger.error(f"Ошибка при выполнении process_files: {e}")
+    args = parse_args()
+    profile = args.pop("profile", None)
+    plan_path = args.pop("plan", None)
+    from_plan = args.pop("from_plan", None)
+    watch = args.pop("watch", False)
+    role, lang = args.pop("role", None), args.pop("lang", None)
+    signal.signal(signal.SIGINT, signal_handler)  # Обработка прерывания (Ctrl+C)
+
+    if from_plan:
+        start_profile(profile)
         try:
-            config = j_loads_ns(config_path)
-        except Exception as e:
-            logger.error(f"Ошибка при обновлении конфигурации: {e}")
-            sys.exit(1)
\ No newline at end of file
+            run_plan(from_plan, **args)
+        finally:
+            write_profile(profile)
+        return
+
+    from src.assistant.scheduler import JobScheduler
+
+    config_path = BASE_PATH / "code_assistant.json"
+    repeat = not (role or lang or plan_path or watch or args["retry_dead"])
+    scheduler = None
+    try:
+        while not shutdown_requested():
+            try:
+                config = j_loads_ns(config_path)
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке конфигурации: {e}")
+                sys.exit(1)
+            roles = [role] if role else config.roles
+            langs = [lang] if lang else config.languages
+            start_dir = args["start_dirs"] or getattr(config, 'start_dirs', None) or config.start_dir
+            if not scheduler or (scheduler.roles, scheduler.langs) != (roles, langs):
+                if scheduler:
+                    scheduler.close()
+                logger.debug(f"Start roles: {roles}, langs: {langs}")
+                scheduler = JobScheduler(roles=roles, langs=langs, plan_only=bool(plan_path), **args)
+            start_profile(profile)
+            try:
+                if args["retry_dead"]:
+                    run_async(scheduler.retry_dead_jobs())
+                elif plan_path:
+                    make_plan(scheduler, plan_path, start_dir)
+                elif watch:
+                    run_async(scheduler.watch(start_dir=start_dir))
+                else:
+                    run_async(scheduler.process_files(start_dir=start_dir))
+            except Exception as e:
+                logger.error(f"Ошибка при выполнении process_files: {e}")
+            finally:
+                write_profile(profile)
+            if not repeat:
+                break
+            # `--force` действует только на первый проход, дальше работает инкрементальный режим
+            args["force"] = False
+            for assistant in scheduler.assistants:
+                assistant.force = False
+            if not scheduler.processed:
+                wait_idle(getattr(getattr(config, 'loop', None), 'idle_interval_seconds', 300))
+    finally:
+        if scheduler:
+            scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
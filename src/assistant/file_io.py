@@ -0,0 +1,232 @@
+## \file /src/assistant/file_io.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.file_io
+	:platform: Windows, Unix
+	:synopsis: Чтение исходников с упреждением в пуле потоков и отложенная запись ответов
+
+Раньше файлы читались `Path.read_text`, а ответы записывались `Path.write_text`
+прямо в цикле событий. На сетевых файловых системах каждая такая операция
+останавливала все одновременные запросы к модели.
+
+:func:`read_ahead` - асинхронный генератор: обходит дерево в отдельном потоке и читает
+до `depth` следующих файлов в пуле потоков, пока обработчики заняты текущими.
+Потребитель получает файлы в порядке обхода и ждет (не блокируя цикл событий) только
+тогда, когда очередной файл еще не прочитан.
+
+:class:`WriteBehind` принимает ответы в ограниченную очередь и записывает их в фоне
+(в пуле потоков, через временный файл с переименованием). Если очередь заполнена,
+:meth:`WriteBehind.submit` ждет освобождения места - обработчики не обгоняют диск.
+:meth:`WriteBehind.close` дописывает все принятые ответы, в том числе при мягкой остановке.
+Время этапа `saving` (:mod:`src.assistant.stages`) учитывают писатели - по фактической записи
+файла, а не по постановке в очередь.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from src.assistant.stages import stage_timer, SAVING
+from src.logger.logger import logger
+
+
+_DONE = object()
+
+
+class _WalkError:
+    """Ошибка обхода, переданная из потока обхода потребителю."""
+
+    def __init__(self, ex: BaseException):
+        self.ex = ex
+
+
+def read_text(path: Path) -> str:
+    """Чтение исходного файла (выполняется в пуле потоков)."""
+    return path.read_text(encoding='utf-8')
+
+
+async def read_ahead(
+    paths: Iterator[Path],
+    read: Callable[[Path], str] = read_text,
+    threads: int = 4,
+    depth: int = 16,
+) -> AsyncIterator[tuple[Path, Future]]:
+    """
+    Читает файлы из `paths` с упреждением.
+
+    Обход `paths` и чтение выполняются в потоках; ожидание очередного пути - в пуле потоков
+    цикла событий (`run_in_executor`), так что цикл событий не блокируется.
+    Содержимое файла потребитель получает через `await asyncio.wrap_future(pending)`.
+
+    Args:
+        paths (Iterator[Path]): Пути в порядке обхода (например, :meth:`FileWalker.walk`).
+        read (Callable[[Path], str]): Функция чтения одного файла.
+        threads (int): Количество потоков чтения.
+        depth (int): Сколько файлов может быть прочитано (или читаться) наперед. `0` - без упреждения.
+
+    Yields:
+        tuple[Path, Future]: Путь и `Future` с содержимым файла (или ошибкой чтения).
+    """
+    loop = asyncio.get_running_loop()
+    if depth <= 0:
+        while True:
+            path = await loop.run_in_executor(None, next, paths, _DONE)
+            if path is _DONE:
+                return
+            yield path, loop.run_in_executor(None, read, path)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix='read_ahead')
+    pending: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Обход ждет, пока потребитель не заберет прочитанное, но прекращается при закрытии генератора
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def dispatch() -> None:
+        try:
+            for path in paths:
+                if not put((path, executor.submit(read, path))):
+                    return
+        except Exception as ex:
+            put(_WalkError(ex))
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=dispatch, name='read_ahead_walk', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = await loop.run_in_executor(None, pending.get)
+            if item is _DONE:
+                break
+            if isinstance(item, _WalkError):
+                raise item.ex
+            yield item
+    finally:
+        stop.set()
+        # Освобождает ожидание `pending.get`, если генератор закрыт во время него
+        try:
+            pending.put_nowait(_DONE)
+        except queue.Full:
+            pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _write_text_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        tmp_path.write_text(text, encoding='utf-8')
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+async def write_text_atomic(path: Path, text: str) -> None:
+    """
+    Записывает `text` во временный файл рядом с `path` и переименовывает его в `path`.
+    Создание директорий, запись и переименование выполняются одним заданием в пуле потоков.
+    """
+    await asyncio.to_thread(_write_text_atomic, Path(path), text)
+
+
+class WriteBehind:
+    """
+    .. :class:`WriteBehind`
+        :synopsis: Ограниченная очередь записи ответов с фоновыми писателями
+    """
+
+    def __init__(self, queue_size: int = 64, writers: int = 4):
+        """
+        Args:
+            queue_size (int): Сколько ответов может ждать записи. При заполнении `submit` ждет.
+            writers (int): Количество одновременных операций записи.
+        """
+        self.queue_size = max(1, queue_size)
+        self.writers = max(1, writers)
+        self.written = 0
+        self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _start(self) -> None:
+        # Задачи создаются в цикле событий, в котором идет проход
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._writer()) for _ in range(self.writers)]
+
+    @property
+    def pending(self) -> int:
+        """Количество ответов, еще не записанных на диск."""
+        return self._queue.qsize() if self._queue else 0
+
+    async def submit(
+        self,
+        path: Path,
+        text: str,
+        on_done: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        """
+        Ставит ответ в очередь записи.
+
+        Args:
+            path (Path): Итоговый файл.
+            text (str): Содержимое.
+            on_done (Optional[Callable[[bool], None]]): Вызывается после записи с признаком успеха.
+        """
+        if self._queue is None:
+            self._start()
+        await self._queue.put((Path(path), text, on_done))
+
+    async def _writer(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                if item is _DONE:
+                    return
+                path, text, on_done = item
+                try:
+                    with stage_timer.measure(SAVING, path.name):
+                        await write_text_atomic(path, text)
+                    self.written += 1
+                    ok = True
+                except Exception as ex:
+                    self.failed += 1
+                    logger.error(f"Ошибка записи файла {path}", ex, False)
+                    ok = False
+                if on_done:
+                    try:
+                        on_done(ok)
+                    except Exception as ex:
+                        logger.error(f"Ошибка обработки записанного файла {path}", ex, False)
+            finally:
+                self._queue.task_done()
+
+    async def flush(self) -> None:
+        """Ждет записи всех принятых ответов."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self) -> None:
+        """Дописывает очередь и останавливает писателей."""
+        if self._queue is None:
+            return
+        for _ in self._tasks:
+            await self._queue.put(_DONE)
+        await asyncio.gather(*self._tasks)
+        self._queue = None
+        self._tasks = []
@@ -0,0 +1,153 @@
+## \file /src/assistant/file_walker.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.file_walker
+	:platform: Windows, Unix
+	:synopsis: Обход дерева исходников с отсечением исключенных директорий
+
+Исключенные директории (`exclude_dirs`) отсекаются до спуска в них, поэтому
+`node_modules`, `.git`, `venv` и т.п. не обходятся. Шаблоны `include_files`,
+`exclude_files` и `exclude_file_patterns` объединяются в три заранее
+скомпилированных регулярных выражения.
+
+Записи `exclude_files` без символов glob (`*`, `?`, `[`) сравниваются точно, как и раньше:
+полный путь - с путем файла, имя без директорий - с именем файла (`header.py`).
+Записи с символами glob (`*.png`) проверяются `fnmatch` по имени и по полному пути.
+"""
+
+import fnmatch
+import os
+import re
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterable, Iterator, Optional
+
+from src.logger.logger import logger
+
+
+def _compile_globs(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    """Объединяет glob-шаблоны в одно регулярное выражение. Регистр учитывается так же, как в `fnmatch.fnmatch`."""
+    patterns = [fnmatch.translate(pattern) for pattern in patterns or []]
+    if not patterns:
+        return None
+    flags = re.IGNORECASE if os.name == 'nt' else 0
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+
+
+def _has_magic(pattern: str) -> bool:
+    """Есть ли в записи символы glob."""
+    return any(char in pattern for char in '*?[')
+
+
+def _compile_regexes(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    """Объединяет регулярные выражения в одно."""
+    patterns = list(patterns or [])
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+
+class FileWalker:
+    """
+    .. :class:`FileWalker`
+        :synopsis: Выбор файлов для обработки по правилам из `code_assistant.json`
+
+    Статистика последнего обхода доступна в `stats`:
+    `visited` - просмотрено записей, `pruned` - отсечено директорий, `matched` - выбрано файлов.
+    """
+
+    def __init__(
+        self,
+        include_files: Iterable[str] = (),
+        exclude_dirs: Iterable[str] = (),
+        exclude_files: Iterable[str] = (),
+        exclude_file_patterns: Iterable[str] = (),
+    ):
+        """
+        Args:
+            include_files (Iterable[str]): glob-шаблоны имен файлов для обработки.
+            exclude_dirs (Iterable[str]): Имена директорий, в которые не нужно спускаться.
+            exclude_files (Iterable[str]): Имена, полные пути или glob-шаблоны исключаемых файлов.
+            exclude_file_patterns (Iterable[str]): Регулярные выражения для полного пути исключаемых файлов.
+
+        Raises:
+            re.error: Если регулярное выражение из `exclude_file_patterns` некорректно.
+        """
+        self.exclude_dirs = frozenset(exclude_dirs or ())
+        self._include = _compile_globs(include_files)
+        exclude_files = list(exclude_files or ())
+        self._exclude_files = _compile_globs(pattern for pattern in exclude_files if _has_magic(pattern))
+        exact = [pattern for pattern in exclude_files if not _has_magic(pattern)]
+        self._exclude_names = frozenset(pattern for pattern in exact if os.path.basename(pattern) == pattern)
+        self._exclude_paths = frozenset(str(Path(pattern)) for pattern in exact if os.path.basename(pattern) != pattern)
+        self._exclude_patterns = _compile_regexes(exclude_file_patterns)
+        self.stats = SimpleNamespace(visited=0, pruned=0, matched=0)
+
+    @classmethod
+    def from_config(cls, config: SimpleNamespace) -> 'FileWalker':
+        """Создает обходчик по настройкам из `code_assistant.json`."""
+        return cls(
+            include_files=getattr(config, 'include_files', []),
+            exclude_dirs=getattr(config, 'exclude_dirs', []),
+            exclude_files=getattr(config, 'exclude_files', []),
+            exclude_file_patterns=getattr(config, 'exclude_file_patterns', []),
+        )
+
+    def is_match(self, file_path: str | Path) -> bool:
+        """Проверяет имя и путь файла (без учета директорий) по правилам включения и исключения."""
+        file_path = str(file_path)
+        name = os.path.basename(file_path)
+        if not self._include or not self._include.match(name):
+            return False
+        if self._exclude_patterns and self._exclude_patterns.match(file_path):
+            return False
+        if name in self._exclude_names:
+            return False
+        if self._exclude_paths and str(Path(file_path)) in self._exclude_paths:
+            return False
+        if self._exclude_files and (self._exclude_files.match(name) or self._exclude_files.match(file_path)):
+            return False
+        return True
+
+    def walk(self, root: str | Path) -> Iterator[Path]:
+        """
+        Обходит `root` в глубину и выдает подходящие файлы.
+
+        Args:
+            root (str | Path): Корневая директория.
+
+        Yields:
+            Path: Путь к подходящему файлу.
+        """
+        self.stats = SimpleNamespace(visited=0, pruned=0, matched=0)
+        stack = [os.fspath(root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    entries = sorted(entries, key=lambda entry: entry.name)
+            except OSError as ex:
+                logger.error(f"Не удалось прочитать директорию {directory}", ex, False)
+                continue
+            subdirs = []
+            for entry in entries:
+                self.stats.visited += 1
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name in self.exclude_dirs:
+                            self.stats.pruned += 1
+                        else:
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if self.is_match(entry.path):
+                    self.stats.matched += 1
+                    yield Path(entry.path)
+            # Обратный порядок, чтобы директории обходились по алфавиту
+            stack.extend(reversed(subdirs))
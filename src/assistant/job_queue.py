@@ -0,0 +1,193 @@
+## \file /src/assistant/job_queue.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.job_queue
+	:platform: Windows, Unix
+	:synopsis: Персистентная очередь заданий (файл, роль, язык) на SQLite
+
+Состояния задания: `pending` - ожидает, `in_flight` - отправлено в модель,
+`done` - результат сохранен, `failed` - ошибка (будет повторено при следующем запуске),
+`dead` - превышено число попыток, задание ждет ручного повтора (`--retry-dead`).
+
+После аварийного завершения задания в состоянии `in_flight` возвращаются в `pending`,
+и следующий запуск начинает с них. Пробный проход (`--plan`) открывает очередь только
+для чтения (`read_only`): база не создается и не изменяется.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.logger.logger import logger
+
+
+PENDING = 'pending'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+DEAD = 'dead'
+
+
+class JobQueue:
+    """
+    .. :class:`JobQueue`
+        :synopsis: Журнал заданий с состояниями и списком "мертвых" заданий
+    """
+
+    db_path: Path
+    max_attempts: int
+    read_only: bool
+
+    def __init__(self, db_path: str | Path, max_attempts: int = 3, read_only: bool = False):
+        """
+        Args:
+            db_path (str | Path): Путь к файлу базы SQLite.
+            max_attempts (int): Количество неудачных попыток, после которого задание становится `dead`.
+            read_only (bool): Открыть существующую базу только для чтения, без создания таблицы
+                и восстановления прерванных заданий.
+        """
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.read_only = read_only
+        if read_only:
+            self._connection = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, isolation_level=None)
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.db_path, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                file TEXT NOT NULL,
+                role TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (file, role, lang)
+            )
+            """
+        )
+        self.recover()
+
+    def _set_state(self, file: str | Path, role: str, lang: str, state: str, error: Optional[str] = None) -> None:
+        """Записывает состояние задания, создавая его при необходимости."""
+        self._connection.execute(
+            """
+            INSERT INTO jobs (file, role, lang, state, attempts, error, updated) VALUES (?, ?, ?, ?, 0, ?, ?)
+            ON CONFLICT (file, role, lang) DO UPDATE SET state = excluded.state, error = excluded.error, updated = excluded.updated
+            """,
+            (str(file), role, lang, state, error, time.time()),
+        )
+
+    def recover(self) -> int:
+        """
+        Возвращает прерванные задания (`in_flight`) в очередь.
+
+        Returns:
+            int: Количество восстановленных заданий.
+        """
+        cursor = self._connection.execute(
+            'UPDATE jobs SET state = ?, updated = ? WHERE state = ?', (PENDING, time.time(), IN_FLIGHT)
+        )
+        if cursor.rowcount:
+            logger.info(f"Восстановлено прерванных заданий: {cursor.rowcount}")
+        return cursor.rowcount
+
+    def state(self, file: str | Path, role: str, lang: str) -> Optional[str]:
+        """Текущее состояние задания или None, если задания нет."""
+        row = self._connection.execute(
+            'SELECT state FROM jobs WHERE file = ? AND role = ? AND lang = ?', (str(file), role, lang)
+        ).fetchone()
+        return row[0] if row else None
+
+    def enqueue(self, file: str | Path, role: str, lang: str) -> None:
+        """Ставит задание в очередь. Задания из списка `dead` не трогаются."""
+        if self.state(file, role, lang) not in (DEAD, IN_FLIGHT):
+            self._set_state(file, role, lang, PENDING)
+
+    def mark_in_flight(self, file: str | Path, role: str, lang: str) -> None:
+        """Отмечает, что задание отправлено в модель."""
+        self._set_state(file, role, lang, IN_FLIGHT)
+
+    def mark_done(self, file: str | Path, role: str, lang: str) -> None:
+        """Отмечает успешное выполнение и сбрасывает счетчик попыток."""
+        self._set_state(file, role, lang, DONE)
+        self._connection.execute(
+            'UPDATE jobs SET attempts = 0 WHERE file = ? AND role = ? AND lang = ?', (str(file), role, lang)
+        )
+
+    def mark_failed(self, file: str | Path, role: str, lang: str, error: Optional[str] = None) -> str:
+        """
+        Учитывает неудачную попытку. После `max_attempts` попыток задание переносится в `dead`.
+
+        Returns:
+            str: Новое состояние задания.
+        """
+        self._set_state(file, role, lang, FAILED, error)
+        self._connection.execute(
+            'UPDATE jobs SET attempts = attempts + 1 WHERE file = ? AND role = ? AND lang = ?', (str(file), role, lang)
+        )
+        self._connection.execute(
+            'UPDATE jobs SET state = ? WHERE file = ? AND role = ? AND lang = ? AND attempts >= ?',
+            (DEAD, str(file), role, lang, self.max_attempts),
+        )
+        return self.state(file, role, lang)
+
+    def unfinished(self, role: Optional[str] = None, lang: Optional[str] = None) -> list[tuple[str, str, str]]:
+        """
+        Задания, оставшиеся от прошлых запусков (`pending` и `failed`), в порядке постановки.
+        Без восстановления (`read_only`) в их число входят и прерванные задания (`in_flight`).
+
+        Returns:
+            list[tuple[str, str, str]]: Тройки (file, role, lang).
+        """
+        states = [PENDING, FAILED, IN_FLIGHT] if self.read_only else [PENDING, FAILED]
+        query = f"SELECT file, role, lang FROM jobs WHERE state IN ({', '.join('?' * len(states))})"
+        params: list = list(states)
+        if role:
+            query += ' AND role = ?'
+            params.append(role)
+        if lang:
+            query += ' AND lang = ?'
+            params.append(lang)
+        return self._connection.execute(query + ' ORDER BY updated', params).fetchall()
+
+    def requeue_dead(self, role: Optional[str] = None, lang: Optional[str] = None) -> list[tuple[str, str, str]]:
+        """
+        Возвращает задания из списка `dead` в очередь со сброшенным счетчиком попыток.
+
+        Returns:
+            list[tuple[str, str, str]]: Тройки (file, role, lang) возвращенных заданий.
+        """
+        query = 'SELECT file, role, lang FROM jobs WHERE state = ?'
+        params: list = [DEAD]
+        if role:
+            query += ' AND role = ?'
+            params.append(role)
+        if lang:
+            query += ' AND lang = ?'
+            params.append(lang)
+        jobs = self._connection.execute(query, params).fetchall()
+        for file, job_role, job_lang in jobs:
+            self._connection.execute(
+                'UPDATE jobs SET state = ?, attempts = 0, updated = ? WHERE file = ? AND role = ? AND lang = ?',
+                (PENDING, time.time(), file, job_role, job_lang),
+            )
+        return jobs
+
+    def counts(self) -> dict[str, int]:
+        """Количество заданий в каждом состоянии."""
+        return dict(self._connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        try:
+            self._connection.close()
+        except Exception as ex:
+            logger.error(f"Ошибка закрытия очереди заданий {self.db_path}", ex, False)
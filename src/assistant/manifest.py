@@ -0,0 +1,102 @@
+## \file /src/assistant/manifest.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.manifest
+	:platform: Windows, Unix
+	:synopsis: Манифест обработанных файлов для инкрементального режима
+
+Для каждой пары (файл, роль, язык) хранится отпечаток - хеш содержимого файла,
+роли, языка, текста инструкций и имени модели. Если отпечаток не изменился,
+а результат уже сохранен, файл повторно в модель не отправляется.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from src.logger.logger import logger
+
+
+class Manifest:
+    """
+    .. :class:`Manifest`
+        :synopsis: Персистентный словарь `ключ задания -> отпечаток` в JSON файле
+    """
+
+    path: Path
+    entries: dict[str, str]
+
+    def __init__(self, path: str | Path, autosave_every: int = 20):
+        """
+        Args:
+            path (str | Path): Путь к файлу манифеста.
+            autosave_every (int): Сохранять манифест после каждых `autosave_every` изменений.
+        """
+        self.path = Path(path)
+        self.entries = {}
+        self.autosave_every = autosave_every
+        self._pending = 0
+        self.load()
+
+    @staticmethod
+    def make_key(file_path: str | Path, role: str, lang: str) -> str:
+        """Ключ задания в манифесте."""
+        return f"{role}:{lang}:{Path(file_path).as_posix()}"
+
+    @staticmethod
+    def fingerprint(content: str, role: str, lang: str, instruction: str, model_name: str) -> str:
+        """
+        Вычисляет отпечаток задания.
+
+        Args:
+            content (str): Содержимое файла.
+            role (str): Роль ассистента.
+            lang (str): Язык.
+            instruction (str): Текст всех инструкций, участвующих в запросе.
+            model_name (str): Имя модели.
+
+        Returns:
+            str: sha256 в шестнадцатеричном виде.
+        """
+        digest = hashlib.sha256()
+        for part in (content, role, lang, instruction, model_name):
+            digest.update((part or '').encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def is_current(self, key: str, fingerprint: str) -> bool:
+        """Проверяет, что для задания уже сохранен результат с тем же отпечатком."""
+        return self.entries.get(key) == fingerprint
+
+    def update(self, key: str, fingerprint: str) -> None:
+        """Запоминает отпечаток успешно обработанного задания."""
+        self.entries[key] = fingerprint
+        self._pending += 1
+        if self._pending >= self.autosave_every:
+            self.save()
+
+    def load(self) -> None:
+        """Загружает манифест с диска. Поврежденный манифест считается пустым."""
+        try:
+            if self.path.exists():
+                self.entries = json.loads(self.path.read_text(encoding='utf-8'))
+        except Exception as ex:
+            logger.error(f"Не удалось прочитать манифест {self.path}", ex, False)
+            self.entries = {}
+
+    def save(self) -> bool:
+        """Атомарно записывает манифест на диск."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+            tmp_path.write_text(json.dumps(self.entries, ensure_ascii=False, indent=1), encoding='utf-8')
+            os.replace(tmp_path, self.path)
+            self._pending = 0
+            return True
+        except Exception as ex:
+            logger.error(f"Не удалось сохранить манифест {self.path}", ex, False)
+            return False
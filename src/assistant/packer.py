@@ -0,0 +1,147 @@
+## \file /src/assistant/packer.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.packer
+	:platform: Windows, Unix
+	:synopsis: Упаковка нескольких маленьких файлов в один запрос к модели
+
+Маленькие файлы (`__init__.py`, короткие модули, README) собираются в пакеты до
+бюджета токенов. Каждый файл в запросе и в ответе обрамляется разделителями
+`<<<FILE n: path>>>` ... `<<<END FILE n>>>`, по которым ответ разбирается обратно
+на отдельные файлы.
+"""
+
+import re
+from typing import AsyncIterable, AsyncIterator, Callable, Hashable, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+FILE_START = '<<<FILE {index}: {path}>>>'
+FILE_END = '<<<END FILE {index}>>>'
+_RESPONSE_BLOCK = re.compile(r'<<<FILE (\d+)(?::[^>\n]*)?>>>[ \t]*\n?(.*?)<<<END FILE \1>>>', re.DOTALL)
+
+
+class _Batches:
+    """Накопление маленьких заданий по ключам группировки (общее для синхронного и асинхронного потока)."""
+
+    def __init__(self, tokens_of, key_of, small_file_tokens: int, max_tokens: int, max_files: int):
+        self.tokens_of = tokens_of
+        self.key_of = key_of
+        self.small_file_tokens = small_file_tokens
+        self.max_tokens = max_tokens
+        self.max_files = max_files
+        self._buffers: dict[Hashable, tuple[list, int]] = {}
+
+    @staticmethod
+    def _release(batch: list):
+        return batch if len(batch) > 1 else batch[0]
+
+    def add(self, item) -> list:
+        """Принимает задание и возвращает то, что можно выдать сразу."""
+        tokens = self.tokens_of(item)
+        if tokens > self.small_file_tokens:
+            return [item]
+        key = self.key_of(item)
+        batch, size = self._buffers.get(key, ([], 0))
+        released = []
+        if batch and (size + tokens > self.max_tokens or len(batch) >= self.max_files):
+            released.append(self._release(batch))
+            batch, size = [], 0
+        batch.append(item)
+        self._buffers[key] = (batch, size + tokens)
+        return released
+
+    def drain(self) -> list:
+        """Незаполненные пакеты в конце потока."""
+        return [self._release(batch) for batch, _ in self._buffers.values() if batch]
+
+
+def pack_small_files(
+    items: Iterable[T],
+    tokens_of: Callable[[T], int],
+    key_of: Callable[[T], Hashable] = lambda item: None,
+    small_file_tokens: int = 500,
+    max_tokens: int = 4000,
+    max_files: int = 10,
+) -> Iterator[T | list[T]]:
+    """
+    Группирует маленькие элементы в пакеты. Большие элементы проходят без изменений.
+
+    Args:
+        items (Iterable[T]): Поток заданий.
+        tokens_of (Callable[[T], int]): Оценка размера задания в токенах.
+        key_of (Callable[[T], Hashable]): Ключ группировки - в один пакет попадают только задания с одним ключом
+            (например, один и тот же ассистент).
+        small_file_tokens (int): Задания не больше этого размера считаются маленькими.
+        max_tokens (int): Бюджет токенов на пакет.
+        max_files (int): Максимальное количество файлов в пакете.
+
+    Yields:
+        T | list[T]: Одиночное задание или пакет (список) из нескольких заданий.
+    """
+    batches = _Batches(tokens_of, key_of, small_file_tokens, max_tokens, max_files)
+    for item in items:
+        yield from batches.add(item)
+    yield from batches.drain()
+
+
+async def pack_small_files_async(
+    items: AsyncIterable[T],
+    tokens_of: Callable[[T], int],
+    key_of: Callable[[T], Hashable] = lambda item: None,
+    small_file_tokens: int = 500,
+    max_tokens: int = 4000,
+    max_files: int = 10,
+) -> AsyncIterator[T | list[T]]:
+    """Асинхронный вариант :func:`pack_small_files` для потока заданий конвейера."""
+    batches = _Batches(tokens_of, key_of, small_file_tokens, max_tokens, max_files)
+    try:
+        async for item in items:
+            for released in batches.add(item):
+                yield released
+        for released in batches.drain():
+            yield released
+    finally:
+        if hasattr(items, 'aclose'):
+            await items.aclose()
+
+
+def format_packed_files(files: list[tuple[str, str]]) -> str:
+    """
+    Объединяет файлы в один текст с разделителями.
+
+    Args:
+        files (list[tuple[str, str]]): Пары (путь, содержимое).
+
+    Returns:
+        str: Текст для поля запроса.
+    """
+    blocks = []
+    for index, (path, content) in enumerate(files, start=1):
+        blocks.append(
+            f"{FILE_START.format(index=index, path=path)}\n```{content}```\n{FILE_END.format(index=index)}"
+        )
+    return '\n'.join(blocks)
+
+
+def split_packed_response(response: str, count: int) -> dict[int, str]:
+    """
+    Разбирает ответ модели на пакетный запрос.
+
+    Args:
+        response (str): Ответ модели.
+        count (int): Количество файлов в пакете.
+
+    Returns:
+        dict[int, str]: Номер файла (с 1) -> ответ для этого файла. Файлы без ответа отсутствуют.
+    """
+    parts = {}
+    for match in _RESPONSE_BLOCK.finditer(response or ''):
+        index = int(match.group(1))
+        text = match.group(2).strip()
+        if 1 <= index <= count and text and index not in parts:
+            parts[index] = text
+    return parts
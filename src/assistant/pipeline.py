@@ -0,0 +1,214 @@
+## \file /src/assistant/pipeline.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.pipeline
+	:platform: Windows, Unix
+	:synopsis: Конвейер параллельной обработки файлов с ограничением частоты запросов к модели
+
+Вместо фиксированной паузы после каждого файла запросы к модели ограничиваются
+ведром токенов (`requests_per_minute` и `tokens_per_minute` из `code_assistant.json`),
+а чтение файлов, подготовка запросов и сохранение ответов выполняются параллельно
+с обращениями к модели в пуле из `workers` обработчиков.
+
+Все проходы процесса выполняются в одном цикле событий (:func:`run_async`): клиенты модели
+общие для процесса (:mod:`src.ai.gemini.client_pool`), а асинхронный клиент `genai`
+привязывается к циклу событий, в котором сделан первый запрос.
+"""
+
+import asyncio
+import atexit
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Coroutine, Iterable, Optional
+
+from src.logger.logger import logger
+
+
+_STOP = object()
+_shutdown_requested = False
+_runner: Optional[asyncio.Runner] = None
+
+
+def run_async(coroutine: Coroutine) -> Any:
+    """
+    Выполняет корутину в общем для процесса цикле событий.
+
+    В отличие от `asyncio.run`, цикл не закрывается после завершения корутины, поэтому
+    клиенты модели, созданные в одном проходе, работают и в следующих.
+
+    Returns:
+        Any: Результат корутины.
+    """
+    global _runner
+    if _runner is None:
+        _runner = asyncio.Runner()
+        atexit.register(close_loop)
+    return _runner.run(coroutine)
+
+
+def close_loop() -> None:
+    """Закрывает общий цикл событий :func:`run_async`. Следующий вызов создаст новый цикл."""
+    global _runner
+    if _runner is not None:
+        _runner.close()
+        _runner = None
+
+
+def request_shutdown() -> None:
+    """Просит конвейер остановиться: новые задания не берутся, запросы в работе завершаются."""
+    global _shutdown_requested
+    _shutdown_requested = True
+
+
+def shutdown_requested() -> bool:
+    """Запрошена ли мягкая остановка."""
+    return _shutdown_requested
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Грубая оценка количества токенов в тексте (~4 символа на токен).
+
+    Args:
+        text (str): Текст запроса.
+
+    Returns:
+        int: Оценка количества токенов.
+    """
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """
+    Ведро токенов с двумя лимитами: запросы в минуту и токены в минуту.
+
+    Значение лимита `0` означает отсутствие ограничения.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute or 0
+        self.tokens_per_minute = tokens_per_minute or 0
+        self._requests_available = float(self.requests_per_minute)
+        self._tokens_available = float(self.tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        """Пополняет ведра пропорционально прошедшему времени."""
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests_available = min(
+                float(self.requests_per_minute),
+                self._requests_available + elapsed * self.requests_per_minute / 60,
+            )
+        if self.tokens_per_minute:
+            self._tokens_available = min(
+                float(self.tokens_per_minute),
+                self._tokens_available + elapsed * self.tokens_per_minute / 60,
+            )
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Ожидает, пока лимиты позволят отправить один запрос на `tokens` токенов.
+
+        Args:
+            tokens (int): Оценка количества токенов запроса.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Запрос больше емкости ведра ждет полного ведра, а не бесконечно
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._requests_available < 1:
+                    wait = max(wait, (1 - self._requests_available) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._tokens_available < tokens:
+                    wait = max(wait, (tokens - self._tokens_available) * 60 / self.tokens_per_minute)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests_available -= 1
+                    if self.tokens_per_minute:
+                        self._tokens_available -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+
+async def run_pipeline(
+    items: Iterable[Any] | AsyncIterable[Any],
+    handler: Callable[[Any], Awaitable[bool]],
+    workers: int = 1,
+    queue_size: int = 0,
+    should_stop: Callable[[], bool] = shutdown_requested,
+) -> int:
+    """
+    Раздает элементы из `items` пулу из `workers` асинхронных обработчиков.
+
+    Производитель заполняет ограниченную очередь, поэтому чтение следующих файлов
+    идет, пока обработчики ждут ответа модели. Производитель работает в цикле событий,
+    поэтому источник с обходом и чтением файлов должен быть асинхронным (:func:`read_ahead`).
+
+    Args:
+        items (Iterable[Any] | AsyncIterable[Any]): Источник заданий (например, пары `(file_path, content)`).
+        handler (Callable[[Any], Awaitable[bool]]): Обработчик одного задания.
+        workers (int): Количество одновременных обработчиков.
+        queue_size (int): Размер очереди заданий. По умолчанию `2 * workers`.
+        should_stop (Callable[[], bool]): Признак мягкой остановки. После него новые задания
+            не выдаются, задания из очереди пропускаются, а начатые доводятся до конца.
+
+    Returns:
+        int: Количество заданий, обработанных успешно.
+    """
+    workers = max(1, int(workers or 1))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or workers * 2)
+    processed = 0
+
+    async def iterate():
+        if hasattr(items, '__aiter__'):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
+
+    async def producer():
+        try:
+            async for item in iterate():
+                if should_stop():
+                    break
+                await queue.put(item)
+        except Exception as ex:
+            logger.error("Ошибка при формировании заданий", ex, False)
+        finally:
+            # Асинхронный источник закрывается сразу (в том числе при остановке), а не при сборке мусора
+            if hasattr(items, 'aclose'):
+                await items.aclose()
+            for _ in range(workers):
+                await queue.put(_STOP)
+
+    async def worker():
+        nonlocal processed
+        while True:
+            item = await queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if should_stop():
+                    continue
+                if await handler(item):
+                    processed += 1
+            except Exception as ex:
+                logger.error("Ошибка обработчика задания", ex, False)
+            finally:
+                queue.task_done()
+
+    await asyncio.gather(producer(), *(worker() for _ in range(workers)))
+    return processed
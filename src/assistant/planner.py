@@ -0,0 +1,332 @@
+## \file /src/assistant/planner.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.planner
+	:platform: Windows, Unix
+	:synopsis: Пробный проход (`--plan`): список заданий с оценкой токенов, количества запросов и длительности
+
+:meth:`JobScheduler.plan` обходит `start_dirs` по тем же правилам включения и исключения,
+что и рабочий проход, и разворачивает задания (файл x роль x язык) с неактуальным
+результатом. Модель не вызывается, очередь заданий и манифест не изменяются.
+
+Для каждого задания :class:`JobPlanner` оценивает:
+
+* токены запроса - по тексту запроса, собранному :class:`PromptBuilder` (с учетом разбиения
+  больших файлов на части), плюс системная инструкция в каждом запросе;
+* токены ответа - долей от токенов запроса (`planner.response_ratio`);
+* время ответа - `planner.latency_seconds` плюс токены ответа со скоростью `planner.output_tokens_per_second`.
+
+Если метрики прошлых проходов (секция `metrics`) есть на диске, доля ответа и средняя
+задержка берутся из них для каждой пары роль/язык.
+
+Маленькие файлы группируются в пакеты так же, как в рабочем проходе (секция `packing`).
+Длительность прохода - наибольшая из оценок: время ответов на `concurrency.workers`
+обработчиков, количество запросов при `requests_per_minute`, токены при `tokens_per_minute`
+(с пулом моделей - сумма лимитов участников пула).
+
+План сохраняется в JSON. `--from-plan` передает задания плана прямо в обработку без
+повторного обхода (:meth:`JobScheduler.process_plan`).
+"""
+
+import json
+import os
+import time
+from itertools import product
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterable, Optional
+
+import header
+from header import __root__
+
+from src.assistant.packer import pack_small_files
+from src.assistant.pipeline import estimate_tokens
+from src.logger.logger import logger
+
+PLAN_VERSION = 1
+
+
+def _section(config: Any, name: str) -> SimpleNamespace:
+    return getattr(config, name, None) or SimpleNamespace()
+
+
+def _load_metrics(config: Any) -> dict[tuple[str, str], dict]:
+    """Средние по метрикам прошлых проходов: `(роль, язык) -> {response_ratio, latency_seconds}`."""
+    json_path = getattr(_section(config, 'metrics'), 'json_path', None)
+    if not json_path or not Path(__root__, json_path).exists():
+        return {}
+    try:
+        snapshot = json.loads(Path(__root__, json_path).read_text(encoding='utf-8'))
+    except Exception as ex:
+        logger.warning(f"Метрики прошлых проходов не прочитаны: {ex}")
+        return {}
+    totals: dict[tuple[str, str], list[float]] = {}
+    for series in snapshot.get('series', []):
+        total = totals.setdefault((series.get('role', ''), series.get('lang', '')), [0, 0, 0, 0.0])
+        total[0] += series.get('requests', 0)
+        total[1] += series.get('prompt_tokens', 0)
+        total[2] += series.get('response_tokens', 0)
+        total[3] += (series.get('latency_seconds') or {}).get('sum', 0.0)
+    return {
+        key: {'response_ratio': response / prompt, 'latency_seconds': latency / requests}
+        for key, (requests, prompt, response, latency) in totals.items()
+        if requests and prompt
+    }
+
+
+def rate_limits(config: Any, resolve_key=os.getenv) -> tuple[float, float]:
+    """
+    Лимиты запросов и токенов в минуту для всего прохода. `0` - без ограничения.
+    С пулом моделей - сумма лимитов участников с заданным ключом.
+    """
+    pool = _section(config, 'model_pool')
+    if getattr(pool, 'enabled', False):
+        limits = getattr(pool, 'limits', None) or SimpleNamespace()
+        requests_per_minute = tokens_per_minute = 0
+        for key_name, model_name in product(getattr(pool, 'api_key_env', []), getattr(pool, 'models', [])):
+            if not resolve_key(key_name):
+                continue
+            model_limits = getattr(limits, model_name, None) or SimpleNamespace()
+            rpm = getattr(model_limits, 'requests_per_minute', getattr(pool, 'requests_per_minute', 0))
+            tpm = getattr(model_limits, 'tokens_per_minute', getattr(pool, 'tokens_per_minute', 0))
+            # Участник без лимита снимает ограничение со всего пула
+            requests_per_minute = float('inf') if not rpm or requests_per_minute == float('inf') else requests_per_minute + rpm
+            tokens_per_minute = float('inf') if not tpm or tokens_per_minute == float('inf') else tokens_per_minute + tpm
+        return (
+            0 if requests_per_minute == float('inf') else requests_per_minute,
+            0 if tokens_per_minute == float('inf') else tokens_per_minute,
+        )
+    concurrency = _section(config, 'concurrency')
+    return getattr(concurrency, 'requests_per_minute', 0), getattr(concurrency, 'tokens_per_minute', 0)
+
+
+class JobPlanner:
+    """
+    .. :class:`JobPlanner`
+        :synopsis: Оценка заданий прохода без обращения к модели
+    """
+
+    def __init__(self, config: Any):
+        """
+        Args:
+            config (SimpleNamespace): Конфигурация ассистента (секции `planner`, `concurrency`, `packing`, `metrics`).
+        """
+        self.config = config
+        planner = _section(config, 'planner')
+        self.response_ratio = getattr(planner, 'response_ratio', 0.5)
+        self.latency_seconds = getattr(planner, 'latency_seconds', 5.0)
+        self.output_tokens_per_second = getattr(planner, 'output_tokens_per_second', 150)
+        self.observed = _load_metrics(config) if getattr(planner, 'calibrate_from_metrics', True) else {}
+
+    def _rates(self, role: str, lang: str) -> tuple[float, float]:
+        """Доля токенов ответа и базовая задержка для пары роль/язык."""
+        observed = self.observed.get((role, lang))
+        if observed:
+            return observed['response_ratio'], observed['latency_seconds']
+        return self.response_ratio, self.latency_seconds
+
+    def _seconds(self, response_tokens: int, latency_seconds: float, observed: bool) -> float:
+        # Наблюдаемая средняя задержка уже включает генерацию ответа
+        if observed:
+            return latency_seconds
+        return latency_seconds + response_tokens / max(self.output_tokens_per_second, 1)
+
+    def estimate(self, assistant, file_path: Path, content: str, source: str = 'walk') -> dict:
+        """
+        Оценка одного задания.
+
+        Args:
+            assistant (CodeAssistant): Ассистент роли и языка задания.
+            file_path (Path): Исходный файл.
+            content (str): Содержимое файла.
+            source (str): `walk` - найден обходом, `queue` - незавершенное задание прошлого запуска.
+        """
+        chunks = assistant._split_content(file_path, content)
+        system_tokens = estimate_tokens(assistant.model_system_instruction)
+        relative_path = assistant._request_path(file_path)
+        prompt_tokens = sum(
+            assistant.prompt_builder.file(relative_path, chunk, (index + 1, len(chunks)) if len(chunks) > 1 else None).tokens
+            for index, chunk in enumerate(chunks)
+        ) + system_tokens * len(chunks)
+        ratio, latency = self._rates(assistant.role, assistant.lang)
+        response_tokens = round(prompt_tokens * ratio)
+        observed = (assistant.role, assistant.lang) in self.observed
+        return {
+            'file': str(file_path),
+            'role': assistant.role,
+            'lang': assistant.lang,
+            'source': source,
+            'bytes': len(content.encode('utf-8')),
+            'content_tokens': estimate_tokens(content),
+            'requests': len(chunks),
+            'prompt_tokens': prompt_tokens,
+            'response_tokens': response_tokens,
+            # Части файла отправляются параллельно: задание длится столько же, сколько самая долгая часть
+            'seconds': round(self._seconds(response_tokens // len(chunks), latency, observed), 3),
+        }
+
+    def _apply_packing(self, jobs: list[dict], header_tokens: dict[tuple[str, str], int]) -> None:
+        """Размечает пакеты маленьких файлов (`pack`) так же, как их соберет рабочий проход."""
+        packing = _section(self.config, 'packing')
+        if not getattr(packing, 'enabled', False):
+            return
+        packs = pack_small_files(
+            ((job, index) for index, job in enumerate(jobs) if job['requests'] == 1),
+            tokens_of = lambda item: item[0]['content_tokens'],
+            key_of = lambda item: (item[0]['role'], item[0]['lang']),
+            small_file_tokens = getattr(packing, 'small_file_tokens', 500),
+            max_tokens = getattr(packing, 'max_tokens', 4000),
+            max_files = getattr(packing, 'max_files', 10),
+        )
+        for number, pack in enumerate(item for item in packs if isinstance(item, list)):
+            head, *rest = [job for job, _ in pack]
+            for job in [head] + rest:
+                job['pack'] = number
+            # Неизменная часть запроса и системная инструкция передаются один раз на пакет
+            shared = header_tokens[(head['role'], head['lang'])]
+            for job in rest:
+                job['prompt_tokens'] = max(job['prompt_tokens'] - shared, job['content_tokens'])
+                job['requests'] = 0
+            # Пакет - один запрос: его время учитывается в первом задании пакета
+            _, latency = self._rates(head['role'], head['lang'])
+            response_tokens = sum(job['response_tokens'] for job in [head] + rest)
+            head['seconds'] = round(
+                self._seconds(response_tokens, latency, (head['role'], head['lang']) in self.observed), 3
+            )
+            for job in rest:
+                job['seconds'] = 0
+
+    async def plan(self, jobs: AsyncIterable[tuple[Any, Path, str, str]], start_dirs: list[str | Path]) -> dict:
+        """
+        Собирает план прохода.
+
+        Args:
+            jobs (AsyncIterable[tuple]): Задания `(ассистент, путь, содержимое, источник)` в порядке рабочего прохода.
+            start_dirs (list[str | Path]): Обойденные директории.
+
+        Returns:
+            dict: План: параметры, задания и сводка (см. :meth:`summarize`).
+        """
+        started = time.perf_counter()
+        planned = []
+        header_tokens: dict[tuple[str, str], int] = {}
+        roles, langs = [], []
+        async for assistant, file_path, content, source in jobs:
+            try:
+                planned.append(self.estimate(assistant, file_path, content, source))
+            except Exception as ex:
+                logger.error(f"Ошибка оценки задания {file_path} ({assistant.role}, {assistant.lang})", ex, False)
+                continue
+            key = (assistant.role, assistant.lang)
+            if key not in header_tokens:
+                header_tokens[key] = (
+                    assistant.prompt_builder.file(assistant._request_path(file_path), '').tokens
+                    + estimate_tokens(assistant.model_system_instruction)
+                )
+                roles += [assistant.role] if assistant.role not in roles else []
+                langs += [assistant.lang] if assistant.lang not in langs else []
+        self._apply_packing(planned, header_tokens)
+
+        concurrency = _section(self.config, 'concurrency')
+        return {
+            'version': PLAN_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'start_dirs': [str(path) for path in start_dirs],
+            'roles': roles,
+            'langs': langs,
+            'model': getattr(_section(self.config, 'gemini'), 'model_name', None),
+            'workers': getattr(concurrency, 'workers', 1),
+            'planning_seconds': round(time.perf_counter() - started, 3),
+            'summary': self.summarize(planned),
+            'jobs': planned,
+        }
+
+    def summarize(self, jobs: list[dict]) -> dict:
+        """
+        Итоги плана: задания, запросы, токены - всего и по парам роль/язык - и прогноз длительности.
+
+        Длительность - наибольшая из оценок `workers` (время ответов на всех обработчиков),
+        `requests_per_minute` и `tokens_per_minute`; какая из них больше, указано в `bottleneck`.
+        """
+        by_pair: dict[str, dict] = {}
+        for job in jobs:
+            pair = by_pair.setdefault(f"{job['role']}/{job['lang']}", {
+                'jobs': 0, 'requests': 0, 'prompt_tokens': 0, 'response_tokens': 0, 'bytes': 0,
+            })
+            pair['jobs'] += 1
+            for name in ('requests', 'prompt_tokens', 'response_tokens', 'bytes'):
+                pair[name] += job[name]
+        totals = {
+            name: sum(pair[name] for pair in by_pair.values())
+            for name in ('jobs', 'requests', 'prompt_tokens', 'response_tokens', 'bytes')
+        }
+        totals['files'] = len({job['file'] for job in jobs})
+
+        workers = max(1, getattr(_section(self.config, 'concurrency'), 'workers', 1))
+        requests_per_minute, tokens_per_minute = rate_limits(self.config)
+        bounds = {
+            'workers': sum(job['seconds'] for job in jobs) / workers,
+            'requests_per_minute': totals['requests'] / requests_per_minute * 60 if requests_per_minute else 0,
+            # Ограничитель частоты учитывает токены запроса
+            'tokens_per_minute': totals['prompt_tokens'] / tokens_per_minute * 60 if tokens_per_minute else 0,
+        }
+        bottleneck = max(bounds, key=bounds.get)
+        return {
+            **totals,
+            'by_role_lang': by_pair,
+            'limits': {'workers': workers, 'requests_per_minute': requests_per_minute, 'tokens_per_minute': tokens_per_minute},
+            'bounds_seconds': {name: round(value, 1) for name, value in bounds.items()},
+            'predicted_seconds': round(bounds[bottleneck], 1),
+            'bottleneck': bottleneck,
+        }
+
+
+def format_summary(plan: dict) -> str:
+    """Сводка плана для вывода в консоль."""
+    summary = plan['summary']
+    lines = [
+        f"{'роль/язык':<28} {'заданий':>8} {'запросов':>9} {'токены запроса':>15} {'токены ответа':>14}",
+    ]
+    for pair, values in summary['by_role_lang'].items():
+        lines.append(
+            f"{pair:<28} {values['jobs']:>8} {values['requests']:>9} "
+            f"{values['prompt_tokens']:>15} {values['response_tokens']:>14}"
+        )
+    lines.append(
+        f"{'всего (' + str(summary['files']) + ' файлов)':<28} {summary['jobs']:>8} {summary['requests']:>9} "
+        f"{summary['prompt_tokens']:>15} {summary['response_tokens']:>14}"
+    )
+    seconds = summary['predicted_seconds']
+    lines.append(
+        f"Прогноз длительности: {time.strftime('%H:%M:%S', time.gmtime(seconds))} ({seconds} с), "
+        f"ограничение - {summary['bottleneck']} {summary['bounds_seconds']}"
+    )
+    return '\n'.join(lines)
+
+
+def write_plan(plan: dict, path: Optional[str | Path] = None) -> Path:
+    """Сохраняет план в JSON. По умолчанию - `logs/plans/code_assistant_<время>.plan.json`."""
+    path = Path(path) if path else Path(
+        __root__, 'logs', 'plans', f"code_assistant_{time.strftime('%Y%m%d%H%M%S')}.plan.json"
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(plan, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_plan(path: str | Path) -> dict:
+    """
+    Читает план, сохраненный `--plan`.
+
+    Raises:
+        ValueError: Файл не является планом поддерживаемой версии.
+    """
+    plan = json.loads(Path(path).read_text(encoding='utf-8'))
+    if not isinstance(plan, dict) or plan.get('version') != PLAN_VERSION or not isinstance(plan.get('jobs'), list):
+        raise ValueError(f"{path} не является планом версии {PLAN_VERSION}")
+    return plan
@@ -0,0 +1,129 @@
+## \file /src/assistant/prompt_builder.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.prompt_builder
+	:platform: Windows, Unix
+	:synopsis: Компактное построение запросов к модели по шаблонам роли и языка
+
+Раньше запрос собирался словарем и передавался модели как `str(dict)`. В `repr`
+каждый перевод строки и кавычка исходного кода экранируются (`\\n`, `\\'`), поэтому
+запрос заметно длиннее исходного текста и хуже читается моделью.
+
+:class:`PromptBuilder` один раз на роль и язык собирает неизменную часть запроса
+(описание роли, язык ответа, инструкция роли, если она не передана в системной
+инструкции), а для каждого файла дописывает только путь и исходный код без экранирования.
+Формат `repr` сохранен для сравнения (`prompt_builder.format` в конфигурации).
+"""
+
+from typing import NamedTuple, Optional
+
+from src.assistant.packer import format_packed_files
+from src.assistant.pipeline import estimate_tokens
+
+TEMPLATE = 'template'
+REPR = 'repr'
+
+PACK_OUTPUT_FORMAT = (
+    "The input contains several files, each wrapped in `<<<FILE n: path>>>` and `<<<END FILE n>>>`. "
+    "Process every file independently and wrap the answer for file n in the same "
+    "`<<<FILE n: path>>>` ... `<<<END FILE n>>>` markers, in the same order."
+)
+
+
+class Prompt(NamedTuple):
+    """Текст запроса и оценка количества его токенов."""
+    text: str
+    tokens: int
+
+
+class PromptBuilder:
+    """
+    .. :class:`PromptBuilder`
+        :synopsis: Запросы для одной пары роль/язык по заранее собранным шаблонам
+    """
+
+    def __init__(
+        self,
+        role_description: str,
+        lang: str,
+        file_location_label: str,
+        instruction: str = '',
+        format: str = TEMPLATE,
+    ):
+        """
+        Args:
+            role_description (str): Описание роли на языке ответа.
+            lang (str): Язык ответа.
+            file_location_label (str): Подпись пути файла на языке ответа.
+            instruction (str): Инструкция роли. Пустая строка - инструкция передана в системной инструкции.
+            format (str): `template` - компактный текст, `repr` - прежний формат `str(dict)`.
+
+        Raises:
+            ValueError: Неизвестный формат.
+        """
+        if format not in (TEMPLATE, REPR):
+            raise ValueError(f"Неизвестный формат запроса: {format}")
+        self.role_description = role_description
+        self.lang = lang
+        self.file_location_label = file_location_label
+        self.instruction = instruction
+        self.format = format
+        header = [role_description, f"Output language: {lang}"]
+        if instruction:
+            header.append(f"Instruction:\n{instruction}")
+        # Неизменная часть запросов собирается один раз
+        self._file_header = '\n'.join(header) + f"\n{file_location_label}: "
+        self._pack_header = '\n'.join(header + [f"Output format: {PACK_OUTPUT_FORMAT}"]) + "\nInput files:\n"
+
+    def file(self, path: Optional[str], content: str, part: Optional[tuple[int, int]] = None) -> Prompt:
+        """
+        Запрос для одного файла или его части.
+
+        Args:
+            path (Optional[str]): Путь файла, показываемый модели.
+            content (str): Исходный код.
+            part (Optional[tuple[int, int]]): Номер части и количество частей, если файл разбит на части.
+        """
+        if self.format == REPR:
+            request = {
+                "role": self.role_description,
+                "output_language": self.lang,
+                self.file_location_label: path,
+                "instruction": self.instruction,
+                "input_code": f"```{content}```",
+            }
+            if not self.instruction:
+                del request["instruction"]
+            if part:
+                request["part"] = f"{part[0]}/{part[1]}"
+            return self._prompt(str(request))
+        part_line = f"Part: {part[0]}/{part[1]}\n" if part else ''
+        return self._prompt(f"{self._file_header}{path}\n{part_line}Input code:\n```\n{content}\n```")
+
+    def pack(self, files: list[tuple[str, str]]) -> Prompt:
+        """
+        Запрос для пакета маленьких файлов.
+
+        Args:
+            files (list[tuple[str, str]]): Пары (путь, содержимое).
+        """
+        input_files = format_packed_files(files)
+        if self.format == REPR:
+            request = {
+                "role": self.role_description,
+                "output_language": self.lang,
+                "instruction": self.instruction,
+                "output_format": PACK_OUTPUT_FORMAT,
+                "input_files": input_files,
+            }
+            if not self.instruction:
+                del request["instruction"]
+            return self._prompt(str(request))
+        return self._prompt(self._pack_header + input_files)
+
+    @staticmethod
+    def _prompt(text: str) -> Prompt:
+        return Prompt(text, estimate_tokens(text))
@@ -0,0 +1,161 @@
+## \file /src/assistant/prompt_registry.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.prompt_registry
+	:platform: Windows, Unix
+	:synopsis: Общий для процесса реестр инструкций и переводов ассистента
+
+Раньше каждый :class:`CodeAssistant` при создании читал с диска `translations.json`,
+`CODE_RULES.<lang>.MD` и инструкцию роли. :class:`PromptRegistry` читает каждый файл
+один раз и отдает его из памяти. Перед выдачей сверяется время изменения и размер
+файла (`os.stat`): измененный файл перечитывается, так что правки инструкций
+подхватываются без перезапуска.
+
+Имена инструкций ищутся без учета регистра (`CODE_RULES.en.MD`, `CODE_RULES.EN.MD`),
+при нескольких вариантах предпочитается точное совпадение.
+:meth:`PromptRegistry.preload` заранее загружает и проверяет инструкции и переводы
+для всех ролей и языков прохода.
+"""
+
+import os
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable
+
+import header
+from header import __root__
+
+from src.utils.jjson import j_loads_ns
+from src.logger.logger import logger
+
+BASE_PATH: Path = Path(__root__, 'src', 'assistant')
+
+
+class PromptRegistry:
+    """
+    .. :class:`PromptRegistry`
+        :synopsis: Кеш инструкций и переводов с проверкой времени изменения файлов
+    """
+
+    def __init__(self, base_path: str | Path = BASE_PATH):
+        """
+        Args:
+            base_path (str | Path): Директория с `instructions` и `translations`.
+        """
+        self.instructions_dir = Path(base_path, 'instructions')
+        self.translations_path = Path(base_path, 'translations', 'translations.json')
+        self.loads = 0
+        # путь -> (время изменения, размер, значение)
+        self._files: dict[Path, tuple[int, int, Any]] = {}
+        # директория -> (время изменения, имена файлов по имени в нижнем регистре, найденные пути)
+        self._listings: dict[Path, tuple[int, dict[str, list[str]], dict[str, Path]]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path: Path, parse: Callable[[Path], Any]) -> Any:
+        """Значение файла из кеша или, если файл изменился, прочитанное заново."""
+        stat = os.stat(path)
+        entry = self._files.get(path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        with self._lock:
+            value = parse(path)
+            self._files[path] = (stat.st_mtime_ns, stat.st_size, value)
+            self.loads += 1
+        return value
+
+    def _resolve(self, directory: Path, name: str) -> Path:
+        """
+        Путь файла `name` в `directory` без учета регистра.
+
+        Raises:
+            FileNotFoundError: Файл не найден.
+        """
+        mtime = os.stat(directory).st_mtime_ns
+        listing = self._listings.get(directory)
+        if not listing or listing[0] != mtime:
+            names: dict[str, list[str]] = {}
+            for entry in os.listdir(directory):
+                names.setdefault(entry.lower(), []).append(entry)
+            listing = self._listings[directory] = (mtime, names, {})
+        _, names, resolved = listing
+        path = resolved.get(name)
+        if path is None:
+            candidates = names.get(name.lower())
+            if not candidates:
+                raise FileNotFoundError(f"Инструкция {name} не найдена в {directory}")
+            path = resolved[name] = directory / (name if name in candidates else sorted(candidates)[0])
+        return path
+
+    @staticmethod
+    def _read_text(path: Path) -> str:
+        return path.read_text(encoding='UTF-8')
+
+    def instruction(self, name: str) -> str:
+        """Текст инструкции `name` из директории `instructions`."""
+        return self._load(self._resolve(self.instructions_dir, name), self._read_text)
+
+    def system_instruction(self, lang: str) -> str:
+        """Общие правила `CODE_RULES.<lang>.MD`."""
+        return self.instruction(f'CODE_RULES.{lang}.MD')
+
+    def role_instruction(self, role: str, lang: str) -> str:
+        """Инструкция роли `<role>.<lang>.md`."""
+        return self.instruction(f'{role}.{lang}.md')
+
+    def translations(self) -> SimpleNamespace:
+        """Переводы описаний ролей и подписей. Общий объект - изменять его нельзя."""
+        return self._load(self.translations_path, j_loads_ns)
+
+    def validate(self, roles: Iterable[str], langs: Iterable[str]) -> list[str]:
+        """
+        Загружает инструкции и переводы для всех пар роль/язык и проверяет их.
+
+        Returns:
+            list[str]: Описания проблем: отсутствующие или пустые инструкции, отсутствующие переводы.
+        """
+        problems = []
+        try:
+            translations = self.translations()
+        except Exception as ex:
+            return [f"Ошибка чтения переводов {self.translations_path}: {ex}"]
+        roles_translations = getattr(translations, 'roles', None) or SimpleNamespace()
+        file_location = getattr(translations, 'file_location_translated', None) or SimpleNamespace()
+        roles = list(roles)
+        for lang in langs:
+            if not hasattr(file_location, lang):
+                problems.append(f"Нет перевода подписи пути файла для языка {lang}")
+            for name in [f'CODE_RULES.{lang}.MD'] + [f'{role}.{lang}.md' for role in roles]:
+                try:
+                    if not self.instruction(name).strip():
+                        problems.append(f"Пустая инструкция {name}")
+                except Exception as ex:
+                    problems.append(f"Ошибка чтения инструкции {name}: {ex}")
+            for role in roles:
+                if not hasattr(getattr(roles_translations, role, None) or SimpleNamespace(), lang):
+                    problems.append(f"Нет перевода описания роли {role} для языка {lang}")
+        return problems
+
+    def preload(self, roles: Iterable[str], langs: Iterable[str]) -> bool:
+        """
+        Загружает инструкции и переводы заранее и записывает найденные проблемы в лог.
+
+        Returns:
+            bool: True, если проблем нет.
+        """
+        problems = self.validate(roles, langs)
+        for problem in problems:
+            logger.warning(problem)
+        return not problems
+
+    def clear(self) -> None:
+        """Сбрасывает кеш."""
+        with self._lock:
+            self._files.clear()
+            self._listings.clear()
+
+
+prompt_registry = PromptRegistry()
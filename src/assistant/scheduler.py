@@ -0,0 +1,299 @@
+## \file /src/assistant/scheduler.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.scheduler
+	:platform: Windows, Unix
+	:synopsis: Планировщик заданий для всех комбинаций ролей и языков за один обход дерева
+
+Вместо отдельного :class:`CodeAssistant` с собственным обходом и чтением файлов
+на каждую пару (язык, роль) планировщик обходит `start_dirs` один раз, читает каждый
+файл один раз и раздает задания всем ассистентам через общий пул обработчиков.
+Клиент модели создается один раз на каждую пару (модель, системная инструкция).
+Тот же обход без обращения к модели составляет план прохода (`--plan`, :mod:`src.assistant.planner`).
+"""
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import AsyncIterator, Optional
+
+from src.assistant.code_assistant import CodeAssistant
+from src.assistant.pipeline import RateLimiter, run_pipeline
+from src.assistant.planner import JobPlanner
+from src.assistant.file_io import read_ahead, read_text
+from src.assistant.prompt_registry import prompt_registry
+from src.assistant.file_walker import FileWalker
+from src.assistant.watcher import ChangeWatcher
+from src.logger.logger import logger
+
+
+class JobScheduler:
+    """
+    .. :class:`JobScheduler`
+        :synopsis: Раздача заданий (файл x роль x язык) из единственного чтения файла
+    """
+
+    assistants: list[CodeAssistant]
+    roles: list[str]
+    langs: list[str]
+    # Количество заданий, успешно обработанных последним проходом
+    processed: int = 0
+
+    def __init__(self, roles: list[str], langs: list[str], **kwargs):
+        """
+        Args:
+            roles (list[str]): Роли ассистента.
+            langs (list[str]): Языки.
+            **kwargs: Параметры, передаваемые в :class:`CodeAssistant` (`model`, `force`, ...).
+                С `plan_only` планировщик годится только для :meth:`plan`: клиенты модели не создаются,
+                очередь заданий открывается только для чтения.
+        """
+        self.roles, self.langs = list(roles), list(langs)
+        self.assistants = []
+        self.job_queue = CodeAssistant.create_job_queue(CodeAssistant.config, read_only=kwargs.get('plan_only', False))
+        # Инструкции и переводы всех пар загружаются и проверяются один раз до создания ассистентов
+        prompt_registry.preload(roles, langs)
+        for lang in langs:
+            for role in roles:
+                self.assistants.append(CodeAssistant(role=role, lang=lang, job_queue=self.job_queue, **kwargs))
+
+    @property
+    def config(self) -> SimpleNamespace:
+        """Общая конфигурация ассистентов."""
+        return CodeAssistant.config
+
+    async def process_files(self, start_dir: Optional[str | Path | list[str | Path]] = None) -> bool:
+        """
+        Обрабатывает файлы из `start_dir` всеми ассистентами.
+
+        Args:
+            start_dir (Optional[str | Path | list[str | Path]]): Директория или список директорий.
+                По умолчанию `start_dir` из конфигурации.
+
+        Returns:
+            bool: True, если проход завершился без ошибок.
+        """
+        start_dir = start_dir or self.config.start_dir
+        start_dirs = start_dir if isinstance(start_dir, list) else [start_dir]
+        return await self._run(self._iter_jobs(start_dirs))
+
+    async def retry_dead_jobs(self) -> bool:
+        """
+        Повторяет только задания из списка `dead`.
+
+        Returns:
+            bool: True, если проход завершился без ошибок.
+        """
+        if not self.job_queue:
+            logger.error("Очередь заданий отключена (секция `job_queue` конфигурации)")
+            return False
+        return await self._run(self._iter_queued(self.job_queue.requeue_dead()))
+
+    async def watch(self, start_dir: Optional[str | Path | list[str | Path]] = None) -> bool:
+        """
+        Режим `--watch`: один проход для догоняющей обработки, затем обработка только
+        измененных файлов из `start_dir` до мягкой остановки (Ctrl+C).
+
+        Args:
+            start_dir (Optional[str | Path | list[str | Path]]): Директория или список директорий.
+                По умолчанию `start_dir` из конфигурации.
+
+        Returns:
+            bool: True, если наблюдение завершилось без ошибок.
+        """
+        start_dir = start_dir or self.config.start_dir
+        start_dirs = start_dir if isinstance(start_dir, list) else [start_dir]
+        # Квоты модели общие для догоняющего прохода и всех пачек: ограничитель создается один раз на наблюдение
+        rate_limiter = CodeAssistant.create_rate_limiter(self.config)
+        await self._run(self._iter_jobs(start_dirs), rate_limiter)
+        watch_config = getattr(self.config, 'watch', SimpleNamespace())
+        watcher = ChangeWatcher(
+            start_dirs,
+            FileWalker.from_config(self.config),
+            debounce=getattr(watch_config, 'debounce_seconds', 2),
+            poll_interval=getattr(watch_config, 'poll_interval_seconds', 2),
+            use_notifications=getattr(watch_config, 'use_notifications', True),
+            exclude_roots={Path(assistant.config.docs_dir) for assistant in self.assistants},
+        )
+        async for changed in watcher.changes():
+            logger.info(f"Изменено файлов: {len(changed)}")
+            await self._run(self._iter_changed(sorted(changed)), rate_limiter)
+        return True
+
+    async def _run(
+        self,
+        jobs: AsyncIterator[tuple[CodeAssistant, Path, str]],
+        rate_limiter: Optional[RateLimiter] = None,
+    ) -> bool:
+        """
+        Обрабатывает поток заданий общим пулом обработчиков.
+
+        Args:
+            rate_limiter (Optional[RateLimiter]): Ограничитель частоты запросов, общий с другими проходами
+                (режим `--watch`). По умолчанию создается новый по секции `concurrency`.
+        """
+        if not self.assistants:
+            logger.error("Нет ни одной комбинации роли и языка для обработки")
+            return False
+        self.processed = 0
+        concurrency = getattr(self.config, 'concurrency', SimpleNamespace())
+        rate_limiter = rate_limiter or CodeAssistant.create_rate_limiter(self.config)
+        output_writer = CodeAssistant.create_output_writer(self.config)
+        for assistant in self.assistants:
+            assistant.begin_run(rate_limiter, output_writer)
+        try:
+            self.processed = await run_pipeline(
+                self.assistants[0].pack_items(jobs, key_of=lambda job: id(job[0])),
+                self._process_job,
+                workers=getattr(concurrency, 'workers', 1),
+                queue_size=getattr(concurrency, 'queue_size', 0),
+            )
+            return True
+        except Exception as ex:
+            logger.error("Ошибка в JobScheduler.process_files", ex, False)
+            return False
+        finally:
+            if output_writer:
+                await output_writer.close()
+            for assistant in self.assistants:
+                assistant.manifest.save()
+            if self.job_queue:
+                logger.info(f"Состояние очереди заданий: {self.job_queue.counts()}")
+            logged = set()
+            for assistant in self.assistants:
+                if id(assistant.gemini_model) not in logged:
+                    logged.add(id(assistant.gemini_model))
+                    assistant.log_usage()
+            CodeAssistant.export_metrics(self.config)
+
+    def close(self) -> None:
+        """Закрывает общую очередь заданий."""
+        if self.job_queue:
+            self.job_queue.close()
+
+    def _find_assistant(self, role: str, lang: str) -> Optional[CodeAssistant]:
+        """Ассистент для пары (роль, язык)."""
+        for assistant in self.assistants:
+            if assistant.role == role and assistant.lang == lang:
+                return assistant
+        return None
+
+    async def _iter_queued(self, jobs: list[tuple[str, str, str]]) -> AsyncIterator[tuple[CodeAssistant, Path, str]]:
+        """Задания из персистентной очереди для ассистентов этого планировщика."""
+        for file, role, lang in jobs:
+            assistant = self._find_assistant(role, lang)
+            if not assistant:
+                continue
+            async for file_path, content in assistant._iter_queued([(file, role, lang)]):
+                yield assistant, file_path, content
+
+    async def _iter_jobs(self, start_dirs: list[str | Path]) -> AsyncIterator[tuple[CodeAssistant, Path, str]]:
+        """Сначала незавершенные задания прошлых запусков, затем один обход и одно чтение на файл:
+        на каждый файл - задание для каждого ассистента с неактуальным результатом."""
+        async for assistant, file_path, content, _ in self._discover(start_dirs):
+            yield assistant, file_path, content
+
+    async def _discover(self, start_dirs: list[str | Path], enqueue: bool = True) -> AsyncIterator[tuple[CodeAssistant, Path, str, str]]:
+        """
+        Задания прохода с источником: `queue` - незавершенные задания прошлых запусков, `walk` - найденные обходом.
+
+        Args:
+            enqueue (bool): Регистрировать найденные задания в очереди. `False` - пробный проход (`--plan`).
+        """
+        seen = set()
+        async for assistant, file_path, content in self._iter_queued(self.job_queue.unfinished() if self.job_queue else []):
+            seen.add((id(assistant), str(file_path)))
+            yield assistant, file_path, content, 'queue'
+        walker = self.assistants[0]
+        for process_directory in start_dirs:
+            logger.info(f"Start {process_directory=}")
+            async for file_path, content in walker._read_files(process_directory):
+                if not (file_path and content):
+                    continue
+                for assistant in self.assistants:
+                    if (id(assistant), str(file_path)) in seen or not assistant.needs_processing(file_path, content):
+                        continue
+                    if enqueue:
+                        assistant.enqueue(file_path)
+                    yield assistant, file_path, content, 'walk'
+
+    async def plan(self, start_dir: Optional[str | Path | list[str | Path]] = None) -> dict:
+        """
+        Пробный проход (`--plan`): обход `start_dir`, список заданий и оценка токенов, запросов и длительности.
+        Модель не вызывается, очередь заданий и манифесты не изменяются.
+
+        Args:
+            start_dir (Optional[str | Path | list[str | Path]]): Директория или список директорий.
+                По умолчанию `start_dir` из конфигурации.
+
+        Returns:
+            dict: План (:class:`JobPlanner`), который можно передать в :meth:`process_plan`.
+        """
+        start_dir = start_dir or self.config.start_dir
+        start_dirs = start_dir if isinstance(start_dir, list) else [start_dir]
+        plan = await JobPlanner(self.config).plan(self._discover(start_dirs, enqueue=False), start_dirs)
+        # С `--force` в план попали и актуальные результаты - запуск по плану должен их обработать
+        plan['force'] = any(assistant.force for assistant in self.assistants)
+        return plan
+
+    async def process_plan(self, plan: dict) -> bool:
+        """
+        Обрабатывает задания плана (`--from-plan`) без повторного обхода.
+
+        Returns:
+            bool: True, если проход завершился без ошибок.
+        """
+        return await self._run(self._iter_planned(plan['jobs']))
+
+    async def _iter_planned(self, jobs: list[dict]) -> AsyncIterator[tuple[CodeAssistant, Path, str]]:
+        """Задания плана: каждый файл читается один раз (с упреждением) и отдается всем его ассистентам.
+        Задания, результат которых стал актуален после составления плана, пропускаются."""
+        files: dict[str, list[CodeAssistant]] = {}
+        for job in jobs:
+            assistant = self._find_assistant(job['role'], job['lang'])
+            if assistant is None:
+                logger.warning(f"Нет ассистента для задания плана {job['file']} ({job['role']}, {job['lang']})")
+                continue
+            files.setdefault(job['file'], []).append(assistant)
+        file_io = getattr(self.config, 'file_io', SimpleNamespace())
+        async for file_path, pending in read_ahead(
+            (Path(file) for file in files),
+            threads = getattr(file_io, 'read_threads', 4),
+            depth = getattr(file_io, 'read_ahead', 16),
+        ):
+            try:
+                content = await asyncio.wrap_future(pending)
+            except Exception as ex:
+                logger.error(f"Ошибка при чтении файла из плана: {file_path}", ex, False)
+                continue
+            if not content:
+                continue
+            for assistant in files[str(file_path)]:
+                if assistant.needs_processing(file_path, content):
+                    assistant.enqueue(file_path)
+                    yield assistant, file_path, content
+
+    async def _iter_changed(self, files: list[Path]) -> AsyncIterator[tuple[CodeAssistant, Path, str]]:
+        """Задания для измененных файлов (режим `--watch`)."""
+        for file_path in files:
+            try:
+                content = await asyncio.to_thread(read_text, file_path)
+            except Exception as ex:
+                logger.error(f"Ошибка при чтении файла: {file_path}", ex, False)
+                continue
+            if not content:
+                continue
+            for assistant in self.assistants:
+                if assistant.needs_processing(file_path, content):
+                    assistant.enqueue(file_path)
+                    yield assistant, file_path, content
+
+    async def _process_job(self, job: tuple[CodeAssistant, Path, str] | list[tuple[CodeAssistant, Path, str]]) -> bool:
+        """Передает задание (или пакет заданий одного ассистента) соответствующему ассистенту."""
+        if isinstance(job, list):
+            return await job[0][0]._process_item([(file_path, content) for _, file_path, content in job])
+        assistant, file_path, content = job
+        return await assistant._process_item((file_path, content))
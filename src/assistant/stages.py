@@ -0,0 +1,171 @@
+## \file /src/assistant/stages.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.stages
+	:platform: Windows, Unix
+	:synopsis: Учет времени по этапам обработки файлов
+
+Этапы: обход дерева (`discovery`), чтение файлов (`reading`), подготовка запроса
+(`request_building`), ожидание модели (`model`), обработка ответа (`post_processing`)
+и сохранение (`saving`). Время этапов суммируется по всем обработчикам, поэтому
+для параллельных этапов (`model`) сумма может превышать общее время прохода.
+
+После :meth:`StageTimer.start_trace` (флаг `--profile`) каждый вызов этапа
+дополнительно записывается как событие временной шкалы. Шкала сохраняется в формате
+Chrome Trace Event (`chrome://tracing`, Perfetto, https://www.speedscope.app), отдельная
+дорожка - на каждый обработчик конвейера. Без трассировки учитываются только суммы.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+DISCOVERY = 'discovery'
+READING = 'reading'
+REQUEST_BUILDING = 'request_building'
+MODEL = 'model'
+POST_PROCESSING = 'post_processing'
+SAVING = 'saving'
+
+
+def _ms(values: list[float], share: float) -> str:
+    """Процентиль отсортированных длительностей в миллисекундах для таблицы."""
+    if not values:
+        return f"{'-':>10}"
+    return f"{values[min(len(values) - 1, int(share * len(values)))] * 1000:>10.1f}"
+
+
+class StageTimer:
+    """
+    .. :class:`StageTimer`
+        :synopsis: Суммарное время и количество вызовов каждого этапа
+    """
+
+    def __init__(self):
+        self.totals: dict[str, dict[str, float]] = {}
+        self.events: Optional[list[tuple[str, float, float, int, Optional[str]]]] = None
+        self._origin = time.perf_counter()
+        self._lanes: dict[int, int] = {}
+
+    def add(self, stage: str, seconds: float, start: Optional[float] = None, detail: Optional[str] = None) -> None:
+        """
+        Учитывает один вызов этапа длительностью `seconds`.
+
+        Args:
+            start (Optional[float]): Начало вызова по `time.perf_counter()` (для временной шкалы).
+            detail (Optional[str]): Пояснение к событию шкалы, например имя файла.
+        """
+        total = self.totals.setdefault(stage, {'seconds': 0.0, 'count': 0})
+        total['seconds'] += seconds
+        total['count'] += 1
+        if self.events is not None and start is not None:
+            self.events.append((stage, start, seconds, self._lane(), detail))
+
+    @contextmanager
+    def measure(self, stage: str, detail: Optional[str] = None) -> Iterator[None]:
+        """Измеряет время выполнения блока `with` как вызов этапа `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, start, detail)
+
+    def _lane(self) -> int:
+        """Номер дорожки шкалы: задача asyncio (обработчик конвейера) или поток."""
+        try:
+            owner = id(asyncio.current_task())
+        except RuntimeError:
+            owner = threading.get_ident()
+        lane = self._lanes.get(owner)
+        if lane is None:
+            lane = self._lanes[owner] = len(self._lanes)
+        return lane
+
+    def reset(self) -> None:
+        """Сбрасывает накопленные значения."""
+        self.totals = {}
+        self._origin = time.perf_counter()
+        self._lanes = {}
+        if self.events is not None:
+            self.events = []
+
+    def start_trace(self) -> None:
+        """Включает запись временной шкалы и сбрасывает накопленные значения."""
+        self.events = []
+        self.reset()
+
+    def stop_trace(self) -> None:
+        """Выключает запись временной шкалы."""
+        self.events = None
+
+    def write_trace(self, path: str | Path) -> Path:
+        """
+        Сохраняет временную шкалу в формате Chrome Trace Event.
+
+        Returns:
+            Path: Путь сохраненного файла.
+        """
+        pid = os.getpid()
+        trace = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': lane, 'args': {'name': f"worker {lane}"}}
+            for lane in sorted(set(self._lanes.values()))
+        ]
+        for stage, start, seconds, lane, detail in self.events or []:
+            event = {
+                'name': stage,
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': round((start - self._origin) * 1e6, 1),
+                'dur': round(seconds * 1e6, 1),
+                'pid': pid,
+                'tid': lane,
+            }
+            if detail:
+                event['args'] = {'detail': detail}
+            trace.append(event)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({'traceEvents': trace, 'displayTimeUnit': 'ms'}), encoding='utf-8')
+        return path
+
+    def summary(self, wall_seconds: Optional[float] = None) -> str:
+        """
+        Таблица по этапам: количество вызовов, суммарное и среднее время, процентили
+        (если велась шкала) и доля от общего времени прохода.
+
+        Args:
+            wall_seconds (Optional[float]): Общее время прохода. По умолчанию - с последнего сброса.
+        """
+        wall_seconds = wall_seconds or time.perf_counter() - self._origin
+        durations: dict[str, list[float]] = {}
+        for stage, _, seconds, _, _ in self.events or []:
+            durations.setdefault(stage, []).append(seconds)
+        lines = [
+            f"{'stage':<18} {'count':>8} {'total, s':>10} {'mean, ms':>10} {'p50, ms':>10} "
+            f"{'p95, ms':>10} {'max, ms':>10} {'% wall':>8}"
+        ]
+        for stage, total in sorted(self.totals.items(), key=lambda item: -item[1]['seconds']):
+            values = sorted(durations.get(stage, []))
+            lines.append(
+                f"{stage:<18} {total['count']:>8} {total['seconds']:>10.3f} "
+                f"{total['seconds'] / total['count'] * 1000:>10.1f} {_ms(values, 0.5)} {_ms(values, 0.95)} "
+                f"{_ms(values, 1.0)} {total['seconds'] / wall_seconds * 100:>7.1f}%"
+            )
+        lines.append(f"{'wall':<18} {'':>8} {wall_seconds:>10.3f}")
+        return '\n'.join(lines)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Копия накопленных значений."""
+        return {stage: dict(total) for stage, total in self.totals.items()}
+
+
+stage_timer = StageTimer()
@@ -0,0 +1,199 @@
+## \file /src/assistant/startup_budget.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.startup_budget
+	:platform: Windows, Unix
+	:synopsis: Проверка бюджета времени запуска консольных команд
+
+Каждая команда (`code_assistant --help`, `make_summary.py --help`) запускается в отдельном
+процессе несколько раз, и медиана полного времени выполнения (запуск интерпретатора,
+импорты, разбор аргументов и завершение процесса) сравнивается с бюджетом `--budget-ms`.
+Для сравнения замеряется и пустой запуск интерпретатора (`python -c pass`): на машинах
+с тяжелыми `.pth`-файлами окружения он сам по себе занимает десятки миллисекунд.
+
+Запуск с `-X importtime` показывает, куда уходит время: суммируются импорты самой команды
+(все импорты верхнего уровня после `site`), сумма проверяется по `--import-budget-ms`.
+Проверка не проходит и если загружен один из тяжелых модулей (`google.generativeai`, `grpc`,
+`pandas`, `PIL`, ...), которые должны загружаться только в месте использования.
+
+Бюджет полного времени - 200 мс, бюджет импортов - 50 мс: `code_assistant --help` разбирает
+аргументы (:mod:`src.assistant.cli`) до импорта `asyncio`, логгера и модулей конвейера,
+а пакет `src` загружает `gs` при первом обращении.
+
+Код возврата `1`, если хотя бы одна команда не уложилась в бюджет. Бюджет проверяется
+тестом `tests/test_startup_budget.py`; :mod:`src.assistant.benchmark` сохраняет замер
+в результатах для сравнения.
+
+Пример:
+
+.. code-block:: bash
+
+    python -m src.assistant.startup_budget
+    python -m src.assistant.startup_budget --budget-ms 250 --import-budget-ms 120 --runs 7
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import header
+from header import __root__
+
+from src.utils.printer import pprint as print
+
+# Команды и их аргументы после `python`
+COMMANDS = {
+    'code_assistant --help': ['-m', 'src.assistant.code_assistant', '--help'],
+    'make_summary --help': ['make_summary.py', '--help'],
+}
+
+# Модули, которые не должны загружаться при запуске: их импорт занимает сотни миллисекунд
+HEAVY_MODULES = (
+    'google.generativeai',
+    'grpc',
+    'pandas',
+    'PIL',
+    'requests',
+    'aiohttp',
+    'reportlab',
+    'IPython',
+)
+
+# Полное время выполнения команды и время ее импортов, мс
+BUDGET_MS = 200
+IMPORT_BUDGET_MS = 50
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, int, int]]:
+    """
+    Разбор вывода `-X importtime`.
+
+    Returns:
+        list[tuple[str, int, int, int]]: Модуль, собственное и суммарное время (мкс), уровень вложенности.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            imports.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return imports
+
+
+def wall_time(argv: list[str], runs: int = 5) -> float:
+    """Медиана полного времени выполнения `python <argv>` в миллисекундах."""
+    walls = []
+    for _ in range(max(1, runs)):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=__root__, capture_output=True)
+        walls.append(time.perf_counter() - started)
+    return round(statistics.median(walls) * 1000, 1)
+
+
+def measure(argv: list[str], runs: int = 5) -> dict:
+    """
+    Замер одной команды.
+
+    Args:
+        argv (list[str]): Аргументы интерпретатора.
+        runs (int): Количество запусков для замера полного времени.
+
+    Returns:
+        dict: `wall_ms` - медиана полного времени, `import_ms` - время импортов команды,
+            `top` - самые долгие импорты верхнего уровня, `heavy` - загруженные тяжелые модули.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *argv],
+        cwd=__root__, capture_output=True, text=True,
+    )
+    imports = parse_importtime(result.stderr)
+    # Импорты до окончания `site` относятся к запуску интерпретатора
+    site_index = next((i for i, item in enumerate(imports) if item[0] == 'site' and item[3] == 0), -1)
+    top_level = [item for item in imports[site_index + 1:] if item[3] == 0]
+    loaded = {name for name, *_ in imports}
+
+    return {
+        'returncode': result.returncode,
+        'wall_ms': wall_time(argv, runs),
+        'import_ms': round(sum(cumulative for _, _, cumulative, _ in top_level) / 1000, 1),
+        'top': [
+            (name, round(cumulative / 1000, 1))
+            for name, _, cumulative, _ in sorted(top_level, key=lambda item: item[2], reverse=True)
+        ],
+        'heavy': sorted(
+            module for module in HEAVY_MODULES
+            if any(name == module or name.startswith(module + '.') for name in loaded)
+        ),
+    }
+
+
+def check(
+    budget_ms: float = BUDGET_MS, import_budget_ms: float = IMPORT_BUDGET_MS, runs: int = 5, top: int = 5
+) -> dict:
+    """
+    Замеряет все команды и печатает результат.
+
+    Returns:
+        dict: `ok` - все команды уложились в бюджет, `interpreter_ms` - пустой запуск интерпретатора,
+            `commands` - результаты :func:`measure` по командам.
+    """
+    interpreter_ms = wall_time(['-c', 'pass'], runs)
+    print(f"Пустой запуск интерпретатора: {interpreter_ms} мс", text_color='gray')
+    report = {'ok': True, 'budget_ms': budget_ms, 'interpreter_ms': interpreter_ms, 'commands': {}}
+    for command, argv in COMMANDS.items():
+        result = measure(argv, runs)
+        failures = []
+        if result['returncode'] != 0:
+            failures.append(f"код возврата {result['returncode']}")
+        if result['wall_ms'] > budget_ms:
+            failures.append(f"время {result['wall_ms']} мс > {budget_ms} мс")
+        if result['import_ms'] > import_budget_ms:
+            failures.append(f"импорты {result['import_ms']} мс > {import_budget_ms} мс")
+        if result['heavy']:
+            failures.append(f"загружены {', '.join(result['heavy'])}")
+        result['ok'] = not failures
+        report['ok'] = report['ok'] and not failures
+        report['commands'][command] = {key: value for key, value in result.items() if key != 'top'}
+
+        print(
+            f"{command}: время {result['wall_ms']} мс, импорты {result['import_ms']} мс"
+            + (f" - {'; '.join(failures)}" if failures else ''),
+            text_color='red' if failures else 'green',
+        )
+        for name, cumulative in result['top'][:top]:
+            print(f"    {name:<40} {cumulative:>8.1f} мс")
+    return report
+
+
+def parse_args() -> dict:
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(description="Проверка бюджета времени запуска консольных команд")
+    parser.add_argument(
+        "--budget-ms", type=float, default=BUDGET_MS,
+        help="Предел полного времени выполнения команды, включая запуск интерпретатора (медиана запусков)",
+    )
+    parser.add_argument(
+        "--import-budget-ms", type=float, default=IMPORT_BUDGET_MS,
+        help="Предел суммарного времени импортов команды (по -X importtime)",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Количество запусков для замера полного времени")
+    parser.add_argument("--top", type=int, default=5, help="Сколько самых долгих импортов показать")
+    return vars(parser.parse_args())
+
+
+def main() -> None:
+    args = parse_args()
+    if not check(args['budget_ms'], args['import_budget_ms'], args['runs'], args['top'])['ok']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
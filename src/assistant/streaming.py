@@ -0,0 +1,183 @@
+## \file /src/assistant/streaming.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.streaming
+	:platform: Windows, Unix
+	:synopsis: Запись потокового ответа модели во временный файл с обработкой на лету
+
+Фрагменты ответа пишутся в `<файл>.part` по мере поступления. Клиент модели отдает их
+уже нормализованными (:class:`src.ai.gemini.generative_ai.ResponseNormalizer`), а обрамление
+ответа (префиксы из `remove_prefixes` и закрывающие "```") удаляется :class:`PrefixStripper`
+так же, как :meth:`CodeAssistant.remove_outer_quotes`, но без накопления всего ответа в памяти:
+задерживаются только начало ответа (до длины самого длинного префикса) и хвост.
+Запись на диск выполняется порциями в потоке исполнителя; после окончания потока временный
+файл переименовывается в итоговый. Полный текст ответа хранит только клиент модели -
+для истории чата и кеша ответов.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import IO, AsyncIterator, Callable, Iterable, Optional, Protocol
+
+# Размер порции записи потокового ответа на диск, символов
+BUFFER_CHARS = 64 * 1024
+
+
+class StreamFilter(Protocol):
+    """Потоковое преобразование текста: `feed` - очередной фрагмент, `close` - остаток после конца потока."""
+
+    def feed(self, text: str) -> str: ...
+
+    def close(self) -> str: ...
+
+
+class PrefixStripper:
+    """
+    .. :class:`PrefixStripper`
+        :synopsis: Потоковый аналог `remove_outer_quotes`
+    """
+
+    def __init__(self, prefixes: Iterable[str], suffix: str = "```"):
+        """
+        Args:
+            prefixes (Iterable[str]): Префиксы в порядке проверки (`remove_prefixes` конфигурации).
+            suffix (str): Окончание, удаляемое вместе с найденным префиксом.
+        """
+        self.prefixes = list(prefixes)
+        self.suffix = suffix
+        self._lookahead = max((len(prefix) for prefix in self.prefixes), default=0)
+        self._head = ''
+        self._tail = ''
+        self._started = False
+        self._matched = False
+        self._skip_whitespace = True
+
+    def _start(self, text: str) -> str:
+        self._started = True
+        for prefix in self.prefixes:
+            if text.lower().startswith(prefix.lower()):
+                text = text[len(prefix):]
+                self._matched = True
+                break
+        return self._push(text)
+
+    def _push(self, text: str) -> str:
+        if self._skip_whitespace:
+            text = text.lstrip()
+            if not text:
+                return ''
+            self._skip_whitespace = False
+        data = self._tail + text
+        # Задерживаются хвостовые пробелы, место под закрывающий суффикс и пробелы перед ним
+        cut = max(0, len(data.rstrip()) - len(self.suffix))
+        cut = len(data[:cut].rstrip())
+        self._tail = data[cut:]
+        return data[:cut]
+
+    def feed(self, text: str) -> str:
+        """Принимает очередной фрагмент и возвращает часть, которую уже можно записать."""
+        if self._started:
+            return self._push(text)
+        self._head += text
+        head = self._head.lstrip()
+        if len(head) < self._lookahead:
+            return ''
+        return self._start(head)
+
+    def close(self) -> str:
+        """Завершает поток и возвращает остаток."""
+        output = '' if self._started else self._start(self._head.lstrip())
+        tail = self._tail.rstrip()
+        if self._matched:
+            tail = tail.removesuffix(self.suffix).rstrip()
+        self._tail = ''
+        return output + tail
+
+
+def _append(file: IO[str], text: str) -> None:
+    file.write(text)
+    file.flush()
+
+
+def _finish(file: IO[str], tmp_path: Path, export_path: Path, text: str, written: int) -> None:
+    """Дописывает остаток и переименовывает временный файл (или удаляет его, если ответ пуст)."""
+    file.write(text)
+    file.close()
+    if written:
+        os.replace(tmp_path, export_path)
+    else:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _close_filters(filters: list[StreamFilter]) -> str:
+    """Остаток цепочки фильтров: остаток каждого фильтра проходит через следующие."""
+    text = ''
+    for index, stream_filter in enumerate(filters):
+        text = stream_filter.feed(text) + stream_filter.close() if index else stream_filter.close()
+    return text
+
+
+async def write_stream(
+    chunks: AsyncIterator[str],
+    export_path: Path,
+    filters: Iterable[StreamFilter] = (),
+    on_progress: Optional[Callable[[int], None]] = None,
+    buffer_chars: int = BUFFER_CHARS,
+) -> int:
+    """
+    Пишет поток фрагментов во временный файл и переименовывает его в `export_path`.
+
+    Фрагменты проходят через `filters` по порядку, копятся в памяти и дописываются в файл
+    в потоке исполнителя порциями от `buffer_chars` символов, чтобы запись на диск
+    не останавливала цикл событий.
+
+    Args:
+        chunks (AsyncIterator[str]): Фрагменты ответа модели.
+        export_path (Path): Итоговый файл.
+        filters (Iterable[StreamFilter]): Обработка на лету (например, :class:`PrefixStripper`).
+        on_progress (Optional[Callable[[int], None]]): Вызывается после каждого фрагмента с числом записанных символов.
+        buffer_chars (int): Размер порции записи.
+
+    Returns:
+        int: Количество записанных символов. При `0` итоговый файл не создается.
+
+    Raises:
+        Exception: Ошибка потока, обработки или записи; временный файл при этом удаляется.
+    """
+    filters = list(filters)
+    await asyncio.to_thread(export_path.parent.mkdir, parents=True, exist_ok=True)
+    tmp_path = export_path.with_name(export_path.name + '.part')
+    written = 0
+    buffer: list[str] = []
+    buffered = 0
+    file = None
+    try:
+        file = await asyncio.to_thread(open, tmp_path, 'w', encoding='utf-8')
+        async for chunk in chunks:
+            text = chunk
+            for stream_filter in filters:
+                text = stream_filter.feed(text)
+            if text:
+                buffer.append(text)
+                buffered += len(text)
+                written += len(text)
+                if buffered >= buffer_chars:
+                    await asyncio.to_thread(_append, file, ''.join(buffer))
+                    buffer.clear()
+                    buffered = 0
+            if on_progress:
+                on_progress(written)
+        text = _close_filters(filters)
+        buffer.append(text)
+        written += len(text)
+        await asyncio.to_thread(_finish, file, tmp_path, export_path, ''.join(buffer), written)
+        return written
+    except BaseException:
+        if file:
+            file.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
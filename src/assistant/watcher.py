@@ -0,0 +1,198 @@
+## \file /src/assistant/watcher.py
+# -*- coding: utf-8 -*-
+
+#! venv/bin/python/python3.12
+
+"""
+.. module:: src.assistant.watcher
+	:platform: Windows, Unix
+	:synopsis: Отслеживание изменений файлов в `start_dirs` для режима `--watch`
+
+Если установлен пакет `watchdog`, используются уведомления файловой системы,
+иначе - периодическое сравнение снимков `(mtime, size)` подходящих файлов.
+Изменения накапливаются, пока правки не стихнут на `debounce` секунд, и
+выдаются пачкой: только созданные, измененные и переименованные файлы,
+прошедшие правила отбора :class:`FileWalker`.
+
+Для проверки принадлежности к отслеживаемым директориям пути разрешаются (`Path.resolve`),
+а в пачку попадают в виде относительно настроенных корней - так же, как их выдает
+:meth:`FileWalker.walk`: от этого зависят ключи манифеста и пути файлов ответов.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+from src.assistant.file_walker import FileWalker
+from src.assistant.pipeline import shutdown_requested
+from src.logger.logger import logger
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+# События `watchdog`, после которых содержимое файла могло измениться. Остальные
+# (`deleted`, а в watchdog 4+ также `opened`, `closed`, `closed_no_write`) пропускаются
+_CHANGE_EVENTS = frozenset({'created', 'modified', 'moved'})
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Передает пути из событий `watchdog` в цикл событий asyncio."""
+
+    def __init__(self, notify: Callable[[str], None]):
+        super().__init__()
+        self._notify = notify
+
+    def on_any_event(self, event) -> None:
+        if event.is_directory or event.event_type not in _CHANGE_EVENTS:
+            return
+        # Для переименования интересен новый путь
+        self._notify(getattr(event, 'dest_path', None) or event.src_path)
+
+
+class ChangeWatcher:
+    """
+    .. :class:`ChangeWatcher`
+        :synopsis: Поток пачек измененных файлов с подавлением дребезга
+    """
+
+    def __init__(
+        self,
+        roots: Iterable[str | Path],
+        walker: FileWalker,
+        debounce: float = 2.0,
+        poll_interval: float = 2.0,
+        use_notifications: bool = True,
+        exclude_roots: Iterable[str | Path] = (),
+        should_stop: Callable[[], bool] = shutdown_requested,
+    ):
+        """
+        Args:
+            roots (Iterable[str | Path]): Отслеживаемые директории.
+            walker (FileWalker): Правила отбора файлов.
+            debounce (float): Сколько секунд тишины ждать после последнего изменения перед выдачей пачки.
+            poll_interval (float): Период опроса без `watchdog`.
+            use_notifications (bool): Использовать `watchdog`, если он установлен.
+            exclude_roots (Iterable[str | Path]): Директории, изменения в которых не учитываются
+                (например, `docs_dir` с ответами модели внутри `start_dir`).
+            should_stop (Callable[[], bool]): Признак остановки наблюдения.
+        """
+        # Настроенные корни - для путей пачки, разрешенные - для проверки принадлежности
+        self.configured_roots = [Path(root) for root in roots]
+        self.roots = [root.resolve() for root in self.configured_roots]
+        self.exclude_roots = [Path(root).resolve() for root in exclude_roots]
+        self.walker = walker
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_notifications = use_notifications and Observer is not None
+        self.should_stop = should_stop
+        self._pending: set[Path] = set()
+        self._changed: Optional[asyncio.Event] = None
+
+    def is_watched(self, file_path: str | Path) -> bool:
+        """Лежит ли файл в одной из отслеживаемых директорий вне `exclude_dirs` и `exclude_roots` и проходит ли правила отбора."""
+        file_path = Path(file_path)
+        if any(file_path.is_relative_to(root) for root in self.exclude_roots):
+            return False
+        for root in self.roots:
+            try:
+                relative = file_path.relative_to(root)
+            except ValueError:
+                continue
+            if any(part in self.walker.exclude_dirs for part in relative.parts[:-1]):
+                return False
+            return self.walker.is_match(file_path)
+        return False
+
+    def _configured_path(self, file_path: Path) -> Path:
+        """Путь файла относительно настроенного корня, как его выдает :meth:`FileWalker.walk`."""
+        for root, configured in zip(self.roots, self.configured_roots):
+            if file_path.is_relative_to(root):
+                return configured / file_path.relative_to(root)
+        return file_path
+
+    def _add(self, file_path: str | Path) -> None:
+        """Добавляет файл в текущую пачку (вызывается в потоке цикла событий)."""
+        file_path = Path(file_path).resolve()
+        if self.is_watched(file_path):
+            self._pending.add(self._configured_path(file_path))
+            self._changed.set()
+
+    def _snapshot(self) -> dict[Path, tuple[int, int]]:
+        """Снимок `(mtime_ns, size)` всех подходящих файлов."""
+        snapshot = {}
+        for root in self.roots:
+            for file_path in self.walker.walk(root):
+                if not self.is_watched(file_path.resolve()):
+                    continue
+                try:
+                    stat = file_path.stat()
+                except OSError:
+                    continue
+                snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    async def _poll(self) -> None:
+        """Опрос дерева без `watchdog`: новые и изменившиеся файлы попадают в пачку."""
+        loop = asyncio.get_running_loop()
+        previous = await loop.run_in_executor(None, self._snapshot)
+        while not self.should_stop():
+            await asyncio.sleep(self.poll_interval)
+            current = await loop.run_in_executor(None, self._snapshot)
+            for file_path, signature in current.items():
+                if previous.get(file_path) != signature:
+                    self._add(file_path)
+            previous = current
+
+    def _start_observer(self):
+        """Подписывается на уведомления файловой системы."""
+        loop = asyncio.get_running_loop()
+        handler = _EventHandler(lambda path: loop.call_soon_threadsafe(self._add, path))
+        observer = Observer()
+        for root in self.roots:
+            observer.schedule(handler, os.fspath(root), recursive=True)
+        observer.start()
+        return observer
+
+    async def changes(self) -> AsyncIterator[set[Path]]:
+        """
+        Выдает пачки измененных файлов до запроса остановки.
+
+        Yields:
+            set[Path]: Файлы, созданные, измененные или переименованные с прошлой пачки.
+        """
+        self._changed = asyncio.Event()
+        observer, poller = None, None
+        if self.use_notifications:
+            observer = self._start_observer()
+            logger.info(f"Отслеживание изменений (watchdog): {[str(root) for root in self.roots]}")
+        else:
+            poller = asyncio.create_task(self._poll())
+            logger.info(f"Отслеживание изменений (опрос раз в {self.poll_interval} с): {[str(root) for root in self.roots]}")
+        try:
+            while not self.should_stop():
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                # Ждем, пока правки стихнут
+                while True:
+                    self._changed.clear()
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout=self.debounce)
+                    except asyncio.TimeoutError:
+                        break
+                batch, self._pending = self._pending, set()
+                if batch:
+                    yield batch
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+            if poller:
+                poller.cancel()
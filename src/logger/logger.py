@@ -120,53 +120,50 @@ class Logger(metaclass=SingletonMeta):
         self.errors_log_path = self.log_files_path / (errors_log_path or "errors.log")
         self.json_log_path = self.log_files_path / (json_log_path or "log.json")
 
-        # Ensure directories exist
-        self.log_files_path.mkdir(parents=True, exist_ok=True)
-
-        # Ensure log files exist
-        self.info_log_path.touch(exist_ok=True)
-        self.debug_log_path.touch(exist_ok=True)
-        self.errors_log_path.touch(exist_ok=True)
-        self.json_log_path.touch(exist_ok=True)
-
         # Console logger
         self.logger_console = logging.getLogger(name="logger_console")
         self.logger_console.setLevel(logging.DEBUG)
 
-        # Info file logger
-        self.logger_file_info = logging.getLogger(name="logger_file_info")
-        self.logger_file_info.setLevel(logging.INFO)
-        info_handler = logging.FileHandler(self.info_log_path)
-        info_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
-        self.logger_file_info.addHandler(info_handler)
-
-        # Debug file logger
-        self.logger_file_debug = logging.getLogger(name="logger_file_debug")
-        self.logger_file_debug.setLevel(logging.DEBUG)
-        debug_handler = logging.FileHandler(self.debug_log_path)
-        debug_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
-        self.logger_file_debug.addHandler(debug_handler)
-
-        # Errors file logger
-        self.logger_file_errors = logging.getLogger(name="logger_file_errors")
-        self.logger_file_errors.setLevel(logging.ERROR)
-        errors_handler = logging.FileHandler(self.errors_log_path)
-        errors_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
-        self.logger_file_errors.addHandler(errors_handler)
-
-
-        # JSON file logger
-        self.logger_file_json = logging.getLogger(name='logger_json')
-        self.logger_file_json.setLevel(logging.DEBUG)
-        json_handler = logging.FileHandler(self.json_log_path)
-        json_handler.setFormatter(JsonFormatter())  # Используем наш кастомный форматтер
-        self.logger_file_json.addHandler(json_handler)
-
-
-        # Удаляем все обработчики, которые выводят в консоль
-        for handler in self.logger_file_json.handlers:
-            if isinstance(handler, logging.StreamHandler):
-                self.logger_file_json.removeHandler(handler)
+        # Файловые логгеры и файлы логов создаются при первом обращении, а не при импорте
+        self._file_loggers = {}
+
+    def _file_logger(self, name: str, path: Path, level: int, formatter: logging.Formatter) -> logging.Logger:
+        """ Returns file logger `name`, creating the log file and its handler on first use."""
+        file_logger = self._file_loggers.get(name)
+        if file_logger is None:
+            with SingletonMeta._lock:
+                file_logger = self._file_loggers.get(name)
+                if file_logger is None:
+                    self.log_files_path.mkdir(parents=True, exist_ok=True)
+                    path.touch(exist_ok=True)
+                    file_logger = logging.getLogger(name=name)
+                    file_logger.setLevel(level)
+                    handler = logging.FileHandler(path)
+                    handler.setFormatter(formatter)
+                    file_logger.addHandler(handler)
+                    self._file_loggers[name] = file_logger
+        return file_logger
+
+    @property
+    def logger_file_info(self) -> logging.Logger:
+        """ Info file logger."""
+        return self._file_logger("logger_file_info", self.info_log_path, logging.INFO, logging.Formatter("%(levelname)s: %(message)s"))
+
+    @property
+    def logger_file_debug(self) -> logging.Logger:
+        """ Debug file logger."""
+        return self._file_logger("logger_file_debug", self.debug_log_path, logging.DEBUG, logging.Formatter("%(levelname)s: %(message)s"))
+
+    @property
+    def logger_file_errors(self) -> logging.Logger:
+        """ Errors file logger."""
+        return self._file_logger("logger_file_errors", self.errors_log_path, logging.ERROR, logging.Formatter("%(levelname)s: %(message)s"))
+
+    @property
+    def logger_file_json(self) -> logging.Logger:
+        """ JSON file logger."""
+        # Используем наш кастомный форматтер
+        return self._file_logger("logger_json", self.json_log_path, logging.DEBUG, JsonFormatter())
 
     def _format_message(self, message, ex=None, color: Optional[Tuple[str, str]] = None):
         """ Returns formatted message with optional color and exception information."""
@@ -31,10 +31,6 @@ import json
 from types import SimpleNamespace
 from typing import Any, Dict, List
 from pathlib import Path
-from xml.dom.minidom import getDOMImplementation
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from src.utils.xls import save_xls_file
 
 def replace_key_in_dict(data, old_key, new_key) -> dict:
     """
@@ -96,6 +92,10 @@ def replace_key_in_dict(data, old_key, new_key) -> dict:
     if isinstance(data, SimpleNamespace):
         data = data.__dict__
 
+    # reportlab загружается только при сохранении в PDF
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     pdf = canvas.Canvas(str(file_path), pagesize=A4)
     width, height = A4
     x, y = 50, height - 50
@@ -237,6 +237,8 @@ def dict2xml(data: Dict[str, Any], encoding: str = 'UTF-8') -> str:
                 node.setAttributeNode(attr)
             return node
 
+    from xml.dom.minidom import getDOMImplementation  # нужен только для преобразования в XML
+
     doc = getDOMImplementation().createDocument(None, None, None)
     if len(data) > 1:
         raise Exception('Only one root node allowed')
@@ -269,6 +271,9 @@ def dict2xls(data: dict | SimpleNamespace, file_path: str | Path) -> bool:
     Returns:
         bool: True if the file was saved successfully, False otherwise.
     """
+    # pandas загружается только при сохранении в XLS
+    from src.utils.xls import save_xls_file
+
     return save_xls_file(data, file_path)
 
 def dict2html(data: dict | SimpleNamespace, encoding: str = 'UTF-8') -> str:
@@ -6,8 +6,6 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 from types import SimpleNamespace
-import pandas as pd
-from json_repair import repair_json
 from collections import OrderedDict
 
 
@@ -91,6 +89,8 @@ def j_dumps(
 
     if isinstance(data, str):
         try:
+            from json_repair import repair_json  # нужен только для записи строки JSON
+
             data = repair_json(data)
         except Exception as ex:
             logger.error(f"Error converting string: {data}", ex, exc_info)
@@ -171,6 +171,8 @@ def j_loads(
                 files = list(jjson.glob("*.json"))
                 return [j_loads(file, ordered=ordered) for file in files]
             if jjson.suffix.lower() == ".csv":
+                import pandas as pd  # pandas нужен только для CSV
+
                 return pd.read_csv(jjson).to_dict(orient="records")
              
             return json.loads(jjson.read_text(encoding="utf-8"))
@@ -19,7 +19,6 @@ Functions:
 
 import json
 import csv
-import pandas as pd
 from pathlib import Path
 from typing import Any
 from pprint import pprint as pretty_print
@@ -0,0 +1,11 @@
+## \file /tests/conftest.py
+# -*- coding: utf-8 -*-
+
+"""Общие настройки тестов: корень проекта в `sys.path` для импорта `header` и `src`."""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,24 @@
+## \file /tests/test_benchmark.py
+# -*- coding: utf-8 -*-
+
+"""Сравнение форматов запросов (`--prompt-formats`) не трогает состояние рабочей конфигурации."""
+
+import copy
+
+from src.assistant.benchmark import compare_prompt_formats
+from src.assistant.code_assistant import CodeAssistant
+
+
+def test_compare_prompt_formats_leaves_no_state(tmp_path, monkeypatch):
+    config = copy.deepcopy(CodeAssistant.config)
+    config.docs_dir = str(tmp_path / 'docs' / '<lang>')
+    config.job_queue.enabled = True
+    config.job_queue.db_path = str(tmp_path / 'jobs.sqlite')
+    config.response_cache.enabled = True
+    config.response_cache.cache_dir = str(tmp_path / 'cache')
+    monkeypatch.setattr(CodeAssistant, 'config', config)
+
+    result = compare_prompt_formats(20, {'role': 'doc_writer', 'lang': 'en', 'seed': 1})
+
+    assert result['repr']['tokens'] > 0 and result['template']['tokens'] > 0
+    assert list(tmp_path.iterdir()) == []
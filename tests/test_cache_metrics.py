@@ -0,0 +1,27 @@
+## \file /tests/test_cache_metrics.py
+# -*- coding: utf-8 -*-
+
+"""Учет попаданий и промахов кеша ответов по моделям пула."""
+
+import asyncio
+from types import SimpleNamespace
+
+from src.ai.gemini.metrics import model_metrics
+from src.ai.gemini.mock import MockGenerativeAI
+from src.ai.gemini.response_cache import ResponseCache
+
+
+def test_cache_lookups_are_recorded_per_checked_model(tmp_path):
+    mock_config = SimpleNamespace(latency=SimpleNamespace(distribution='fixed', median_ms=0, min_ms=0))
+    client = MockGenerativeAI(model_name='primary', mock_config=mock_config, response_cache=ResponseCache(tmp_path))
+    client.model.model_names = ['primary', 'fallback']
+    client.response_cache.set(client._cache_key('cached question', '', 'fallback'), 'answer')
+    model_metrics.reset()
+
+    async def lookups():
+        return await client._cached_response('cached question'), await client._cached_response('new question')
+
+    assert asyncio.run(lookups()) == ('answer', None)
+    series = {model: series for (_, _, model), series in model_metrics.series.items()}
+    assert (series['primary'].cache_hits, series['primary'].cache_misses) == (0, 2)
+    assert (series['fallback'].cache_hits, series['fallback'].cache_misses) == (1, 1)
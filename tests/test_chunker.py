@@ -0,0 +1,60 @@
+## \file /tests/test_chunker.py
+# -*- coding: utf-8 -*-
+
+"""Разбиение исходников Python :func:`split_python_source`."""
+
+from src.assistant.chunker import split_python_source
+
+
+def count_lines(text: str) -> int:
+    """Оценка токенов по строкам - проще считать границы частей."""
+    return len(text.splitlines())
+
+
+SOURCE = '''import os
+
+# Комментарий к функции
+def first():
+    return 1
+
+
+class Second:
+    def method(self):
+        return 2
+
+
+def third():
+    return 3
+'''
+
+
+def test_small_source_is_not_split():
+    assert split_python_source(SOURCE, 100, count_lines) == [SOURCE]
+    assert split_python_source(SOURCE, 0, count_lines) == [SOURCE]
+
+
+def test_split_at_top_level_boundaries():
+    chunks = split_python_source(SOURCE, 6, count_lines)
+
+    assert ''.join(chunks) == SOURCE
+    assert all(count_lines(chunk) <= 6 for chunk in chunks)
+    # Части собираются из целых конструкций; комментарий остается с функцией, которую описывает
+    assert chunks == [
+        'import os\n\n# Комментарий к функции\ndef first():\n    return 1\n',
+        '\n\nclass Second:\n    def method(self):\n        return 2\n',
+        '\n\ndef third():\n    return 3\n',
+    ]
+
+
+def test_oversized_construct_is_split_by_lines():
+    body = ''.join(f'    value_{index} = {index}\n' for index in range(10))
+    source = f'def big():\n{body}'
+    chunks = split_python_source(source, 4, count_lines)
+
+    assert ''.join(chunks) == source
+    assert [count_lines(chunk) for chunk in chunks] == [4, 4, 3]
+
+
+def test_unparsable_source_is_returned_whole():
+    source = 'def broken(:\n' * 10
+    assert split_python_source(source, 2, count_lines) == [source]
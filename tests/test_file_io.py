@@ -0,0 +1,34 @@
+## \file /tests/test_file_io.py
+# -*- coding: utf-8 -*-
+
+"""Отложенная запись ответов (:class:`WriteBehind`)."""
+
+import asyncio
+
+from src.assistant.file_io import WriteBehind, write_text_atomic
+from src.assistant.stages import stage_timer, SAVING
+
+
+def test_write_behind_times_actual_write(tmp_path, monkeypatch):
+    async def slow_write(path, text):
+        await asyncio.sleep(0.05)
+        await write_text_atomic(path, text)
+
+    monkeypatch.setattr('src.assistant.file_io.write_text_atomic', slow_write)
+    stage_timer.reset()
+    saved = []
+
+    async def run():
+        writer = WriteBehind(queue_size=4, writers=2)
+        for index in range(4):
+            await writer.submit(tmp_path / f'{index}.md', f'text {index}', saved.append)
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+
+    assert writer.written == 4 and saved == [True] * 4
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['0.md', '1.md', '2.md', '3.md']
+    saving = stage_timer.snapshot()[SAVING]
+    assert saving['count'] == 4
+    assert saving['seconds'] >= 4 * 0.04
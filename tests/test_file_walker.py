@@ -0,0 +1,34 @@
+## \file /tests/test_file_walker.py
+# -*- coding: utf-8 -*-
+
+"""Правила выбора файлов :class:`FileWalker`."""
+
+from src.assistant.file_walker import FileWalker
+
+
+def test_exclude_files_exact_entries_and_globs(tmp_path):
+    excluded = tmp_path / 'pkg' / 'excluded.py'
+    walker = FileWalker(
+        include_files=['*.py'],
+        exclude_dirs=['node_modules'],
+        exclude_files=['header.py', str(excluded), 'module(1).py', '*_test.py'],
+    )
+
+    assert not walker.is_match(tmp_path / 'pkg' / 'header.py')
+    assert not walker.is_match(excluded)
+    # Полный путь без символов glob сравнивается точно, одноименные файлы в других директориях не исключаются
+    assert walker.is_match(tmp_path / 'other' / 'excluded.py')
+    assert not walker.is_match(tmp_path / 'module(1).py')
+    assert walker.is_match(tmp_path / 'module1.py')
+    assert not walker.is_match(tmp_path / 'pkg' / 'walker_test.py')
+    assert not walker.is_match(tmp_path / 'readme.md')
+
+
+def test_walk_prunes_excluded_dirs(tmp_path):
+    for path in ['a.py', 'node_modules/deep/b.py', 'pkg/c.py', 'pkg/header.py']:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text('', encoding='utf-8')
+    walker = FileWalker(include_files=['*.py'], exclude_dirs=['node_modules'], exclude_files=['header.py'])
+
+    assert [path.relative_to(tmp_path).as_posix() for path in walker.walk(tmp_path)] == ['a.py', 'pkg/c.py']
+    assert walker.stats.pruned == 1
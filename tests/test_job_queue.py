@@ -0,0 +1,75 @@
+## \file /tests/test_job_queue.py
+# -*- coding: utf-8 -*-
+
+"""Переходы состояний персистентной очереди заданий :class:`JobQueue`."""
+
+import sqlite3
+
+import pytest
+
+from src.assistant.job_queue import DEAD, DONE, FAILED, IN_FLIGHT, PENDING, JobQueue
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.sqlite', max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_job_lifecycle(job_queue):
+    job_queue.enqueue('a.py', 'doc_writer', 'en')
+    assert job_queue.state('a.py', 'doc_writer', 'en') == PENDING
+    job_queue.mark_in_flight('a.py', 'doc_writer', 'en')
+    assert job_queue.state('a.py', 'doc_writer', 'en') == IN_FLIGHT
+    job_queue.mark_done('a.py', 'doc_writer', 'en')
+    assert job_queue.state('a.py', 'doc_writer', 'en') == DONE
+    assert job_queue.state('a.py', 'code_checker', 'en') is None
+
+
+def test_failed_job_becomes_dead_after_max_attempts(job_queue):
+    assert job_queue.mark_failed('a.py', 'doc_writer', 'en', 'timeout') == FAILED
+    assert job_queue.unfinished() == [('a.py', 'doc_writer', 'en')]
+    assert job_queue.mark_failed('a.py', 'doc_writer', 'en', 'timeout') == DEAD
+    assert job_queue.unfinished() == []
+
+    # Задания из списка dead не возвращаются в очередь обычным проходом
+    job_queue.enqueue('a.py', 'doc_writer', 'en')
+    assert job_queue.state('a.py', 'doc_writer', 'en') == DEAD
+
+    assert job_queue.requeue_dead(role='doc_writer') == [('a.py', 'doc_writer', 'en')]
+    assert job_queue.state('a.py', 'doc_writer', 'en') == PENDING
+    # Счетчик попыток сброшен: одна неудача снова не делает задание dead
+    assert job_queue.mark_failed('a.py', 'doc_writer', 'en') == FAILED
+
+
+def test_done_resets_attempts(job_queue):
+    job_queue.mark_failed('a.py', 'doc_writer', 'en')
+    job_queue.mark_done('a.py', 'doc_writer', 'en')
+    assert job_queue.mark_failed('a.py', 'doc_writer', 'en') == FAILED
+
+
+def test_interrupted_jobs_are_recovered_on_open(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.sqlite')
+    queue.enqueue('a.py', 'doc_writer', 'en')
+    queue.enqueue('b.py', 'doc_writer', 'ru')
+    queue.mark_in_flight('a.py', 'doc_writer', 'en')
+    queue.close()
+
+    # Без восстановления (пробный проход) прерванные задания видны как незавершенные
+    read_only = JobQueue(tmp_path / 'jobs.sqlite', read_only=True)
+    assert read_only.state('a.py', 'doc_writer', 'en') == IN_FLIGHT
+    assert len(read_only.unfinished()) == 2
+    read_only.close()
+
+    queue = JobQueue(tmp_path / 'jobs.sqlite')
+    assert queue.state('a.py', 'doc_writer', 'en') == PENDING
+    assert queue.unfinished(lang='en') == [('a.py', 'doc_writer', 'en')]
+    assert queue.counts() == {PENDING: 2}
+    queue.close()
+
+
+def test_read_only_queue_requires_existing_database(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        JobQueue(tmp_path / 'missing.sqlite', read_only=True)
+    assert not (tmp_path / 'missing.sqlite').exists()
@@ -0,0 +1,76 @@
+## \file /tests/test_main.py
+# -*- coding: utf-8 -*-
+
+"""Повторяющиеся проходы `main()` с локальной имитацией модели."""
+
+import asyncio
+import copy
+import sys
+
+import pytest
+
+from src.assistant import code_assistant, pipeline
+from src.assistant.code_assistant import CodeAssistant
+from src.assistant.scheduler import JobScheduler
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    tree = tmp_path / 'src'
+    (tree / 'pkg').mkdir(parents=True)
+    for index in range(3):
+        (tree / 'pkg' / f'module_{index}.py').write_text(f'def function_{index}():\n    return {index}\n', encoding='utf-8')
+
+    config = copy.deepcopy(CodeAssistant.config)
+    config.roles, config.languages = ['doc_writer'], ['en']
+    config.start_dir = str(tree)
+    config.start_dirs = [str(tree)]
+    config.docs_dir = str(tmp_path / 'docs' / '<lang>')
+    config.job_queue.db_path = str(tmp_path / 'jobs.sqlite')
+    config.response_cache.enabled = False
+    config.metrics.json_path = str(tmp_path / 'metrics' / 'metrics.json')
+    config.metrics.prometheus_path = str(tmp_path / 'metrics' / 'metrics.prom')
+    config.concurrency.requests_per_minute = 0
+    config.concurrency.tokens_per_minute = 0
+    config.mock_backend.latency.distribution = 'fixed'
+    config.mock_backend.latency.median_ms = 0
+    config.mock_backend.latency.min_ms = 0
+    for name in vars(config.mock_backend.errors):
+        setattr(config.mock_backend.errors, name, 0.0)
+
+    monkeypatch.setattr(CodeAssistant, 'config', config)
+    # Конфигурация перечитывается перед каждым проходом
+    monkeypatch.setattr(code_assistant, 'j_loads_ns', lambda path: config)
+    monkeypatch.setattr(pipeline, '_shutdown_requested', False)
+    monkeypatch.setattr(sys, 'argv', ['code_assistant.py', '--mock'])
+    yield config
+    pipeline.close_loop()
+
+
+def test_repeated_passes_process_only_changed_files(config, tmp_path, monkeypatch):
+    passes, loops = [], set()
+    process_files = JobScheduler.process_files
+
+    async def counting_process_files(self, start_dir=None):
+        loops.add(asyncio.get_running_loop())
+        result = await process_files(self, start_dir)
+        passes.append(self.processed)
+        return result
+
+    def wait_idle(seconds):
+        # Первый простой - правка файла для следующего прохода, второй - остановка
+        if len(passes) == 2:
+            (tmp_path / 'src' / 'pkg' / 'module_1.py').write_text('def changed():\n    return 1\n', encoding='utf-8')
+        else:
+            pipeline.request_shutdown()
+
+    monkeypatch.setattr(JobScheduler, 'process_files', counting_process_files)
+    monkeypatch.setattr(code_assistant, 'wait_idle', wait_idle)
+
+    code_assistant.main()
+
+    # Второй проход ничего не обрабатывает, после правки обрабатывается только измененный файл
+    assert passes == [3, 0, 1, 0]
+    assert len(loops) == 1
+    docs = tmp_path / 'docs' / 'en' / 'doc_writer' / 'pkg'
+    assert sorted(path.name for path in docs.iterdir()) == ['module_0.py.md', 'module_1.py.md', 'module_2.py.md']
@@ -0,0 +1,103 @@
+## \file /tests/test_pipeline.py
+# -*- coding: utf-8 -*-
+
+"""Конвейер обработчиков :func:`run_pipeline` и ограничитель частоты :class:`RateLimiter`."""
+
+import asyncio
+import time
+
+from src.assistant.pipeline import RateLimiter, run_pipeline
+
+
+def test_pipeline_processes_all_items_with_bounded_concurrency():
+    active, peak, seen = 0, 0, []
+
+    async def handler(item):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        seen.append(item)
+        return item % 2 == 0
+
+    processed = asyncio.run(run_pipeline(range(20), handler, workers=3))
+
+    assert processed == 10
+    assert sorted(seen) == list(range(20))
+    assert peak == 3
+
+
+def test_pipeline_survives_handler_errors():
+    async def handler(item):
+        if item == 2:
+            raise ValueError('broken item')
+        return True
+
+    assert asyncio.run(run_pipeline(range(5), handler, workers=2)) == 4
+
+
+def test_pipeline_soft_shutdown_finishes_started_items_and_closes_source():
+    stop = False
+    started, finished = [], []
+    closed = False
+
+    async def source():
+        nonlocal closed
+        try:
+            for item in range(100):
+                yield item
+        finally:
+            closed = True
+
+    async def handler(item):
+        nonlocal stop
+        started.append(item)
+        if item == 3:
+            stop = True
+        await asyncio.sleep(0.01)
+        finished.append(item)
+        return True
+
+    processed = asyncio.run(run_pipeline(source(), handler, workers=2, should_stop=lambda: stop))
+
+    # Начатые задания доводятся до конца, новые не выдаются
+    assert sorted(started) == sorted(finished)
+    assert processed == len(finished) < 10
+    assert closed
+
+
+def test_rate_limiter_without_limits_does_not_wait():
+    limiter = RateLimiter()
+
+    async def acquire_many():
+        for _ in range(1000):
+            await limiter.acquire(10_000)
+
+    started = time.monotonic()
+    asyncio.run(acquire_many())
+    assert time.monotonic() - started < 0.5
+
+
+def test_rate_limiter_waits_for_token_budget():
+    limiter = RateLimiter(tokens_per_minute=6000)
+
+    async def acquire():
+        await limiter.acquire(6000)
+        started = time.monotonic()
+        await limiter.acquire(10)
+        return time.monotonic() - started
+
+    # 100 токенов в секунду: 10 токенов пополняются примерно за 0.1 с
+    assert 0.05 <= asyncio.run(acquire()) < 1
+
+
+def test_rate_limiter_caps_request_larger_than_bucket():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=100)
+
+    async def acquire():
+        await limiter.acquire(10_000)
+
+    started = time.monotonic()
+    asyncio.run(asyncio.wait_for(acquire(), timeout=1))
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,130 @@
+## \file /tests/test_retry.py
+# -*- coding: utf-8 -*-
+
+"""Повторы запросов :class:`RetryEngine` и автомат отключения :class:`CircuitBreaker`."""
+
+import asyncio
+
+import pytest
+
+from src.ai.gemini.retry import CircuitBreaker, CircuitOpenError, RetryEngine, RetryPolicy
+
+
+class ServiceUnavailable(Exception):
+    """Временный сбой (политика по имени класса, как у `google.api_core.exceptions`)."""
+
+
+class InvalidArgument(Exception):
+    """Ошибка самого запроса, не повторяется."""
+
+
+class Flaky:
+    """Фабрика запроса: первые `failures` попыток завершаются ошибкой."""
+
+    def __init__(self, failures: int, error: type = ServiceUnavailable, message: str = 'unavailable'):
+        self.failures = failures
+        self.error = error
+        self.message = message
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error(self.message)
+        return 'ok'
+
+
+def make_engine(breaker=None, **policies):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    policies = {'ServiceUnavailable': RetryPolicy(max_attempts=4, base_delay=1, multiplier=2, jitter=0), **policies}
+    return RetryEngine(policies, breaker or CircuitBreaker(failure_threshold=0), sleep=sleep), delays
+
+
+def test_retries_with_exponential_backoff():
+    engine, delays = make_engine()
+    call = Flaky(failures=2)
+    retried = []
+
+    assert asyncio.run(engine.run(call, on_retry=retried.append)) == 'ok'
+    assert call.calls == 3
+    assert delays == [1, 2]
+    assert len(retried) == 2
+
+
+def test_gives_up_after_policy_attempts():
+    engine, delays = make_engine()
+    call = Flaky(failures=10)
+
+    with pytest.raises(ServiceUnavailable):
+        asyncio.run(engine.run(call))
+    assert call.calls == 4
+
+
+def test_total_attempts_limit():
+    engine, _ = make_engine()
+    call = Flaky(failures=10)
+
+    with pytest.raises(ServiceUnavailable):
+        asyncio.run(engine.run(call, attempts=2))
+    assert call.calls == 2
+
+
+def test_request_errors_are_not_retried():
+    engine, delays = make_engine()
+    call = Flaky(failures=1, error=InvalidArgument)
+
+    with pytest.raises(InvalidArgument):
+        asyncio.run(engine.run(call))
+    assert call.calls == 1 and delays == []
+
+
+def test_server_retry_hint_overrides_backoff():
+    engine, delays = make_engine()
+    call = Flaky(failures=1, message='quota exceeded, retry in 7.5s')
+
+    assert asyncio.run(engine.run(call)) == 'ok'
+    assert delays == [7.5]
+
+
+def test_breaker_opens_after_consecutive_failures_and_lets_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    engine, _ = make_engine(breaker, ServiceUnavailable=RetryPolicy(max_attempts=2, base_delay=0, jitter=0))
+
+    with pytest.raises(ServiceUnavailable):
+        asyncio.run(engine.run(Flaky(failures=10)))
+    assert breaker.is_open
+
+    blocked = Flaky(failures=0)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(engine.run(blocked))
+    assert blocked.calls == 0
+
+    # Время пробного запроса наступило: успех замыкает автомат
+    breaker.opened_at -= 60
+    assert asyncio.run(engine.run(Flaky(failures=0))) == 'ok'
+    assert not breaker.is_open and breaker.failures == 0
+
+
+def test_request_errors_do_not_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    engine, _ = make_engine(breaker)
+
+    with pytest.raises(InvalidArgument):
+        asyncio.run(engine.run(Flaky(failures=1, error=InvalidArgument)))
+    assert not breaker.is_open
+
+
+def test_from_config_overrides_policies():
+    engine = RetryEngine.from_config({
+        'policies': {'ServiceUnavailable': {'max_attempts': 2, 'base_delay': 3, 'unknown': 1}},
+        'circuit_breaker': {'failure_threshold': 5, 'reset_timeout': 30},
+    })
+
+    assert engine.policy_for(ServiceUnavailable()).max_attempts == 2
+    assert engine.policy_for(ServiceUnavailable()).base_delay == 3
+    assert engine.policy_for(TimeoutError()).max_attempts == 3
+    assert (engine.breaker.failure_threshold, engine.breaker.reset_timeout) == (5, 30)
@@ -0,0 +1,54 @@
+## \file /tests/test_run_async.py
+# -*- coding: utf-8 -*-
+
+"""Проходы процесса и общий клиент модели: асинхронный клиент привязан к циклу первого запроса."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai.gemini.mock import MockGenerativeAI
+from src.assistant.pipeline import close_loop, run_async
+
+
+class LoopBoundModel:
+    """Как `genai.GenerativeModel`: асинхронный клиент создается при первом запросе в текущем цикле."""
+
+    def __init__(self, model):
+        self.model = model
+        self.model_name = model.model_name
+        self.loop = None
+
+    async def generate_content_async(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        elif self.loop is not loop:
+            raise RuntimeError("Event loop is closed")
+        return await self.model.generate_content_async(*args, **kwargs)
+
+    def start_chat(self, history=None):
+        return self.model.start_chat(history=history)
+
+
+class LoopBoundGenerativeAI(MockGenerativeAI):
+    def _create_model(self):
+        return LoopBoundModel(super()._create_model())
+
+
+@pytest.fixture
+def client():
+    mock_config = SimpleNamespace(latency=SimpleNamespace(distribution='fixed', median_ms=0, min_ms=0))
+    yield LoopBoundGenerativeAI(model_name='mock', mock_config=mock_config)
+    close_loop()
+
+
+def test_passes_share_one_event_loop(client):
+    assert run_async(client.ask('first pass'))
+    assert run_async(client.ask('second pass'))
+
+
+def test_separate_event_loops_break_the_client(client):
+    assert asyncio.run(client.ask('first pass'))
+    assert asyncio.run(client.ask('second pass')) is None
@@ -0,0 +1,33 @@
+## \file /tests/test_startup_budget.py
+# -*- coding: utf-8 -*-
+
+"""Бюджет запуска консольных команд (`-X importtime`), см. :mod:`src.assistant.startup_budget`."""
+
+import subprocess
+import sys
+
+import pytest
+
+from header import __root__
+from src.assistant.startup_budget import BUDGET_MS, COMMANDS, IMPORT_BUDGET_MS, measure, parse_importtime
+
+
+@pytest.mark.parametrize('command', list(COMMANDS))
+def test_command_fits_startup_budget(command):
+    result = measure(COMMANDS[command], runs=5)
+
+    assert result['returncode'] == 0
+    assert result['heavy'] == []
+    assert result['import_ms'] <= IMPORT_BUDGET_MS, result['top'][:5]
+    assert result['wall_ms'] <= BUDGET_MS
+
+
+def test_help_does_not_import_pipeline():
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *COMMANDS['code_assistant --help']],
+        cwd=__root__, capture_output=True, text=True,
+    )
+    loaded = {name for name, *_ in parse_importtime(result.stderr)}
+
+    assert result.returncode == 0
+    assert not loaded & {'asyncio', 'src.gs', 'src.logger.logger', 'src.assistant.pipeline'}
@@ -0,0 +1,105 @@
+## \file /tests/test_streaming.py
+# -*- coding: utf-8 -*-
+
+"""Потоковая обработка ответа: :class:`PrefixStripper`, :class:`ResponseNormalizer` и :func:`write_stream`."""
+
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai.gemini.generative_ai import ResponseNormalizer, normalize_text, remove_html_blocks
+from src.assistant.code_assistant import CodeAssistant
+from src.assistant.streaming import PrefixStripper, write_stream
+
+
+PREFIXES = ['```md', '```md\n', '```markdown', '```markdown\n', '```python', '```python\n', '```', '```\n']
+
+
+def chunked(text: str, rng: random.Random) -> list[str]:
+    chunks, position = [], 0
+    while position < len(text):
+        size = rng.randint(1, 6)
+        chunks.append(text[position:position + size])
+        position += size
+    return chunks
+
+
+def run_filter(stream_filter, chunks: list[str]) -> str:
+    return ''.join(stream_filter.feed(chunk) for chunk in chunks) + stream_filter.close()
+
+
+def remove_outer_quotes(text: str) -> str:
+    return CodeAssistant.remove_outer_quotes(SimpleNamespace(config=SimpleNamespace(remove_prefixes=PREFIXES)), text)
+
+
+@pytest.mark.parametrize('text', [
+    '```md\n# Title\n\nBody\n```\n',
+    '  ```python\nprint(1)\n```  ',
+    '```markdown\nnested ``` fence\n```',
+    'plain text without fence\n',
+    '```',
+    '   \n',
+    '',
+])
+def test_prefix_stripper_matches_remove_outer_quotes(text):
+    rng = random.Random(text)
+    for _ in range(20):
+        assert run_filter(PrefixStripper(PREFIXES), chunked(text, rng)) == remove_outer_quotes(text)
+
+
+# `unicode_escape` предупреждает о неизвестных escape-последовательностях, как и в `normalize_text`
+@pytest.mark.filterwarnings('ignore::DeprecationWarning')
+def test_response_normalizer_matches_full_normalization():
+    rng = random.Random(1)
+    alphabet = ['a', '\\', 'n', '`', '```html', '```', 'x\\n', '\\\\', ' ', '\n', 'кириллица']
+    for _ in range(500):
+        raw = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        try:
+            expected = remove_html_blocks(normalize_text(raw))
+        except UnicodeDecodeError:
+            with pytest.raises(UnicodeDecodeError):
+                run_filter(ResponseNormalizer(), chunked(raw, rng))
+            continue
+        assert run_filter(ResponseNormalizer(), chunked(raw, rng)) == expected
+
+
+async def agen(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_write_stream_writes_filtered_response(tmp_path):
+    export_path = tmp_path / 'docs' / 'module.py.md'
+    progress = []
+    written = asyncio.run(write_stream(
+        agen(['```md\n# Ti', 'tle\n', 'Body\n', '```']), export_path, (PrefixStripper(PREFIXES),), progress.append,
+        buffer_chars=4,
+    ))
+
+    assert export_path.read_text(encoding='utf-8') == '# Title\nBody'
+    assert written == len('# Title\nBody')
+    assert progress == sorted(progress) and len(progress) == 4
+    assert [path.name for path in export_path.parent.iterdir()] == ['module.py.md']
+
+
+def test_write_stream_empty_response_creates_no_file(tmp_path):
+    export_path = tmp_path / 'module.py.md'
+    assert asyncio.run(write_stream(agen(['```md\n', '```']), export_path, (PrefixStripper(PREFIXES),))) == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_write_stream_removes_partial_file_on_error(tmp_path):
+    async def broken():
+        yield 'partial answer'
+        raise ConnectionError('stream interrupted')
+
+    export_path = tmp_path / 'module.py.md'
+    export_path.write_text('previous answer', encoding='utf-8')
+    with pytest.raises(ConnectionError):
+        asyncio.run(write_stream(broken(), export_path, buffer_chars=1))
+
+    # Прошлый ответ не затирается оборванным потоком
+    assert [path.name for path in tmp_path.iterdir()] == ['module.py.md']
+    assert export_path.read_text(encoding='utf-8') == 'previous answer'
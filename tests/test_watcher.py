@@ -0,0 +1,26 @@
+## \file /tests/test_watcher.py
+# -*- coding: utf-8 -*-
+
+"""Пути пачек :class:`ChangeWatcher` совпадают с путями обхода :class:`FileWalker`."""
+
+import asyncio
+
+from src.assistant.file_walker import FileWalker
+from src.assistant.watcher import ChangeWatcher
+
+
+def test_changed_paths_use_configured_root(tmp_path, monkeypatch):
+    (tmp_path / 'real' / 'pkg').mkdir(parents=True)
+    source = tmp_path / 'real' / 'pkg' / 'module.py'
+    source.write_text('x = 1\n', encoding='utf-8')
+    (tmp_path / 'link').symlink_to(tmp_path / 'real', target_is_directory=True)
+    monkeypatch.chdir(tmp_path)
+    walker = FileWalker(include_files=['*.py'])
+    watcher = ChangeWatcher(['link'], walker, use_notifications=False)
+    watcher._changed = asyncio.Event()
+
+    # Уведомления и опрос сообщают разрешенный путь
+    watcher._add(source)
+
+    assert watcher._pending == set(walker.walk('link'))
+    assert watcher._pending == {tmp_path.joinpath('link', 'pkg', 'module.py').relative_to(tmp_path)}